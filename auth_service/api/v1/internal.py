@@ -0,0 +1,29 @@
+import secrets
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from core.config import settings
+from db import http_client
+
+
+async def verify_internal_token(x_internal_token: str | None = Header(None)) -> None:
+    """
+    Доступ к служебным эндпоинтам по общему токену.
+    Пока токен не задан в настройках, служебные эндпоинты отключены
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Not Found")
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, settings.internal_token):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail="Invalid internal token")
+
+
+router = APIRouter(dependencies=[Depends(verify_internal_token)], include_in_schema=False)
+
+
+@router.get("/http-pool")
+async def http_pool_stats():
+    """
+    Статистика запросов через пул соединений HTTP клиента
+    """
+    return http_client.get_pool_stats()
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends, Request
-from fastapi_jwt_auth import AuthJWT
 
-from core.jwt import security_jwt
+from core.jwt import AuthJWT, security_jwt
 from services.oauth_service import OAuthService, get_oauth_service
 from utils.enums import AuthProvider
 
@@ -1,8 +1,8 @@
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, Path, Request
-from fastapi_jwt_auth import AuthJWT
 
+from core.jwt import AuthJWT
 from core.tracer import traced
 from schema.roles import (AssignRoleResponse, RoleResponse, RoleSchema,
                                RoleUpdateSchema, UserPermissionsSchema)
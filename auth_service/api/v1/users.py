@@ -2,10 +2,9 @@ import uuid
 from typing import List
 
 from fastapi import APIRouter, Depends, Request, status, HTTPException
-from fastapi_jwt_auth import AuthJWT
 
 from core.tracer import traced
-from core.jwt import security_jwt
+from core.jwt import AuthJWT, security_jwt
 from schema.tokens import LoginRequest, TokenResponse
 from schema.users import (LoginHistoryResponse,
                                UpdateUserCredentialsRequest, UserCreate,
@@ -35,6 +35,19 @@ class OAuthYandexSettings(BaseSettings):
         env_prefix = "YANDEX_"
 
 
+class HttpClientSettings(BaseSettings):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 5.0
+    connect_timeout: float = 2.0
+    http2: bool = True
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "AUTH_API_HTTP_"
+
+
 class Settings(BaseSettings):
     # App
     project_name: str = Field(default="Auth API", env="File API")
@@ -54,10 +67,24 @@ class Settings(BaseSettings):
     ALGORITHM: str = Field(default="HS256", env="ALGORITHM")
     ACCESS_TOKEN_EXPIRES: int = Field(default=2880, env="ACCESS_TOKEN_EXPIRES")
     REFRESH_TOKEN_EXPIRES: int = Field(default=1440, env="REFRESH_TOKEN_EXPIRES")
+    # Ключи подписи для асимметричных алгоритмов, по умолчанию каталог keys в корне сервиса
+    JWT_KEYS_DIR: str | None = Field(default=None, env="JWT_KEYS_DIR")
+    JWT_ACTIVE_KID: str | None = Field(default=None, env="JWT_ACTIVE_KID")
+    JWKS_MAX_AGE: int = Field(default=300, env="JWKS_MAX_AGE")
+
+    # Локальный кэш отозванных токенов
+    revocation_bloom_capacity: int = Field(default=1_000_000, env="REVOCATION_BLOOM_CAPACITY")
+    revocation_bloom_error_rate: float = Field(default=0.001, env="REVOCATION_BLOOM_ERROR_RATE")
+    revocation_rebuild_interval: int = Field(default=600, env="REVOCATION_REBUILD_INTERVAL")
 
     # OAuth2 Yandex
     oauth: OAuthYandexSettings = OAuthYandexSettings()
 
+    # HTTP клиент
+    http_client: HttpClientSettings = HttpClientSettings()
+    # Токен служебных эндпоинтов /api/v1/internal (заголовок X-Internal-Token), пусто - эндпоинты отключены
+    internal_token: str | None = Field(default=None, env="AUTH_API_INTERNAL_TOKEN")
+
     # Tracing
     enable_tracing: bool = Field(default=True, env="ENABLE_TRACING")
     jaeger_host: str = Field(default="jaeger", env="JAEGER_HOST")
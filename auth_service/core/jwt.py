@@ -1,6 +1,12 @@
+from typing import Dict, Optional, Union
+
+import jwt as pyjwt
+from fastapi_jwt_auth import AuthJWT as BaseAuthJWT
+from fastapi_jwt_auth.exceptions import InvalidHeaderError, JWTDecodeError
 from pydantic import BaseSettings
 
 from core.config import settings
+from core.keys import key_store
 from jose import jwt
 import time
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
@@ -11,17 +17,71 @@ import http
 class JWTSettings(BaseSettings):
     authjwt_secret_key: str = settings.SECRET_KEY
     authjwt_algorithm: str = settings.ALGORITHM
+    authjwt_private_key: str | None = None
+    authjwt_public_key: str | None = None
     authjwt_access_token_expires: int = settings.ACCESS_TOKEN_EXPIRES
     authjwt_refresh_token_expires: int = settings.REFRESH_TOKEN_EXPIRES
     authjwt_user_claims: bool = True
 
 
+def get_jwt_settings() -> JWTSettings:
+    """
+    Настройки AuthJWT, для асимметричных алгоритмов подпись активным ключом
+    """
+    if not key_store.enabled:
+        return JWTSettings()
+    return JWTSettings(
+        authjwt_private_key=key_store.private_pem(key_store.active_kid),
+        authjwt_public_key=key_store.public_pem(key_store.active_kid),
+    )
+
+
+def get_verification_key(token: str) -> str | None:
+    """
+    Ключ проверки подписи: общий секрет или открытый ключ по kid из заголовка токена
+    """
+    if not key_store.enabled:
+        return settings.SECRET_KEY
+    return key_store.public_pem(jwt.get_unverified_header(token).get('kid'))
+
+
+class AuthJWT(BaseAuthJWT):
+    """
+    AuthJWT, проверяющий подпись ключом, указанным в заголовке kid токена,
+    чтобы токены, подписанные предыдущим ключом, оставались действительными после ротации
+    """
+
+    def _verified_token(self, encoded_token: str, issuer: Optional[str] = None) -> Dict[str, Union[str, int, bool]]:
+        if not key_store.enabled:
+            return super()._verified_token(encoded_token, issuer)
+        try:
+            key = get_verification_key(encoded_token)
+        except Exception as err:
+            raise InvalidHeaderError(status_code=422, message=str(err))
+        if key is None:
+            raise JWTDecodeError(status_code=422, message="Unknown signing key")
+        try:
+            return pyjwt.decode(
+                encoded_token,
+                key,
+                issuer=issuer,
+                audience=self._decode_audience,
+                leeway=self._decode_leeway,
+                algorithms=[settings.ALGORITHM]
+            )
+        except Exception as err:
+            raise JWTDecodeError(status_code=422, message=str(err))
+
+
 def decode_token(token: str) -> dict | None:
     """
     Функция декодирования токена
     """
     try:
-        decoded_token = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        key = get_verification_key(token)
+        if key is None:
+            return None
+        decoded_token = jwt.decode(token, key, algorithms=[settings.ALGORITHM])
         return decoded_token if decoded_token['exp'] >= time.time() else None
     except Exception:
         return None
@@ -0,0 +1,133 @@
+import base64
+import logging
+import os
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from core.config import BASE_DIR, settings
+
+logger = logging.getLogger(__name__)
+
+HMAC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+
+
+def _b64url_uint(value: int) -> str:
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+class KeyStore:
+    """
+    Ключи подписи токенов.
+
+    Каждый файл <kid>.pem в каталоге ключей содержит закрытый RSA ключ.
+    Токены подписываются активным ключом, открытые части всех ключей публикуются
+    в JWKS, поэтому токены, выпущенные предыдущим ключом, проверяются до истечения.
+    Ротация: добавить новый ключ, дождаться обновления JWKS у сервисов,
+    сделать его активным и удалить старый после истечения refresh токенов.
+    """
+
+    def __init__(self, keys_dir: str, active_kid: str | None = None):
+        self.keys_dir = keys_dir
+        self.configured_kid = active_kid
+        self.active_kid: str | None = None
+        self.private_keys: dict[str, rsa.RSAPrivateKey] = {}
+        self.public_keys: dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ALGORITHM not in HMAC_ALGORITHMS
+
+    def load(self) -> None:
+        """
+        Загрузка ключей из каталога. Если ключей нет, создается новый
+        """
+        if not self.enabled:
+            return
+        os.makedirs(self.keys_dir, exist_ok=True)
+        self.private_keys = {}
+        self.public_keys = {}
+        for name in sorted(os.listdir(self.keys_dir)):
+            if not name.endswith(".pem"):
+                continue
+            with open(os.path.join(self.keys_dir, name), "rb") as key_file:
+                self._add(name[:-len(".pem")], serialization.load_pem_private_key(key_file.read(), password=None))
+        if not self.private_keys:
+            logger.warning(f"No signing keys found in {self.keys_dir}, generating a new one")
+            self.generate()
+
+        # По умолчанию активен самый новый ключ
+        self.active_kid = self.configured_kid or max(self.private_keys)
+        if self.active_kid not in self.private_keys:
+            raise RuntimeError(f"Signing key {self.active_kid} not found in {self.keys_dir}")
+
+    def generate(self) -> str:
+        """
+        Создание нового ключа, идентификатор ключа - время создания
+        """
+        kid = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        os.makedirs(self.keys_dir, exist_ok=True)
+        path = os.path.join(self.keys_dir, f"{kid}.pem")
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") as key_file:
+            key_file.write(private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption(),
+            ))
+        self._add(kid, private_key)
+        return kid
+
+    def _add(self, kid: str, private_key: rsa.RSAPrivateKey) -> None:
+        self.private_keys[kid] = private_key
+        self.public_keys[kid] = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+
+    def private_pem(self, kid: str) -> str:
+        return self.private_keys[kid].private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ).decode()
+
+    def public_pem(self, kid: str | None) -> str | None:
+        return self.public_keys.get(kid)
+
+    @property
+    def token_headers(self) -> dict | None:
+        """
+        Заголовки выпускаемых токенов
+        """
+        return {"kid": self.active_kid} if self.enabled else None
+
+    def jwks(self) -> dict:
+        """
+        Открытые ключи в формате JWK Set
+        """
+        keys = []
+        for kid, private_key in self.private_keys.items():
+            numbers = private_key.public_key().public_numbers()
+            keys.append({
+                "kty": "RSA",
+                "use": "sig",
+                "alg": settings.ALGORITHM,
+                "kid": kid,
+                "n": _b64url_uint(numbers.n),
+                "e": _b64url_uint(numbers.e),
+            })
+        return {"keys": keys}
+
+
+key_store = KeyStore(
+    keys_dir=settings.JWT_KEYS_DIR or os.path.join(BASE_DIR, "keys"),
+    active_kid=settings.JWT_ACTIVE_KID,
+)
+
+
+if __name__ == "__main__":
+    # Создание нового ключа для ротации: python -m core.keys
+    print(key_store.generate())
@@ -1,16 +1,20 @@
 from fastapi import Request, status
 from fastapi.responses import JSONResponse, ORJSONResponse
-from fastapi_jwt_auth import AuthJWT
 from fastapi_jwt_auth.exceptions import AuthJWTException, JWTDecodeError
 from redis.asyncio import Redis
 
 from core.config import settings
+from core.jwt import AuthJWT
+from core.revocation import RevocationCache
 
 redis_client = Redis(host=settings.redis_host, port=settings.redis_port)
+revocation_cache = RevocationCache(redis_client)
+
+# Экземпляр без запроса не хранит состояние, поэтому используется для всех запросов
+Authorize = AuthJWT()
 
 
 async def check_blacklist(request: Request, call_next):
-    Authorize = AuthJWT()
     token = request.headers.get("Authorization")
     refresh_token = request.headers.get("X-Refresh-Token")
     if token:
@@ -19,7 +23,7 @@ async def check_blacklist(request: Request, call_next):
             raw_jwt = Authorize.get_raw_jwt(encoded_token=access_token)
             jti = raw_jwt.get('jti')
 
-            if await redis_client.get(f"invalid_token:{jti}"):
+            if await revocation_cache.is_revoked(jti):
                 return JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     content={"detail": "Token is blacklisted"}
@@ -41,7 +45,7 @@ async def check_blacklist(request: Request, call_next):
             raw_jwt = Authorize.get_raw_jwt(encoded_token=refresh_token)
             jti = raw_jwt.get('jti')
 
-            if await redis_client.get(f"invalid_token:{jti}"):
+            if await revocation_cache.is_revoked(jti):
                 return JSONResponse(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     content={"detail": "Refresh token is blacklisted"}
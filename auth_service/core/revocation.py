@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import math
+
+from redis.asyncio import Redis
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALID_TOKEN_PREFIX = "invalid_token:"
+REVOKED_TOKENS_CHANNEL = "revoked_tokens"
+
+
+class BloomFilter:
+    """
+    Фильтр Блума: отвечает "точно нет" или "возможно да"
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Двойное хеширование: позиции h1 + i * h2 из одного дайджеста
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationCache:
+    """
+    Локальный кэш отозванных токенов.
+
+    jti отозванных токенов хранятся в фильтре Блума, который пополняется
+    через Redis pub/sub и периодически перестраивается по ключам invalid_token:*,
+    чтобы отбросить истекшие записи. Для неотозванного токена проверка
+    не требует обращения к Redis, положительный ответ фильтра подтверждается в Redis.
+    Пока подписка не активна, проверка выполняется напрямую в Redis.
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.bloom = self._new_filter()
+        self.ready = False
+        self._tasks: list[asyncio.Task] = []
+        # jti, полученные по подписке во время перестроения фильтра
+        self._received_during_rebuild: set[str] | None = None
+
+    @staticmethod
+    def _new_filter() -> BloomFilter:
+        return BloomFilter(settings.revocation_bloom_capacity, settings.revocation_bloom_error_rate)
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._expire_legacy_keys()),
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._rebuild_periodically()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.ready = False
+
+    async def is_revoked(self, jti: str) -> bool:
+        if self.ready and jti not in self.bloom:
+            return False
+        return bool(await self.redis.exists(f"{INVALID_TOKEN_PREFIX}{jti}"))
+
+    async def rebuild(self) -> None:
+        """
+        Построение нового фильтра по актуальным ключам в Redis
+        """
+        bloom = self._new_filter()
+        self._received_during_rebuild = set()
+        try:
+            async for key in self.redis.scan_iter(match=f"{INVALID_TOKEN_PREFIX}*", count=1000):
+                bloom.add(key.decode()[len(INVALID_TOKEN_PREFIX):])
+            # SCAN может не вернуть ключи, добавленные во время обхода
+            for jti in self._received_during_rebuild:
+                bloom.add(jti)
+            self.bloom = bloom
+        finally:
+            self._received_during_rebuild = None
+
+    def _add(self, jti: str) -> None:
+        self.bloom.add(jti)
+        if self._received_during_rebuild is not None:
+            self._received_during_rebuild.add(jti)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                # Сначала подписываемся, затем загружаем существующие ключи,
+                # чтобы не пропустить отзывы между этими шагами
+                await pubsub.subscribe(REVOKED_TOKENS_CHANNEL)
+                await self.rebuild()
+                self.ready = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._add(message["data"].decode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Revoked tokens subscription failed: {e}")
+                self.ready = False
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def _rebuild_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.revocation_rebuild_interval)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Revoked tokens filter rebuild failed: {e}")
+
+    async def _expire_legacy_keys(self) -> None:
+        """
+        Установка TTL ключам, созданным без срока жизни
+        """
+        try:
+            async for key in self.redis.scan_iter(match=f"{INVALID_TOKEN_PREFIX}*", count=1000):
+                if await self.redis.ttl(key) == -1:
+                    await self.redis.expire(key, settings.REFRESH_TOKEN_EXPIRES * 60)
+        except Exception as e:
+            logger.error(f"Failed to set TTL on revoked tokens: {e}")
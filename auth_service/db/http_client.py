@@ -0,0 +1,100 @@
+import httpx
+
+from core.config import settings
+
+client: httpx.AsyncClient | None = None
+transport: "TrackedTransport | None" = None
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """
+    Тело ответа, сообщающее транспорту о закрытии
+    """
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        if self._on_close is not None:
+            self._on_close()
+            self._on_close = None
+        await self._stream.aclose()
+
+
+class TrackedTransport(httpx.AsyncHTTPTransport):
+    """
+    Транспорт с подсчетом запросов, выполняемых через пул соединений.
+    Запрос считается выполняемым до закрытия тела ответа
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.requests_total += 1
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            self.errors_total += 1
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(response.stream, self._finished),
+            extensions=response.extensions,
+        )
+
+    def _finished(self) -> None:
+        self.in_flight -= 1
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Создание HTTP клиента с пулом keep-alive соединений
+    """
+    global transport
+    transport = TrackedTransport(
+        limits=httpx.Limits(
+            max_connections=settings.http_client.max_connections,
+            max_keepalive_connections=settings.http_client.max_keepalive_connections,
+            keepalive_expiry=settings.http_client.keepalive_expiry,
+        ),
+        http2=settings.http_client.http2,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(
+            settings.http_client.timeout,
+            connect=settings.http_client.connect_timeout,
+        ),
+    )
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    if not client:
+        raise ValueError("HTTP client is not initialized")
+    return client
+
+
+def get_pool_stats() -> dict:
+    """
+    Статистика запросов через пул соединений HTTP клиента
+    """
+    return {
+        "in_flight": transport.in_flight if transport else 0,
+        "requests_total": transport.requests_total if transport else 0,
+        "errors_total": transport.errors_total if transport else 0,
+        "max_connections": settings.http_client.max_connections,
+        "max_keepalive_connections": settings.http_client.max_keepalive_connections,
+        "http2": settings.http_client.http2,
+    }
@@ -2,19 +2,19 @@ import os
 from contextlib import asynccontextmanager
 
 import sentry_sdk
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.responses import ORJSONResponse
-from fastapi_jwt_auth import AuthJWT
 from fastapi_jwt_auth.exceptions import AuthJWTException
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from redis.asyncio import Redis
 
-from api.v1 import oauth_router, roles, users
+from api.v1 import internal, oauth_router, roles, users
 from core.config import settings
-from core.jwt import JWTSettings
-from core.middleware import before_request, check_blacklist
+from core.jwt import AuthJWT, get_jwt_settings
+from core.keys import key_store
+from core.middleware import before_request, check_blacklist, revocation_cache
 from core.tracer import init_tracer
-from db import redis
+from db import http_client, redis
 from utils.exception_handlers import authjwt_exception_handler
 from utils.sentry_hook import before_send
 
@@ -29,11 +29,16 @@ sentry_sdk.init(
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    AuthJWT.load_config(lambda: JWTSettings())
+    key_store.load()
+    AuthJWT.load_config(get_jwt_settings)
     redis.connection = Redis(host=settings.redis_host, port=settings.redis_port)
+    http_client.client = http_client.create_http_client()
+    await revocation_cache.start()
 
     yield
 
+    await revocation_cache.stop()
+    await http_client.client.aclose()
     await redis.connection.close()
 
 
@@ -58,3 +63,13 @@ app.middleware("http")(check_blacklist)
 app.include_router(users.router, prefix="/api/v1/auth/users", tags=["users"])
 app.include_router(roles.router, prefix="/api/v1/auth/roles", tags=["roles"])
 app.include_router(oauth_router.router, prefix="/api/v1/auth", tags=["yandex"])
+app.include_router(internal.router, prefix="/api/v1/internal")
+
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks(response: Response):
+    """
+    Открытые ключи для проверки подписи токенов
+    """
+    response.headers["Cache-Control"] = f"public, max-age={settings.JWKS_MAX_AGE}"
+    return key_store.jwks()
@@ -8,7 +8,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from core.config import settings
-from db.postgres import get_db_session, get_http_client
+from db.http_client import get_http_client
+from db.postgres import get_db_session
 from models.social import SocialAccount
 from schema.tokens import TokenResponse
 from schema.users import UserCreate
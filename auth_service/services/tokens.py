@@ -7,6 +7,8 @@ from opentelemetry import trace
 from redis.asyncio import Redis
 
 from core.config import settings
+from core.keys import key_store
+from core.revocation import INVALID_TOKEN_PREFIX, REVOKED_TOKENS_CHANNEL
 from core.tracer import traced
 from schema.tokens import TokenResponse
 
@@ -27,12 +29,14 @@ class TokenService:
             subject=str(user_id),
             user_claims={**claims, 'jti': access_jti},
             fresh=True,
+            headers=key_store.token_headers,
             expires_time=datetime.timedelta(minutes=settings.ACCESS_TOKEN_EXPIRES)
         )
         refresh_jti = str(uuid.uuid4())
         refresh_token = authorize.create_refresh_token(
             subject=str(user_id),
             user_claims={'access_jti': access_jti, 'jti': refresh_jti},
+            headers=key_store.token_headers,
             expires_time=datetime.timedelta(minutes=settings.REFRESH_TOKEN_EXPIRES)
         )
         with tracer.start_as_current_span("set_access_token_redis_request"):
@@ -53,9 +57,22 @@ class TokenService:
     @traced(__name__)
     async def add_tokens_to_invalid(self, access_jti: str, refresh_jti: str, user_id: UUID):
         """
-        Добавление Access и Refresh токенов в невалидные
+        Добавление Access и Refresh токенов в невалидные.
+        Записи хранятся не дольше времени жизни токенов, об отзыве
+        оповещаются локальные кэши отозванных токенов
         """
-        with tracer.start_as_current_span("set_access_token_redis_request"):
-            await self.redis.set(f"invalid_token:{access_jti}", str(user_id))
-        with tracer.start_as_current_span("set_refresh_token_redis_request"):
-            await self.redis.set(f"invalid_token:{refresh_jti}", str(user_id))
+        with tracer.start_as_current_span("set_invalid_tokens_redis_request"):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(
+                    f"{INVALID_TOKEN_PREFIX}{access_jti}",
+                    str(user_id),
+                    ex=settings.ACCESS_TOKEN_EXPIRES * 60
+                )
+                pipe.set(
+                    f"{INVALID_TOKEN_PREFIX}{refresh_jti}",
+                    str(user_id),
+                    ex=settings.REFRESH_TOKEN_EXPIRES * 60
+                )
+                pipe.publish(REVOKED_TOKENS_CHANNEL, access_jti)
+                pipe.publish(REVOKED_TOKENS_CHANNEL, refresh_jti)
+                await pipe.execute()
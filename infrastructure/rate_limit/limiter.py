@@ -0,0 +1,230 @@
+import hashlib
+import json
+import math
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import aiohttp
+import jwt
+from fastapi import Request
+from jwt import PyJWTError
+from jwt.algorithms import RSAAlgorithm
+from redis.asyncio import Redis
+
+# Token bucket: емкость корзины = лимит, корзина полностью пополняется за period секунд.
+# Скрипт выполняется атомарно на стороне Redis за один запрос,
+# время берется из Redis, чтобы реплики шлюза не зависели от своих часов.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local period_ms = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local rate = capacity / period_ms
+
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+if tokens == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = math.ceil((cost - tokens) / rate)
+end
+
+local reset = math.ceil((capacity - tokens) / rate)
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], reset + 1000)
+
+return {allowed, math.floor(tokens), retry_after, reset}
+"""
+
+# Открытые ключи сервиса авторизации по kid для асимметричных алгоритмов подписи
+jwks_keys: dict = {}
+
+IDENTITY_IP = "ip"
+IDENTITY_USER = "user"
+IDENTITY_API_KEY = "api_key"
+# Известный ключ API, затем пользователь из JWT, затем IP
+IDENTITY_AUTO = "auto"
+
+
+def load_api_keys() -> frozenset[str]:
+    """
+    SHA-256 выданных ключей API из переменной окружения RATE_LIMIT_API_KEYS (через запятую).
+    Лимит по ключу считается только для этих ключей, иначе клиент получал бы
+    новую корзину на каждый придуманный ключ
+    """
+    return frozenset(
+        digest.strip().lower() for digest in os.getenv("RATE_LIMIT_API_KEYS", "").split(",") if digest.strip()
+    )
+
+
+api_keys = load_api_keys()
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    route: str
+    limit: int
+    period: int
+    identity: str = IDENTITY_AUTO
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int
+    period: int
+
+    @property
+    def headers(self) -> dict:
+        """
+        Стандартные заголовки RateLimit-*
+        """
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(self.reset),
+            "RateLimit-Policy": f"{self.limit};w={self.period}",
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def load_rules(default_limit: int, default_period: int) -> list[RateLimitRule]:
+    """
+    Загрузка правил из переменной окружения RATE_LIMIT_RULES, например:
+    [{"route": "/api/v1/auth/users/login", "limit": 5, "period": 60, "identity": "ip"}]
+    Правило для "/" с лимитом по умолчанию добавляется всегда.
+    """
+    rules = [RateLimitRule(**rule) for rule in json.loads(os.getenv("RATE_LIMIT_RULES", "[]"))]
+    if not any(rule.route == "/" for rule in rules):
+        rules.append(RateLimitRule(route="/", limit=default_limit, period=default_period))
+    return sorted(rules, key=lambda rule: len(rule.route), reverse=True)
+
+
+def get_client_ip(request: Request) -> str:
+    # Шлюз работает за nginx, который передает адрес клиента в X-Real-IP
+    return request.headers.get("X-Real-IP") or request.client.host
+
+
+def uses_jwks() -> bool:
+    return not os.getenv("ALGORITHM", "HS256").startswith("HS")
+
+
+async def refresh_jwks(session: aiohttp.ClientSession, url: str) -> None:
+    """
+    Загрузка открытых ключей сервиса авторизации
+    """
+    async with session.get(url) as response:
+        response.raise_for_status()
+        data = await response.json()
+    keys = {key["kid"]: RSAAlgorithm.from_jwk(json.dumps(key)) for key in data["keys"]}
+    jwks_keys.clear()
+    jwks_keys.update(keys)
+
+
+def decode_token(token: str) -> dict | None:
+    """
+    Проверка подписи токена общим секретом или открытым ключом по kid
+    """
+    try:
+        if uses_jwks():
+            key = jwks_keys.get(jwt.get_unverified_header(token).get("kid"))
+            if key is None:
+                return None
+        else:
+            key = os.getenv("JWT_SECRET_KEY")
+        return jwt.decode(token, key, algorithms=[os.getenv("ALGORITHM")])
+    except PyJWTError:
+        return None
+
+
+def get_user_id(request: Request) -> str | None:
+    authorization = request.headers.get("Authorization", "")
+    if not authorization.startswith("Bearer "):
+        return None
+    payload = decode_token(authorization[len("Bearer "):])
+    return payload.get("sub") if payload else None
+
+
+def resolve_identity(request: Request, rule: RateLimitRule) -> str:
+    """
+    Определение идентификатора клиента, по которому считается лимит
+    """
+    if rule.identity in (IDENTITY_API_KEY, IDENTITY_AUTO):
+        api_key = request.headers.get("X-API-Key")
+        if api_key:
+            digest = hashlib.sha256(api_key.encode()).hexdigest()
+            # Неизвестный ключ не дает отдельной корзины, лимит считается по пользователю или IP.
+            # Сам ключ не попадает ни в Redis, ни в логи
+            if digest in api_keys:
+                return f"key:{digest[:32]}"
+    if rule.identity in (IDENTITY_USER, IDENTITY_AUTO):
+        user_id = get_user_id(request)
+        if user_id:
+            return f"user:{user_id}"
+    return f"ip:{get_client_ip(request)}"
+
+
+class BaseLimiter(ABC):
+    def __init__(self, rules: list[RateLimitRule]):
+        self.rules = rules
+
+    def match_rule(self, path: str) -> RateLimitRule:
+        """
+        Самое специфичное правило по префиксу пути
+        """
+        for rule in self.rules:
+            if path.startswith(rule.route):
+                return rule
+        return self.rules[-1]
+
+    async def start(self) -> None:
+        ...
+
+    async def stop(self) -> None:
+        ...
+
+    @abstractmethod
+    async def hit(self, rule: RateLimitRule, identity: str, cost: int = 1) -> RateLimitResult:
+        """
+        Учет запроса стоимостью cost и решение, пропускать ли его
+        """
+
+
+class TokenBucketLimiter(BaseLimiter):
+    def __init__(self, redis_conn: Redis, rules: list[RateLimitRule]):
+        super().__init__(rules)
+        # Script вызывает EVALSHA и загружает скрипт заново только при NOSCRIPT
+        self.script = redis_conn.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def hit(self, rule: RateLimitRule, identity: str, cost: int = 1) -> RateLimitResult:
+        allowed, remaining, retry_after, reset = await self.script(
+            keys=[f"rate_limit:{rule.route}:{identity}"],
+            args=[rule.limit, rule.period * 1000, cost],
+        )
+        return RateLimitResult(
+            allowed=bool(allowed),
+            limit=rule.limit,
+            remaining=int(remaining),
+            reset=math.ceil(int(reset) / 1000),
+            retry_after=math.ceil(int(retry_after) / 1000),
+            period=rule.period,
+        )
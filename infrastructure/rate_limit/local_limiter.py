@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from rate_limit.limiter import BaseLimiter, RateLimitResult, RateLimitRule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WindowCounter:
+    period: int
+    window: int  # Номер текущего окна
+    pending: int = 0  # Локальные запросы, еще не отправленные в Redis
+    current: int = 0  # Последнее известное глобальное значение текущего окна
+    previous: int = 0  # Глобальное значение предыдущего окна
+    synced: bool = False
+
+
+class HybridLimiter(BaseLimiter):
+    """
+    Приблизительный лимитер со счетчиками в памяти воркера.
+
+    Решение принимается локально по скользящему окну из двух соседних
+    фиксированных окон: вес предыдущего окна убывает по мере прохождения текущего.
+    Накопленные локально запросы раз в sync_interval отправляются в Redis одним
+    пайплайном, в ответ воркер получает глобальные значения счетчиков всех реплик.
+    Клиенты, превысившие лимит по последнему известному глобальному значению,
+    отклоняются без обращения к Redis. Превышение лимита ограничено трафиком
+    реплик за один интервал синхронизации.
+    """
+
+    def __init__(self, redis_conn: Redis, rules: list[RateLimitRule], sync_interval: float):
+        super().__init__(rules)
+        self.redis = redis_conn
+        self.sync_interval = sync_interval
+        self.counters: dict[tuple[str, str], WindowCounter] = {}
+        self._task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            # Цикл завершается после текущей синхронизации, иначе ее прерванный пайплайн
+            # мог бы уже отправить приращения, которые финальная синхронизация отправит повторно
+            self._stopping.set()
+            await self._task
+            self._task = None
+        try:
+            await self.sync()
+        except Exception as e:
+            logger.error(f"Failed to flush rate limit counters: {e}")
+
+    def _get_counter(self, rule: RateLimitRule, identity: str, now: float) -> WindowCounter:
+        window = int(now // rule.period)
+        counter = self.counters.get((rule.route, identity))
+        if counter is None:
+            counter = WindowCounter(period=rule.period, window=window)
+            self.counters[(rule.route, identity)] = counter
+        elif counter.window != window:
+            # Новое окно: текущее становится предыдущим, если окна соседние
+            counter.previous = counter.current + counter.pending if window == counter.window + 1 else 0
+            counter.window = window
+            counter.pending = 0
+            counter.current = 0
+            counter.synced = False
+        return counter
+
+    async def hit(self, rule: RateLimitRule, identity: str, cost: int = 1) -> RateLimitResult:
+        now = time.time()
+        counter = self._get_counter(rule, identity, now)
+
+        elapsed = now / rule.period - counter.window
+        estimate = counter.previous * (1 - elapsed) + counter.current + counter.pending
+        allowed = estimate + cost <= rule.limit
+        if allowed:
+            counter.pending += cost
+            estimate += cost
+
+        reset = math.ceil((counter.window + 1) * rule.period - now)
+        return RateLimitResult(
+            allowed=allowed,
+            limit=rule.limit,
+            remaining=max(0, math.floor(rule.limit - estimate)),
+            reset=reset,
+            retry_after=0 if allowed else reset,
+            period=rule.period,
+        )
+
+    async def sync(self) -> None:
+        """
+        Отправка накопленных приращений в Redis и получение глобальных значений
+        """
+        current_windows = {}
+        to_sync = []
+        for key, counter in list(self.counters.items()):
+            window = current_windows.setdefault(counter.period, int(time.time() // counter.period))
+            if counter.window < window - 1:
+                # Счетчик не использовался больше окна, состояние устарело
+                del self.counters[key]
+                continue
+            if counter.pending or not counter.synced:
+                to_sync.append((key, counter, counter.window, counter.pending))
+
+        if not to_sync:
+            return
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for (route, identity), counter, window, pending in to_sync:
+                window_key = f"rate_limit:{route}:{identity}:{window}"
+                pipe.incrby(window_key, pending)
+                pipe.expire(window_key, counter.period * 2)
+                pipe.get(f"rate_limit:{route}:{identity}:{window - 1}")
+            results = await pipe.execute()
+
+        for index, (key, counter, window, pending) in enumerate(to_sync):
+            if counter.window != window:
+                continue
+            # Запросы, пришедшие во время синхронизации, остаются в pending
+            counter.pending -= pending
+            counter.current = int(results[index * 3])
+            counter.previous = int(results[index * 3 + 2] or 0)
+            counter.synced = True
+
+    async def _sync_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.sync_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Failed to sync rate limit counters: {e}")
@@ -1,12 +1,17 @@
-import datetime
+import asyncio
 import logging
 import os
+from contextlib import asynccontextmanager
 
 import redis.asyncio as redis
 import sentry_sdk
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from yarl import URL
 import aiohttp
+from rate_limit.limiter import TokenBucketLimiter, load_rules, refresh_jwks, resolve_identity, uses_jwks
+from rate_limit.local_limiter import HybridLimiter
 from rate_limit.sentry_hook import before_send
 
 sentry_sdk.init(
@@ -17,48 +22,119 @@ sentry_sdk.init(
     before_send=before_send,
 )
 
-app = FastAPI()
-
-# Настройки лимитов запросов
-REQUEST_LIMIT_PER_MINUTE = 20  # Установим лимит на 20 запросов в минуту
-EXPIRED_TIME = 59  # Время жизни ключей
+# Лимит по умолчанию, отдельные маршруты настраиваются через RATE_LIMIT_RULES
+REQUEST_LIMIT_PER_MINUTE = int(os.getenv("REQUEST_LIMIT_PER_MINUTE", 20))
+REQUEST_LIMIT_PERIOD = 60
+# redis - точный лимит с запросом в Redis на каждый запрос,
+# hybrid - приблизительный лимит в памяти с периодической синхронизацией через Redis
+RATE_LIMIT_MODE = os.getenv("RATE_LIMIT_MODE", "redis")
+RATE_LIMIT_SYNC_INTERVAL_MS = int(os.getenv("RATE_LIMIT_SYNC_INTERVAL_MS", 100))
 # Хранилище запросов
 REDIS_URL = f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}"
 redis_conn = redis.from_url(REDIS_URL, decode_responses=True)
+rules = load_rules(REQUEST_LIMIT_PER_MINUTE, REQUEST_LIMIT_PERIOD)
+if RATE_LIMIT_MODE == "hybrid":
+    limiter = HybridLimiter(redis_conn, rules, sync_interval=RATE_LIMIT_SYNC_INTERVAL_MS / 1000)
+else:
+    limiter = TokenBucketLimiter(redis_conn, rules)
 
 SERVICE_MAP = {
     "/api/auth": "http://auth:8082",
     "/api/v1/auth": "http://auth:8082",
 }
 
+# Настройки пула соединений к сервисам
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 100))
+UPSTREAM_KEEPALIVE_TIMEOUT = float(os.getenv("UPSTREAM_KEEPALIVE_TIMEOUT", 30))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", 30))
+
+# Заголовки, которые относятся к конкретному соединению и не проксируются
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+}
+
+# Открытые ключи для проверки токенов при асимметричной подписи
+JWKS_URL = os.getenv("JWKS_URL", "http://auth:8082/.well-known/jwks.json")
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", 300))
+
+# Сессия с собственным пулом keep-alive соединений на каждый сервис
+sessions: dict[str, aiohttp.ClientSession] = {}
+
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:     %(message)s')
 logger = logging.getLogger(__name__)
 
 
+async def refresh_jwks_periodically(session: aiohttp.ClientSession):
+    while True:
+        try:
+            await refresh_jwks(session, JWKS_URL)
+        except Exception as e:
+            logger.error(f"Failed to refresh JWKS: {e}")
+        await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for upstream in set(SERVICE_MAP.values()):
+        sessions[upstream] = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=UPSTREAM_POOL_SIZE,
+                keepalive_timeout=UPSTREAM_KEEPALIVE_TIMEOUT,
+            ),
+            timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT),
+            # Тело ответа передается клиенту как есть, вместе с Content-Encoding
+            auto_decompress=False,
+        )
+    jwks_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT))
+    jwks_task = asyncio.create_task(refresh_jwks_periodically(jwks_session)) if uses_jwks() else None
+    await limiter.start()
+    yield
+    await limiter.stop()
+    if jwks_task:
+        jwks_task.cancel()
+    await jwks_session.close()
+    for session in sessions.values():
+        await session.close()
+    sessions.clear()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
 @app.middleware("http")
 async def rate_limiter(request: Request, call_next):
-    client_ip = request.client.host
-    now = datetime.datetime.now()
-    key = f'{client_ip}:{now.minute}'
-
-    async with redis_conn.pipeline() as pipe:
-        # Увеличиваем значение и задаем время жизни ключа
-        pipe.incr(key)
-        pipe.expire(key, EXPIRED_TIME)
-        result = await pipe.execute()
+    rule = limiter.match_rule(request.url.path)
+    identity = resolve_identity(request, rule)
+    result = await limiter.hit(rule, identity)
 
-    request_number = result[0]
-    logger.info(f"Client IP: {client_ip}, Request number: {request_number}")
+    logger.info(f"Client: {identity}, Route: {rule.route}, Remaining: {result.remaining}")
 
-    if request_number > REQUEST_LIMIT_PER_MINUTE:
-        logger.warning(f"Rate limit exceeded for IP: {client_ip}")
-        return JSONResponse(status_code=429, content={"message": "Too Many Requests"})
+    if not result.allowed:
+        logger.warning(f"Rate limit exceeded for {identity}")
+        return JSONResponse(status_code=429, content={"message": "Too Many Requests"}, headers=result.headers)
 
     response = await call_next(request)
+    response.headers.update(result.headers)
     return response
 
 
-@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+def filter_headers(headers) -> list[tuple[str, str]]:
+    """
+    Отбрасывает hop-by-hop заголовки, сохраняя повторяющиеся (например, Set-Cookie)
+    """
+    return [(name, value) for name, value in headers.items() if name.lower() not in HOP_BY_HOP_HEADERS]
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
 async def proxy(request: Request, path: str):
     target_path = f"/{path}"
     target_url = None
@@ -71,35 +147,34 @@ async def proxy(request: Request, path: str):
     if not target_url:
         raise HTTPException(status_code=400, detail="Invalid target path")
 
-    async with aiohttp.ClientSession() as client:
-        request_body = await request.body()
-        headers = dict(request.headers)
-        params = dict(request.query_params)
-        method = request.method
-        url = f"{target_url}{target_path}"
-
-        if request_body:
-            # Если есть тело запроса, отправляем его как data
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=headers,
-                params=params,
-                data=request_body
-            )
-        else:
-            # Если нет тела запроса, просто отправляем запрос без данных
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=headers,
-                params=params
-            )
-
-        # Проверяем тип содержимого ответа перед декодированием как JSON
-        if response.headers.get("Content-Type") == "application/json":
-            response_content = await response.json()
-        else:
-            response_content = await response.text()
-        logger.info(f"Proxied request to {url} with status {response.status}")
-        return JSONResponse(status_code=response.status, content=response_content)
+    url = f"{target_url}{target_path}"
+    if request.url.query:
+        url = f"{url}?{request.url.query}"
+
+    # Тело запроса передается потоком, без буферизации в памяти шлюза
+    has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+
+    try:
+        response = await sessions[target_url].request(
+            method=request.method,
+            url=URL(url, encoded=True),
+            headers=filter_headers(request.headers),
+            data=request.stream() if has_body else None,
+            allow_redirects=False,
+        )
+    except aiohttp.ClientError as e:
+        logger.error(f"Failed to proxy request to {url}: {e}")
+        return JSONResponse(status_code=502, content={"message": "Bad Gateway"})
+
+    logger.info(f"Proxied request to {url} with status {response.status}")
+
+    proxied_response = StreamingResponse(
+        response.content.iter_any(),
+        status_code=response.status,
+        background=BackgroundTask(response.release),
+    )
+    proxied_response.raw_headers = [
+        (name.lower().encode("latin-1"), value.encode("latin-1"))
+        for name, value in filter_headers(response.headers)
+    ]
+    return proxied_response
@@ -1,7 +1,4 @@
-import os
-
-import jwt
-from jwt import PyJWTError
+from rate_limit.limiter import decode_token
 
 
 def before_send(event, hint):
@@ -38,21 +35,19 @@ def extract_user_data_from_token(token: str) -> dict:
     :param token: JWT-токен из заголовка Authorization.
     :return: Словарь с id, first_name и last_name пользователя или {"anonymous": True}, если не удалось извлечь.
     """
-    try:
-        if token.startswith("Bearer "):
-            token = token[len("Bearer "):]
-
-        # Декодируем JWT-токен
-        payload = jwt.decode(token, os.getenv("JWT_SECRET_KEY"), algorithms=[os.getenv("ALGORITHM")])
+    if token.startswith("Bearer "):
+        token = token[len("Bearer "):]
 
-        _id = payload.get("id")
-        first_name = payload.get("first_name")
-        last_name = payload.get("last_name")
+    # Декодируем JWT-токен
+    payload = decode_token(token)
+    if not payload:
+        return {"anonymous": True}
 
-        if _id:
-            return {"id": _id, "first_name": first_name, "last_name": last_name}
-        else:
-            return {"anonymous": True}
+    _id = payload.get("id")
+    first_name = payload.get("first_name")
+    last_name = payload.get("last_name")
 
-    except PyJWTError:
+    if _id:
+        return {"id": _id, "first_name": first_name, "last_name": last_name}
+    else:
         return {"anonymous": True}
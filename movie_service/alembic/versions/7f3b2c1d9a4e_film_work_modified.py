@@ -0,0 +1,47 @@
+"""Film work modified timestamp
+
+Revision ID: 7f3b2c1d9a4e
+Revises: c4dafce045b3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7f3b2c1d9a4e'
+down_revision: Union[str, None] = 'c4dafce045b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'film_work',
+        sa.Column('modified', sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        schema='movie'
+    )
+    op.create_index('film_work_modified_id_idx', 'film_work', ['modified', 'id'], schema='movie')
+    # modified обновляется при любом UPDATE, в том числе не через ORM
+    op.execute("""
+        CREATE OR REPLACE FUNCTION movie.set_modified() RETURNS trigger AS $$
+        BEGIN
+            NEW.modified = now();
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER film_work_set_modified
+        BEFORE UPDATE ON movie.film_work
+        FOR EACH ROW EXECUTE FUNCTION movie.set_modified()
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS film_work_set_modified ON movie.film_work")
+    op.execute("DROP FUNCTION IF EXISTS movie.set_modified()")
+    op.drop_index('film_work_modified_id_idx', table_name='film_work', schema='movie')
+    op.drop_column('film_work', 'modified', schema='movie')
@@ -1,14 +1,21 @@
 from http import HTTPStatus
-from typing import List
+from typing import List, Literal
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from movie_service.models.base_model import SearchParams
-from movie_service.schemas.film import FilmDto
+from movie_service.core.config import settings
+from movie_service.schemas.film import FilmDto, FilmExistenceDto, FilmIdsRequest, FilmsDto
+from movie_service.schemas.film_search import FilmSearchDto
+from movie_service.schemas.leaderboard import LeaderboardEntryDto
 from movie_service.schemas.ratings import RatingsDto
 from movie_service.schemas.review import ReviewsDto
+from movie_service.services.film_cache import etag_matches, film_cache
+from movie_service.services.film_search import film_search
 from movie_service.services.films import FilmServiceABC
+from movie_service.services.leaderboard import leaderboard
 
 router = APIRouter()
 
@@ -16,21 +23,112 @@ router = APIRouter()
 @router.get("/get_film", response_model=FilmDto)
 async def get_film(
         *,
+        request: Request,
         service: FilmServiceABC = Depends(),
         film_id: UUID
-) -> FilmDto or None:
+) -> Response:
     """
-    Получение информации о фильме по идентификатору
+    Получение информации о фильме по идентификатору.
+    Ответ кэшируется, по заголовку If-None-Match возвращается 304
 
     film_id: идентификатор UUID фильма, по которому хотим получить информацию
     """
-    film = await service.get_film(film_id)
+    film = await film_cache.get(film_id, lambda: service.get_film(film_id))
     if not film:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
             detail="Not found film"
         )
-    return film
+    headers = {"ETag": film.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), film.etag):
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers=headers)
+    return Response(content=film.body, media_type="application/json", headers=headers)
+
+
+@router.post("/films", response_model=FilmsDto)
+async def get_films(
+        *,
+        service: FilmServiceABC = Depends(),
+        request: FilmIdsRequest
+) -> FilmsDto:
+    """
+    Получение информации о нескольких фильмах, например для страницы каталога
+
+    ids: список идентификаторов UUID фильмов (не более 1000 за запрос),
+    фильмы возвращаются в порядке запроса
+    """
+    return await service.get_films(request.ids)
+
+
+@router.post("/films/exists", response_model=FilmExistenceDto)
+async def check_films_exist(
+        *,
+        service: FilmServiceABC = Depends(),
+        request: FilmIdsRequest
+) -> FilmExistenceDto:
+    """
+    Пакетная проверка существования фильмов
+
+    ids: список идентификаторов UUID фильмов (не более 1000 за запрос)
+    """
+    return await service.get_existing_film_ids(request.ids)
+
+
+@router.get("/films/search", response_model=FilmSearchDto)
+async def search_films(
+        *,
+        query: str | None = None,
+        genre: List[str] = Query([]),
+        director: str | None = None,
+        actor: str | None = None,
+        sort: Literal["relevance", "-rating", "rating", "-imdb_rating", "-created"] = Query("relevance"),
+        page_size: int = Query(20, ge=1, le=100),
+        page_number: int = Query(1, ge=1, le=500)
+) -> FilmSearchDto:
+    """
+    Поиск фильмов по названию, описанию и участникам с фильтрами и фасетами.
+    Опечатки в названии допускаются, фасеты считаются по найденным фильмам
+
+    genre: жанры фильма, можно указать несколько
+    sort: relevance, -rating, rating, -imdb_rating или -created
+    """
+    try:
+        return await film_search.search(query, genre, director, actor, sort, page_size, page_number)
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            detail=f"Film search is unavailable: {e}"
+        )
+
+
+@router.get("/films/top_rated", response_model=List[LeaderboardEntryDto])
+async def get_top_rated_films(
+        *,
+        limit: int = Query(10, ge=1, le=settings.leaderboard.max_limit),
+        min_votes: int | None = Query(None, ge=0),
+        genre: str | None = None
+) -> List[LeaderboardEntryDto]:
+    """
+    Фильмы с наибольшим байесовским средним рейтингом
+
+    min_votes: минимальное число оценок фильма, по умолчанию из настроек
+    genre: жанр фильма
+    """
+    return leaderboard.top_rated(limit, min_votes, genre)
+
+
+@router.get("/films/most_reviewed", response_model=List[LeaderboardEntryDto])
+async def get_most_reviewed_films(
+        *,
+        limit: int = Query(10, ge=1, le=settings.leaderboard.max_limit),
+        genre: str | None = None
+) -> List[LeaderboardEntryDto]:
+    """
+    Фильмы с наибольшим количеством рецензий
+
+    genre: жанр фильма
+    """
+    return leaderboard.most_reviewed(limit, genre)
 
 
 @router.get("/get_reviews", response_model=List[ReviewsDto])
@@ -41,20 +139,26 @@ async def get_reviews(
         page_size: int = 5,
         page_number: int = 1,
         sort: str | None = "-created_at",
+        cursor: str | None = None,
 ) -> List[ReviewsDto] or None:
     """
     Получение всех рецензий фильма по идентификатору фильма
 
     film_id: идентификатор UUID фильма, по которому хотим получить рецензии
+    cursor: курсор последней полученной рецензии, вместо номера страницы
     """
-    reviews = await service.get_reviews(
-        film_id,
-        params=SearchParams(
-            sort=sort,
-            page_size=page_size,
-            page_number=page_number
+    try:
+        reviews = await service.get_reviews(
+            film_id,
+            params=SearchParams(
+                sort=sort,
+                page_size=page_size,
+                page_number=page_number,
+                cursor=cursor
+            )
         )
-    )
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(e))
     if not reviews:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
@@ -70,21 +174,27 @@ async def get_ratings(
         film_id: UUID,
         page_size: int = 5,
         page_number: int = 1,
-        sort: str | None = "-rating"
+        sort: str | None = "-rating",
+        cursor: str | None = None
 ) -> List[RatingsDto] or None:
     """
     Получение всех оценок для фильма по идентификатору фильма
 
     film_id: идентификатор UUID фильма, по которому хотим получить оценки
+    cursor: курсор последней полученной оценки, вместо номера страницы
     """
-    ratings = await service.get_all_ratings(
-        film_id,
-        params=SearchParams(
-            page_size=page_size,
-            page_number=page_number,
-            sort=sort
+    try:
+        ratings = await service.get_all_ratings(
+            film_id,
+            params=SearchParams(
+                page_size=page_size,
+                page_number=page_number,
+                sort=sort,
+                cursor=cursor
+            )
         )
-    )
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPStatus.BAD_REQUEST, detail=str(e))
     if not ratings:
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND,
@@ -39,6 +39,93 @@ class MongoDataBaseSettings(BaseSettings):
         return f"mongodb://{self.initdb_root_username}:{self.initdb_root_password}@{self.host}:{self.port}"
 
 
+class HttpClientSettings(BaseSettings):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 5.0
+    connect_timeout: float = 2.0
+    http2: bool = True
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "MOVIE_API_HTTP_"
+
+
+class RedisSettings(BaseSettings):
+    host: str = "redis"
+    port: int = 6379
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "REDIS_"
+
+
+class FilmCacheSettings(BaseSettings):
+    """
+    Настройки кэша карточек фильмов
+
+    Атрибуты:
+        max_size: Максимальное количество карточек в памяти процесса.
+        fresh_ttl: Время, в течение которого карточка считается актуальной (в секундах).
+        stale_ttl: Время, в течение которого устаревшая карточка отдается
+            на время фонового обновления (в секундах).
+    """
+    max_size: int = 10000
+    fresh_ttl: int = 60
+    stale_ttl: int = 3600
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "MOVIE_API_FILM_CACHE_"
+
+
+class FilmSearchSettings(BaseSettings):
+    """
+    Настройки поиска фильмов
+
+    Атрибуты:
+        index: Имя индекса Elasticsearch.
+        sync_interval: Интервал инкрементальной выгрузки фильмов и рейтингов (в секундах).
+        full_sync_interval: Интервал полной выгрузки, удаляющей из индекса исчезнувшие фильмы (в секундах).
+        batch_size: Количество фильмов в одной пачке выгрузки.
+    """
+    host: str = "elasticsearch_db"
+    port: int = 9200
+    index: str = "films"
+    sync_interval: int = 10
+    full_sync_interval: int = 86400
+    batch_size: int = 1000
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "MOVIE_API_FILM_SEARCH_"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class LeaderboardSettings(BaseSettings):
+    """
+    Настройки рейтингов фильмов (топ по оценкам и по рецензиям)
+
+    Атрибуты:
+        refresh_interval: Интервал загрузки изменившихся агрегатов (в секундах).
+        full_refresh_interval: Интервал полной перезагрузки (в секундах).
+        min_votes: Минимальное число оценок по умолчанию, оно же вес байесовского среднего.
+        max_limit: Максимальный размер выдачи.
+    """
+    refresh_interval: int = 10
+    full_refresh_interval: int = 3600
+    min_votes: int = 50
+    max_limit: int = 100
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "MOVIE_API_LEADERBOARD_"
+
+
 class Settings(BaseSettings):
     # App
     project_name: str = Field(default="Movie API", env="Movie API")
@@ -50,6 +137,17 @@ class Settings(BaseSettings):
     log_sql_queries: bool = False
     # Mongo
     mongo_db = MongoDataBaseSettings()
+    # Redis
+    redis: RedisSettings = RedisSettings()
+    film_cache: FilmCacheSettings = FilmCacheSettings()
+    # HTTP клиент
+    http_client: HttpClientSettings = HttpClientSettings()
+    # Токен служебных эндпоинтов /api/v1/internal (заголовок X-Internal-Token), пусто - эндпоинты отключены
+    internal_token: str | None = Field(default=None, env="MOVIE_API_INTERNAL_TOKEN")
+    # Поиск фильмов
+    film_search: FilmSearchSettings = FilmSearchSettings()
+    # Топы фильмов
+    leaderboard: LeaderboardSettings = LeaderboardSettings()
 
 
 # Создаем экземпляр класса Settings для хранения настроек
@@ -1,17 +1,33 @@
 from beanie import init_beanie
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 from movie_service.core.config import settings
-from movie_service.models.db_models import reviewsCollection, ratingsCollection
+from movie_service.models.db_models import reviewsCollection, ratingsCollection, ratingAggregatesCollection
 
+client: AsyncIOMotorClient | None = None
 
-async def init_mongo() -> AsyncIOMotorClient:
+
+async def start_mongo() -> AsyncIOMotorClient:
     """
-    Инициализация Монго
+    Создание общего клиента Монго и инициализация моделей
     """
+    global client
     client = AsyncIOMotorClient(settings.mongo_db.url, uuidRepresentation='standard')
-    db = client[settings.mongo_db.default_database]
+    await init_beanie(
+        database=get_database(),
+        document_models=[reviewsCollection, ratingsCollection, ratingAggregatesCollection]
+    )
+    return client
+
+
+def get_database() -> AsyncIOMotorDatabase:
+    return client[settings.mongo_db.default_database]
 
-    await init_beanie(database=db, document_models=[reviewsCollection, ratingsCollection])
-    yield client
-    client.close()
+
+async def init_mongo() -> AsyncIOMotorClient:
+    """
+    Общий клиент Монго
+    """
+    if not client:
+        raise ValueError("Mongo client is not initialized")
+    return client
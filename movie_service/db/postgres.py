@@ -1,6 +1,3 @@
-from typing import AsyncGenerator
-
-import httpx
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
@@ -33,11 +30,3 @@ async def get_db_session() -> AsyncSession:
             raise
         finally:
             await session.close()
-
-
-async def get_http_client() -> AsyncGenerator[httpx.AsyncClient, None]:
-    """
-    Генератор для получения httpx.AsyncClient
-    """
-    async with httpx.AsyncClient() as client:
-        yield client
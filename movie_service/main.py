@@ -1,13 +1,38 @@
 import logging
+from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import ORJSONResponse
+from redis.asyncio import Redis
 
 from movie_service.api.v1.films import router as router_films
+from movie_service.api.v1.internal import router as router_internal
 from movie_service.core.config import settings
 from movie_service.core.logger import LOGGING
+from movie_service.db import http_client, mongo, redis
 from movie_service.dependencies.main import setup_dependencies
+from movie_service.services.film_cache import film_cache
+from movie_service.services.film_search import film_index_etl
+from movie_service.services.leaderboard import leaderboard
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client.client = http_client.create_http_client()
+    redis.connection = Redis(host=settings.redis.host, port=settings.redis.port)
+    await film_cache.start(redis.connection)
+    await mongo.start_mongo()
+    await leaderboard.start(mongo.get_database())
+    await film_index_etl.start(redis.connection, mongo.get_database())
+    yield
+    await film_index_etl.stop()
+    await leaderboard.stop()
+    await film_cache.stop()
+    await redis.connection.aclose()
+    mongo.client.close()
+    await http_client.client.aclose()
+
 
 app = FastAPI(
     title=settings.project_name,
@@ -15,12 +40,16 @@ app = FastAPI(
     docs_url="/api/movie/openapi",
     openapi_url="/api/movie/openapi.json",
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.include_router(router_films, prefix="/api/v1/movie", tags=["Get info films"])
 
+app.include_router(router_internal, prefix="/api/v1/internal")
+
 setup_dependencies(app)
 
+
 if __name__ == '__main__':
     uvicorn.run(
         'main:app',
@@ -10,3 +10,4 @@ class PaginatedParams(BaseModel):
 
 class SearchParams(PaginatedParams):
     sort: Optional[str]
+    cursor: Optional[str]
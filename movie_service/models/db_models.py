@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 
 from beanie import Document
-from sqlalchemy import ARRAY, Column, DateTime, String, Float
+from sqlalchemy import ARRAY, Column, DateTime, Float, Index, String
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 
@@ -11,7 +11,11 @@ from movie_service.db.postgres import Base
 
 class Film(Base):
     __tablename__ = "film_work"
-    __table_args__ = {"schema": "movie"}
+    __table_args__ = (
+        # Инкрементальная выгрузка в поисковый индекс идет по (modified, id)
+        Index("film_work_modified_id_idx", "modified", "id"),
+        {"schema": "movie"},
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4(), unique=True)
     title = Column(String(255), nullable=False)
@@ -22,6 +26,8 @@ class Film(Base):
     writers_names = Column(ARRAY(String), nullable=False)
     director = Column(String(255), nullable=False)
     created = Column(DateTime, nullable=False, default=func.now())
+    # Обновляется триггером film_work_set_modified
+    modified = Column(DateTime, nullable=False, server_default=func.now())
 
     def __repr__(self):
         return f"<Film film_id={self.id}, title={self.title}>"
@@ -45,3 +51,16 @@ class ratingsCollection(Document):
 
     class Settings:
         collection = 'ratingsCollection'
+
+
+class ratingAggregatesCollection(Document):
+    """
+    Материализованные агрегаты рейтингов фильма, поддерживаются profile_service
+    """
+    id: uuid.UUID
+    sum: int = 0
+    count: int = 0
+    histogram: dict[str, int] = {}
+
+    class Settings:
+        collection = 'ratingAggregatesCollection'
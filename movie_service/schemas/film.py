@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import List
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, conlist
 
 
 class FilmDto(BaseModel):
@@ -15,3 +15,17 @@ class FilmDto(BaseModel):
     writers_names: List[str]
     director: str
     created: datetime
+
+
+class FilmIdsRequest(BaseModel):
+    ids: conlist(UUID, min_items=1, max_items=1000)
+
+
+class FilmsDto(BaseModel):
+    films: List[FilmDto]
+    missing: List[UUID]
+
+
+class FilmExistenceDto(BaseModel):
+    existing: List[UUID]
+    missing: List[UUID]
@@ -0,0 +1,26 @@
+from typing import Dict, List
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class FilmSearchItemDto(BaseModel):
+    id: UUID
+    title: str
+    genre: List[str]
+    director: str
+    imdb_rating: float | None
+    rating: float | None
+    votes: int = 0
+    score: float | None = None
+
+
+class FacetBucketDto(BaseModel):
+    value: str
+    count: int
+
+
+class FilmSearchDto(BaseModel):
+    total: int
+    films: List[FilmSearchItemDto]
+    facets: Dict[str, List[FacetBucketDto]]
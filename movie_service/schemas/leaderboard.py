@@ -0,0 +1,14 @@
+from typing import List
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class LeaderboardEntryDto(BaseModel):
+    id: UUID
+    title: str
+    genre: List[str]
+    average_rating: float | None
+    votes: int
+    reviews: int
+    score: float | None = None
@@ -14,4 +14,4 @@ class Rating(BaseModel):
 
 
 class RatingsDto(PaginatedParams, Rating):
-    pass
+    cursor: str | None = None
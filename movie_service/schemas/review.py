@@ -14,4 +14,4 @@ class Review(BaseModel):
 
 
 class ReviewsDto(PaginatedParams, Review):
-    pass
+    cursor: str | None = None
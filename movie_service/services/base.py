@@ -1,9 +1,14 @@
+import base64
 from abc import ABC, abstractmethod
 from typing import TypeVar, Type, Generic, List
 from uuid import UUID
 
+from bson import json_util
+from bson.binary import UuidRepresentation
+from bson.json_util import JSONMode, JSONOptions
 from motor.motor_asyncio import AsyncIOMotorClient
-from sqlalchemy import select
+from sqlalchemy import any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from movie_service.models.base_model import BaseModel
@@ -12,6 +17,60 @@ from movie_service.models.base_model import SearchParams, PaginatedParams
 ModelType = TypeVar("ModelType", bound=BaseModel)
 PaginatedModel = TypeVar("PaginatedModel", bound=PaginatedParams)
 
+_CURSOR_JSON_OPTIONS = JSONOptions(
+    json_mode=JSONMode.RELAXED,
+    uuid_representation=UuidRepresentation.STANDARD,
+)
+
+
+def parse_sort(sort: str | None) -> list[tuple[str, int]]:
+    """
+    Сортировка вида "-created_at" с _id для уникальности ключа: [("created_at", -1), ("_id", -1)]
+    """
+    if not sort:
+        return [("_id", 1)]
+    direction = -1 if sort.startswith("-") else 1
+    field = sort.lstrip("+-")
+    if field in ("_id", "id"):
+        return [("_id", direction)]
+    return [(field, direction), ("_id", direction)]
+
+
+def encode_cursor(sort: list[tuple[str, int]], values: list) -> str:
+    payload = json_util.dumps({"s": sort, "v": values}, json_options=_CURSOR_JSON_OPTIONS)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: list[tuple[str, int]]) -> list:
+    """
+    Значения полей сортировки из курсора
+
+    :raises ValueError: курсор поврежден или получен при другой сортировке
+    """
+    try:
+        payload = json_util.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)),
+            json_options=_CURSOR_JSON_OPTIONS
+        )
+        values, cursor_sort = payload["v"], [tuple(item) for item in payload["s"]]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if cursor_sort != sort or len(values) != len(sort):
+        raise ValueError("Cursor does not match sort order")
+    return values
+
+
+def keyset_filter(sort: list[tuple[str, int]], values: list) -> dict:
+    """
+    Условие "после курсора": (a > x) or (a == x and b > y) с учетом направления полей
+    """
+    conditions = []
+    for index, (field, direction) in enumerate(sort):
+        condition = {prev_field: values[prev] for prev, (prev_field, _) in enumerate(sort[:index])}
+        condition[field] = {"$gt" if direction > 0 else "$lt": values[index]}
+        conditions.append(condition)
+    return {"$or": conditions}
+
 
 class Repository(ABC):
     @abstractmethod
@@ -37,6 +96,28 @@ class RepositoryPostgres(Repository, Generic[ModelType]):
 
         return results.scalar_one_or_none()
 
+    async def get_many(self, ids: List[UUID]) -> dict[UUID, Type[ModelType]]:
+        """
+        Получение нескольких записей одним запросом WHERE id = ANY(:ids)
+        """
+        statement = select(self._model).where(
+            self._model.id == any_(bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True))))
+        )
+        results = await self.db.execute(statement=statement)
+
+        return {entity.id: entity for entity in results.scalars().all()}
+
+    async def get_existing_ids(self, ids: List[UUID]) -> set[UUID]:
+        """
+        Получение идентификаторов, которые есть в таблице, одним запросом WHERE id = ANY(:ids)
+        """
+        statement = select(self._model.id).where(
+            self._model.id == any_(bindparam("ids", ids, type_=ARRAY(PG_UUID(as_uuid=True))))
+        )
+        results = await self.db.execute(statement=statement)
+
+        return set(results.scalars().all())
+
     async def get_multy(self):
         pass
 
@@ -60,17 +141,24 @@ class RepositoryMongo(Repository, Generic[ModelType, PaginatedModel]):
             film_id: UUID,
             params: SearchParams | None
     ) -> List[Type[PaginatedModel]] or None:
+        sort = parse_sort(params.sort)
+        conditions = [self._model.movie_id == film_id]
         offset = params.page_size * params.page_number - params.page_size
-        data = await self._model.find(
-            self._model.movie_id == film_id
-        ).skip(offset).limit(params.page_size).sort(params.sort).to_list()
+        if params.cursor:
+            # Страница после курсора выбирается по индексу, без пропуска offset документов
+            conditions.append(keyset_filter(sort, decode_cursor(params.cursor, sort)))
+            offset = 0
+
+        data = await self._model.find(*conditions).sort(*sort).skip(offset).limit(params.page_size).to_list()
         models = []
         for entity in data:
+            values = [getattr(entity, "id" if field == "_id" else field) for field, _ in sort]
             models.append(
                 self.paginated_model(
                     **entity.__dict__,
                     page_size=params.page_size,
-                    page_number=params.page_number
+                    page_number=params.page_number,
+                    cursor=encode_cursor(sort, values)
                 )
             )
         return models
@@ -0,0 +1,241 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from uuid import UUID
+
+import orjson
+from redis.asyncio import Redis
+
+from movie_service.core.config import settings
+from movie_service.schemas.film import FilmDto
+from movie_service.services.films import load_film
+
+logger = logging.getLogger(__name__)
+
+# Канал, в который profile_service публикует идентификаторы фильмов с изменившимися оценками
+FILM_RATINGS_CHANNEL = "film_ratings_changed"
+KEY_PREFIX = "film_card:"
+
+# Пометка карточки в Redis устаревшей, если она есть
+_MARK_STALE_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('hset', KEYS[1], 'fetched_at', 0)
+end
+"""
+
+FilmLoader = Callable[[], Awaitable[FilmDto | None]]
+
+
+class _LoadCancelled(Exception):
+    """
+    Загрузка прервана отменой запроса, который ее начал
+    """
+
+
+@dataclass
+class CachedFilm:
+    body: bytes
+    etag: str
+    fetched_at: float
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Проверка заголовка If-None-Match (слабое сравнение)
+    """
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+class FilmCache:
+    """
+    Двухуровневый кэш карточек фильмов: LRU в памяти процесса и Redis.
+
+    Карточка хранится сериализованной, попадание в кэш не вызывает Pydantic.
+    Карточка старше fresh_ttl отдается как есть, а обновляется в фоне,
+    не чаще одного обновления на фильм одновременно. Карточки старше stale_ttl
+    не отдаются. Изменение оценок фильма, о котором profile_service сообщает
+    через Redis pub/sub, помечает карточку устаревшей на обоих уровнях.
+    """
+
+    def __init__(self, revalidate_loader: Callable[[UUID], Awaitable[FilmDto | None]]):
+        self.revalidate_loader = revalidate_loader
+        self.redis: Redis | None = None
+        self._local: OrderedDict[UUID, CachedFilm] = OrderedDict()
+        self._in_flight: dict[UUID, asyncio.Future] = {}
+        self._revalidating: dict[UUID, asyncio.Task] = {}
+        self._mark_stale = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, redis: Redis) -> None:
+        self.redis = redis
+        self._mark_stale = redis.register_script(_MARK_STALE_SCRIPT)
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._revalidating.values():
+            task.cancel()
+        self.redis = None
+
+    async def get(self, film_id: UUID, loader: FilmLoader) -> CachedFilm | None:
+        """
+        Карточка фильма из кэша или через загрузчик, None - фильм не найден
+        """
+        entry = self._local_get(film_id)
+        if entry is None:
+            entry = await self._redis_get(film_id)
+            if entry is not None:
+                self._local_set(film_id, entry)
+        if entry is None:
+            return await self._load(film_id, loader)
+
+        if time.time() - entry.fetched_at > settings.film_cache.fresh_ttl:
+            self._schedule_revalidation(film_id)
+        return entry
+
+    def invalidate(self, film_ids: list[UUID]) -> None:
+        """
+        Пометка карточек в памяти процесса устаревшими
+        """
+        for film_id in film_ids:
+            entry = self._local.get(film_id)
+            if entry is not None:
+                entry.fetched_at = 0
+
+    def _local_get(self, film_id: UUID) -> CachedFilm | None:
+        entry = self._local.get(film_id)
+        if entry is None:
+            return None
+        if time.time() - entry.fetched_at > settings.film_cache.stale_ttl:
+            del self._local[film_id]
+            return None
+        self._local.move_to_end(film_id)
+        return entry
+
+    def _local_set(self, film_id: UUID, entry: CachedFilm) -> None:
+        self._local[film_id] = entry
+        self._local.move_to_end(film_id)
+        while len(self._local) > settings.film_cache.max_size:
+            self._local.popitem(last=False)
+
+    async def _redis_get(self, film_id: UUID) -> CachedFilm | None:
+        if self.redis is None:
+            return None
+        try:
+            data = await self.redis.hgetall(f"{KEY_PREFIX}{film_id}")
+        except Exception as e:
+            logger.warning(f"Failed to read film card from Redis: {e}")
+            return None
+        if b"body" not in data:
+            return None
+        return CachedFilm(body=data[b"body"], etag=data[b"etag"].decode(), fetched_at=float(data[b"fetched_at"]))
+
+    async def _redis_set(self, film_id: UUID, entry: CachedFilm) -> None:
+        if self.redis is None:
+            return
+        key = f"{KEY_PREFIX}{film_id}"
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, mapping={"body": entry.body, "etag": entry.etag, "fetched_at": entry.fetched_at})
+                pipe.expire(key, settings.film_cache.stale_ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to write film card to Redis: {e}")
+
+    async def _fetch(self, film_id: UUID, loader: FilmLoader) -> CachedFilm | None:
+        film = await loader()
+        if film is None:
+            self._local.pop(film_id, None)
+            if self.redis is not None:
+                try:
+                    await self.redis.delete(f"{KEY_PREFIX}{film_id}")
+                except Exception as e:
+                    logger.warning(f"Failed to delete film card from Redis: {e}")
+            return None
+        body = orjson.dumps(film.dict())
+        entry = CachedFilm(
+            body=body,
+            etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+            fetched_at=time.time()
+        )
+        self._local_set(film_id, entry)
+        await self._redis_set(film_id, entry)
+        return entry
+
+    async def _load(self, film_id: UUID, loader: FilmLoader) -> CachedFilm | None:
+        # Одновременные промахи по одному фильму выполняют одну загрузку
+        while (in_flight := self._in_flight.get(film_id)) is not None:
+            try:
+                return await asyncio.shield(in_flight)
+            except _LoadCancelled:
+                # Запрос, начавший загрузку, отменен: ее повторяет один из ожидающих своим загрузчиком
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[film_id] = future
+        try:
+            entry = await self._fetch(film_id, loader)
+        except asyncio.CancelledError:
+            future.set_exception(_LoadCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(entry)
+            return entry
+        finally:
+            self._in_flight.pop(film_id, None)
+
+    def _schedule_revalidation(self, film_id: UUID) -> None:
+        if film_id in self._revalidating or film_id in self._in_flight:
+            return
+        self._revalidating[film_id] = asyncio.create_task(self._revalidate(film_id))
+
+    async def _revalidate(self, film_id: UUID) -> None:
+        try:
+            # Карточку мог уже обновить другой процесс
+            entry = await self._redis_get(film_id)
+            if entry is not None and time.time() - entry.fetched_at <= settings.film_cache.fresh_ttl:
+                self._local_set(film_id, entry)
+                return
+            await self._fetch(film_id, lambda: self.revalidate_loader(film_id))
+        except Exception as e:
+            logger.error(f"Failed to revalidate film card {film_id}: {e}")
+        finally:
+            self._revalidating.pop(film_id, None)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(FILM_RATINGS_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    film_ids = [UUID(film_id) for film_id in message["data"].decode().split(",") if film_id]
+                    self.invalidate(film_ids)
+                    for film_id in film_ids:
+                        await self._mark_stale(keys=[f"{KEY_PREFIX}{film_id}"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Film ratings subscription failed: {e}")
+                # Пропущенные сообщения: локальные карточки обновятся по fresh_ttl
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+film_cache = FilmCache(revalidate_loader=load_film)
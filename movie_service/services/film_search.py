@@ -0,0 +1,387 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from redis.asyncio import Redis
+from sqlalchemy import func, select, tuple_
+
+from movie_service.core.config import settings
+from movie_service.db import http_client
+from movie_service.db.postgres import async_session
+from movie_service.models.db_models import Film
+from movie_service.schemas.film_search import FacetBucketDto, FilmSearchDto, FilmSearchItemDto
+
+logger = logging.getLogger(__name__)
+
+RATING_AGGREGATES_COLLECTION = "ratingAggregatesCollection"
+
+# Снятие блокировки, только если она еще принадлежит этому процессу
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Продление блокировки, только если она еще принадлежит этому процессу
+_RENEW_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Сортировки выдачи: имя параметра -> сортировка Elasticsearch
+SEARCH_SORTS = {
+    "relevance": ["_score", {"rating": {"order": "desc", "missing": "_last"}}],
+    "-rating": [{"rating": {"order": "desc", "missing": "_last"}}, {"votes": "desc"}],
+    "rating": [{"rating": {"order": "asc", "missing": "_last"}}, {"votes": "desc"}],
+    "-imdb_rating": [{"imdb_rating": "desc"}],
+    "-created": [{"created": "desc"}],
+}
+# Фасеты: имя -> поле индекса
+FACETS = {"genre": "genre", "director": "director", "actor": "actors_names"}
+FACET_SIZE = 20
+
+_NAME_FIELD = {"type": "keyword", "fields": {"text": {"type": "text"}}}
+INDEX_BODY = {
+    "mappings": {
+        "properties": {
+            "title": {"type": "text", "fields": {"raw": {"type": "keyword"}}},
+            "description": {"type": "text"},
+            "genre": {"type": "keyword"},
+            "director": _NAME_FIELD,
+            "actors_names": _NAME_FIELD,
+            "writers_names": _NAME_FIELD,
+            "imdb_rating": {"type": "float"},
+            "rating": {"type": "float"},
+            "votes": {"type": "integer"},
+            "created": {"type": "date"},
+            "modified": {"type": "date"},
+            "generation": {"type": "long"},
+        }
+    }
+}
+
+
+def _average(aggregate: dict | None) -> float | None:
+    if aggregate and aggregate.get("count"):
+        return round(aggregate["sum"] / aggregate["count"], 2)
+    return None
+
+
+class FilmSearchIndex:
+    """
+    Поисковый индекс фильмов в Elasticsearch
+    """
+
+    @property
+    def url(self) -> str:
+        return f"{settings.film_search.url}/{settings.film_search.index}"
+
+    async def ensure_index(self) -> None:
+        response = await http_client.client.put(self.url, json=INDEX_BODY)
+        if response.status_code == 400 and "resource_already_exists_exception" in response.text:
+            return
+        response.raise_for_status()
+
+    async def bulk(self, actions: list[tuple[dict, dict]]) -> None:
+        """
+        Отправка пачки действий: (метаданные действия, тело)
+        """
+        lines = []
+        for action, body in actions:
+            lines.append(json.dumps(action))
+            lines.append(json.dumps(body, default=str))
+        response = await http_client.client.post(
+            f"{self.url}/_bulk",
+            content="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("errors"):
+            return
+        failed = []
+        for item in result["items"]:
+            action, outcome = next(iter(item.items()))
+            # Рейтинг фильма, которого нет в индексе, пропускается
+            if outcome.get("status", 200) >= 300 and not (action == "update" and outcome["status"] == 404):
+                failed.append(outcome)
+        if failed:
+            logger.error(f"Failed to index {len(failed)} films, first error: {failed[0].get('error')}")
+
+    async def delete_older_generations(self, generation: int) -> None:
+        response = await http_client.client.post(
+            f"{self.url}/_delete_by_query",
+            params={"conflicts": "proceed"},
+            json={"query": {"range": {"generation": {"lt": generation}}}}
+        )
+        response.raise_for_status()
+
+    async def search(
+            self,
+            query: str | None,
+            genres: List[str],
+            director: str | None,
+            actor: str | None,
+            sort: str,
+            page_size: int,
+            page_number: int
+    ) -> FilmSearchDto:
+        """
+        Поиск фильмов с нечетким совпадением названия, фильтрами и фасетами
+        """
+        must = []
+        if query:
+            must.append({
+                "bool": {
+                    "should": [
+                        {"match": {"title": {"query": query, "fuzziness": "AUTO", "boost": 3}}},
+                        {"match_phrase_prefix": {"title": {"query": query, "boost": 2}}},
+                        {
+                            "multi_match": {
+                                "query": query,
+                                "fields": ["description", "director.text", "actors_names.text", "writers_names.text"]
+                            }
+                        },
+                    ]
+                }
+            })
+        filters = [{"terms": {"genre": genres}}] if genres else []
+        if director:
+            filters.append({"term": {"director": director}})
+        if actor:
+            filters.append({"term": {"actors_names": actor}})
+
+        body = {
+            "query": {"bool": {"must": must or [{"match_all": {}}], "filter": filters}},
+            "aggs": {name: {"terms": {"field": field, "size": FACET_SIZE}} for name, field in FACETS.items()},
+            "sort": SEARCH_SORTS[sort],
+            "track_scores": True,
+            "from": (page_number - 1) * page_size,
+            "size": page_size,
+            "_source": ["title", "genre", "director", "imdb_rating", "rating", "votes"],
+        }
+        response = await http_client.client.post(f"{self.url}/_search", json=body)
+        response.raise_for_status()
+        result = response.json()
+        return FilmSearchDto(
+            total=result["hits"]["total"]["value"],
+            films=[
+                FilmSearchItemDto(id=hit["_id"], score=hit.get("_score"), **hit["_source"])
+                for hit in result["hits"]["hits"]
+            ],
+            facets={
+                name: [
+                    FacetBucketDto(value=bucket["key"], count=bucket["doc_count"])
+                    for bucket in result["aggregations"][name]["buckets"]
+                ]
+                for name in FACETS
+            }
+        )
+
+
+class FilmIndexETL:
+    """
+    Синхронизация индекса фильмов с movie.film_work и агрегатами рейтингов.
+
+    Фильмы выгружаются пачками по (modified, id) после сохраненной отметки - последней пары (modified, id),
+    рейтинги - по updated_at агрегатов. Отметки хранятся в Redis, поэтому
+    после перезапуска выгрузка продолжается с места остановки. Синхронизацию
+    одновременно выполняет только один процесс, остальные ждут блокировку.
+    Пока синхронизация идет, блокировка продлевается каждые LOCK_TTL / 3 секунд,
+    а если ее занял другой процесс, синхронизация прерывается.
+    Полная выгрузка раз в full_sync_interval записывает фильмы с новым поколением
+    и удаляет документы старых поколений - так из индекса уходят удаленные фильмы.
+    """
+
+    STATE_KEY = "film_search:etl_state"
+    LOCK_KEY = "film_search:etl_lock"
+    LOCK_TTL = 600
+    # Запас на транзакции, зафиксированные позже отметки, и расхождение часов.
+    # Фильмы, измененные позже чем WATERMARK_OVERLAP назад, инкрементальная выгрузка
+    # откладывает до следующего цикла, поэтому каждое изменение выгружается один раз
+    WATERMARK_OVERLAP = timedelta(seconds=5)
+    _NIL_ID = uuid.UUID(int=0)
+
+    def __init__(self, index: FilmSearchIndex):
+        self.index = index
+        self.redis: Redis | None = None
+        self.db: AsyncIOMotorDatabase | None = None
+        self._release_lock = None
+        self._renew_lock = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, redis: Redis, db: AsyncIOMotorDatabase) -> None:
+        self.redis = redis
+        self.db = db
+        self._release_lock = redis.register_script(_RELEASE_LOCK_SCRIPT)
+        self._renew_lock = redis.register_script(_RENEW_LOCK_SCRIPT)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def sync(self, full: bool = False) -> None:
+        state = {key.decode(): value.decode() for key, value in (await self.redis.hgetall(self.STATE_KEY)).items()}
+        generation = int(state.get("generation", 0))
+        if full or not generation:
+            generation += 1
+            films_watermark = None
+        elif "films_modified" in state:
+            films_watermark = (
+                datetime.fromisoformat(state["films_modified"]),
+                uuid.UUID(state["films_id"]) if "films_id" in state else self._NIL_ID
+            )
+        else:
+            films_watermark = None
+        ratings_watermark = datetime.fromisoformat(state["ratings_updated_at"]) if "ratings_updated_at" in state else None
+
+        started = datetime.utcnow()
+        await self._sync_films(generation, films_watermark)
+        if films_watermark is None:
+            # Полная выгрузка уже записала актуальные рейтинги
+            await self.index.delete_older_generations(generation)
+            await self.redis.hset(self.STATE_KEY, mapping={
+                "generation": generation,
+                "ratings_updated_at": (started - self.WATERMARK_OVERLAP).isoformat(),
+                "full_sync_at": time.time(),
+            })
+        else:
+            await self._sync_ratings(ratings_watermark)
+
+    async def _sync_films(self, generation: int, watermark: tuple[datetime, uuid.UUID] | None) -> None:
+        # Время считается по часам базы, которыми триггер заполняет modified
+        async with async_session() as session:
+            settled = (await session.execute(select(func.localtimestamp()))).scalar_one() - self.WATERMARK_OVERLAP
+        condition = tuple_(Film.modified, Film.id) > tuple_(*watermark) if watermark else None
+        while True:
+            statement = select(Film).order_by(Film.modified, Film.id).limit(settings.film_search.batch_size)
+            if condition is not None:
+                statement = statement.where(condition)
+            if watermark is not None:
+                statement = statement.where(Film.modified <= settled)
+            async with async_session() as session:
+                films = (await session.execute(statement)).scalars().all()
+            if not films:
+                return
+
+            aggregates = await self._get_aggregates([film.id for film in films])
+            actions = []
+            for film in films:
+                aggregate = aggregates.get(film.id)
+                actions.append(({"index": {"_id": str(film.id)}}, {
+                    "title": film.title,
+                    "description": film.description,
+                    "genre": film.genre,
+                    "director": film.director,
+                    "actors_names": film.actors_names,
+                    "writers_names": film.writers_names,
+                    "imdb_rating": film.imdb_rating,
+                    "rating": _average(aggregate),
+                    "votes": aggregate.get("count", 0) if aggregate else 0,
+                    "created": film.created.isoformat(),
+                    "modified": film.modified.isoformat(),
+                    "generation": generation,
+                }))
+            await self.index.bulk(actions)
+
+            last = films[-1]
+            # Полная выгрузка записывает и недавние изменения, но отметка не заходит за settled:
+            # недавние изменения один раз выгрузятся повторно вместе с зафиксированными позже
+            saved_modified, saved_id = (last.modified, last.id) if last.modified <= settled else (settled, self._NIL_ID)
+            await self.redis.hset(self.STATE_KEY, mapping={
+                "generation": generation,
+                "films_modified": saved_modified.isoformat(),
+                "films_id": str(saved_id),
+            })
+            if len(films) < settings.film_search.batch_size:
+                return
+            condition = tuple_(Film.modified, Film.id) > tuple_(last.modified, last.id)
+
+    async def _sync_ratings(self, watermark: datetime | None) -> None:
+        query = {"updated_at": {"$gt": watermark - self.WATERMARK_OVERLAP}} if watermark else {}
+        cursor = self.db[RATING_AGGREGATES_COLLECTION].find(
+            query, {"sum": 1, "count": 1, "updated_at": 1}
+        ).sort("updated_at", 1).batch_size(settings.film_search.batch_size)
+
+        actions = []
+        newest = watermark
+        async for aggregate in cursor:
+            actions.append((
+                {"update": {"_id": str(aggregate["_id"])}},
+                {"doc": {"rating": _average(aggregate), "votes": aggregate.get("count", 0)}}
+            ))
+            newest = aggregate["updated_at"]
+            if len(actions) >= settings.film_search.batch_size:
+                await self.index.bulk(actions)
+                await self.redis.hset(self.STATE_KEY, "ratings_updated_at", newest.isoformat())
+                actions = []
+        if actions:
+            await self.index.bulk(actions)
+        if newest is not None:
+            await self.redis.hset(self.STATE_KEY, "ratings_updated_at", newest.isoformat())
+
+    async def _get_aggregates(self, film_ids: list) -> dict:
+        cursor = self.db[RATING_AGGREGATES_COLLECTION].find({"_id": {"$in": film_ids}}, {"sum": 1, "count": 1})
+        return {aggregate["_id"]: aggregate async for aggregate in cursor}
+
+    async def _sync_holding_lock(self, token: str, full: bool) -> None:
+        sync = asyncio.create_task(self.sync(full=full))
+        keep_lock = asyncio.create_task(self._keep_lock(token))
+        try:
+            await asyncio.wait({sync, keep_lock}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sync.cancel()
+            keep_lock.cancel()
+            await asyncio.gather(sync, keep_lock, return_exceptions=True)
+        if sync.cancelled():
+            logger.error("Films search index lock was lost, sync interrupted")
+        else:
+            sync.result()
+
+    async def _keep_lock(self, token: str) -> None:
+        """
+        Продление блокировки до ее потери
+        """
+        while True:
+            await asyncio.sleep(self.LOCK_TTL / 3)
+            try:
+                if not await self._renew_lock(keys=[self.LOCK_KEY], args=[token, self.LOCK_TTL]):
+                    return
+            except Exception as e:
+                # Блокировка действует еще не меньше двух третей LOCK_TTL, продление повторится
+                logger.error(f"Failed to renew films search index lock: {e}")
+
+    async def _run(self) -> None:
+        try:
+            await self.index.ensure_index()
+        except Exception as e:
+            logger.error(f"Failed to create films search index: {e}")
+        while True:
+            token = str(uuid.uuid4())
+            try:
+                if await self.redis.set(self.LOCK_KEY, token, nx=True, ex=self.LOCK_TTL):
+                    try:
+                        full_sync_at = await self.redis.hget(self.STATE_KEY, "full_sync_at")
+                        full = time.time() - float(full_sync_at or 0) >= settings.film_search.full_sync_interval
+                        await self._sync_holding_lock(token, full)
+                    finally:
+                        await self._release_lock(keys=[self.LOCK_KEY], args=[token])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Films search index sync failed: {e}")
+            await asyncio.sleep(settings.film_search.sync_interval)
+
+
+film_search = FilmSearchIndex()
+film_index_etl = FilmIndexETL(film_search)
@@ -2,9 +2,12 @@ from abc import ABC, abstractmethod
 from typing import List
 from uuid import UUID
 
+from beanie.operators import In
+
+from movie_service.db.postgres import async_session
 from movie_service.models.base_model import SearchParams
-from movie_service.models.db_models import Film, reviewsCollection, ratingsCollection
-from movie_service.schemas.film import FilmDto
+from movie_service.models.db_models import Film, reviewsCollection, ratingsCollection, ratingAggregatesCollection
+from movie_service.schemas.film import FilmDto, FilmExistenceDto, FilmsDto
 from movie_service.schemas.ratings import RatingsDto
 from movie_service.schemas.review import ReviewsDto
 from movie_service.services.base import RepositoryPostgres, RepositoryMongo
@@ -22,23 +25,31 @@ class RatingsRepository(RepositoryMongo[ratingsCollection, RatingsDto]):
     async def get_avg_rating(self, film_id) -> float | None:
         """
         Процедура получения среднего значения рейтинга у фильма
+        из материализованных агрегатов (поиск по ключу вместо $group по всем оценкам)
 
         :param film_id: идентификатор фильма, по которому хотим получить средний рейтинг
         :return: среднее значение рейтинга фильма
         """
-        pipeline = [
-            {"$match": {"movie_id": film_id}},
-            {
-                "$group": {
-                    "_id": "$movie_id",
-                    "average_rating": {"$avg": "$rating"},
-                    "total_ratings": {"$sum": 1}
-                }
-            }
-        ]
-        rating = await self._model.aggregate(pipeline).to_list()
-        if rating:
-            return round(rating.pop()['average_rating'], 2)
+        aggregate = await ratingAggregatesCollection.get(film_id)
+        return self._average(aggregate)
+
+    async def get_avg_ratings(self, film_ids: List[UUID]) -> dict[UUID, float | None]:
+        """
+        Средние рейтинги нескольких фильмов одним запросом {_id: {$in: film_ids}}
+        к материализованным агрегатам
+
+        :param film_ids: идентификаторы фильмов
+        :return: средний рейтинг по идентификатору фильма, None для фильмов без оценок
+        """
+        aggregates = await ratingAggregatesCollection.find(In(ratingAggregatesCollection.id, film_ids)).to_list()
+        averages = dict.fromkeys(film_ids)
+        averages.update({aggregate.id: self._average(aggregate) for aggregate in aggregates})
+        return averages
+
+    @staticmethod
+    def _average(aggregate: ratingAggregatesCollection | None) -> float | None:
+        if aggregate and aggregate.count:
+            return round(aggregate.sum / aggregate.count, 2)
         return
 
 
@@ -47,6 +58,14 @@ class FilmServiceABC(ABC):
     async def get_film(self, film_id: UUID) -> FilmDto:
         ...
 
+    @abstractmethod
+    async def get_films(self, film_ids: List[UUID]) -> FilmsDto:
+        ...
+
+    @abstractmethod
+    async def get_existing_film_ids(self, film_ids: List[UUID]) -> FilmExistenceDto:
+        ...
+
     @abstractmethod
     async def get_reviews(
             self,
@@ -87,11 +106,31 @@ class FilmService(FilmServiceABC):
         # считаем средний рейтинг фильма
         rating = await self.ratings_repository.get_avg_rating(film_id)
 
+        return self._to_dto(film, rating)
+
+    async def get_films(self, film_ids: List[UUID]) -> FilmsDto:
+        """
+        Получение нескольких фильмов: один запрос к Postgres и один к агрегатам рейтингов
+        :param film_ids: список UUID фильмов
+        :return: найденные фильмы в порядке запроса и отсутствующие идентификаторы
+        """
+        unique_ids = list(dict.fromkeys(film_ids))
+        films = await self.film_repository.get_many(unique_ids)
+        ratings = await self.ratings_repository.get_avg_ratings(list(films))
+
+        return FilmsDto(
+            films=[self._to_dto(films[film_id], ratings[film_id]) for film_id in unique_ids if film_id in films],
+            missing=[film_id for film_id in unique_ids if film_id not in films]
+        )
+
+    @staticmethod
+    def _to_dto(film: Film, rating: float | None) -> FilmDto:
+        # Пока пользователи не оценили фильм, отдается рейтинг из каталога
         return FilmDto(
             title=film.title,
             actors_names=film.actors_names,
             director=film.director,
-            imdb_rating=rating,
+            imdb_rating=rating if rating is not None else film.imdb_rating,
             description=film.description,
             writers_names=film.writers_names,
             created=film.created,
@@ -99,6 +138,20 @@ class FilmService(FilmServiceABC):
             genre=film.genre
         )
 
+    async def get_existing_film_ids(self, film_ids: List[UUID]) -> FilmExistenceDto:
+        """
+        Проверка существования набора фильмов без загрузки их данных и расчета рейтинга
+        :param film_ids: список UUID фильмов
+        :return: существующие и отсутствующие идентификаторы в порядке запроса
+        """
+        unique_ids = list(dict.fromkeys(film_ids))
+        existing_ids = await self.film_repository.get_existing_ids(unique_ids)
+
+        return FilmExistenceDto(
+            existing=[film_id for film_id in unique_ids if film_id in existing_ids],
+            missing=[film_id for film_id in unique_ids if film_id not in existing_ids]
+        )
+
     async def get_all_ratings(self, film_id: UUID, params: SearchParams | None) -> List[RatingsDto] or None:
         """
         Получение все выставленных оценок по идентификатору фильма
@@ -118,3 +171,16 @@ class FilmService(FilmServiceABC):
         """
         reviews = await self.reviews_repository.get_multy(film_id, params=params)
         return reviews
+
+
+async def load_film(film_id: UUID) -> FilmDto | None:
+    """
+    Загрузка фильма в отдельной сессии, для обновления кэша вне запроса
+    """
+    async with async_session() as session:
+        service = FilmService(
+            film_repository=FilmRepository(Film, db=session),
+            reviews_repository=ReviewsRepository(model=reviewsCollection, paginated_model=ReviewsDto, client=None),
+            ratings_repository=RatingsRepository(model=ratingsCollection, paginated_model=RatingsDto, client=None)
+        )
+        return await service.get_film(film_id)
@@ -0,0 +1,208 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List
+from uuid import UUID
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from sqlalchemy import any_, bindparam, select
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID
+
+from movie_service.core.config import settings
+from movie_service.db.postgres import async_session
+from movie_service.models.db_models import Film
+from movie_service.schemas.leaderboard import LeaderboardEntryDto
+
+logger = logging.getLogger(__name__)
+
+RATING_AGGREGATES_COLLECTION = "ratingAggregatesCollection"
+COUNTERS_COLLECTION = "countersCollection"
+
+# Запас при инкрементальной загрузке на расхождение часов шардов
+WATERMARK_OVERLAP = timedelta(seconds=5)
+# Количество фильмов в одном запросе к Postgres
+FILMS_CHUNK_SIZE = 5000
+# Максимальное количество закэшированных выдач (комбинаций жанра и min_votes)
+MAX_CACHED_RANKINGS = 256
+
+
+class Leaderboard:
+    """
+    Топы фильмов по оценкам и по количеству рецензий.
+
+    Суммы и количества оценок берутся из агрегатов рейтингов, количество
+    рецензий - из счетчиков фильмов, название и жанры - из таблицы фильмов.
+    Данные хранятся в памяти процесса и дозагружаются в фоне по updated_at,
+    поэтому запрос топа не обращается к базам. Готовые выдачи кэшируются
+    до следующего изменения данных.
+
+    Топ по оценкам упорядочен по байесовскому среднему
+    (sum + min_votes * C) / (count + min_votes), где C - средняя оценка по всем фильмам:
+    фильм с парой высоких оценок не обгоняет фильм с сотнями оценок.
+    """
+
+    def __init__(self):
+        self.db: AsyncIOMotorDatabase | None = None
+        self.ratings: dict[UUID, tuple[int, int]] = {}
+        self.reviews: dict[UUID, int] = {}
+        # None - фильма нет в таблице фильмов, он не попадает в топы
+        self.films: dict[UUID, tuple[str, List[str]] | None] = {}
+        self.mean = 0.0
+        self._watermark: datetime | None = None
+        self._last_full_refresh = 0.0
+        self._rankings: dict[tuple, List[LeaderboardEntryDto]] = {}
+        self._task: asyncio.Task | None = None
+
+    async def start(self, db: AsyncIOMotorDatabase) -> None:
+        self.db = db
+        try:
+            await self.refresh(full=True)
+        except Exception as e:
+            logger.error(f"Failed to load leaderboard: {e}")
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def refresh(self, full: bool = False) -> None:
+        """
+        Загрузка агрегатов, изменившихся с прошлой загрузки, или всех при full
+        """
+        query = {}
+        if not full and self._watermark is not None:
+            query = {"updated_at": {"$gt": self._watermark - WATERMARK_OVERLAP}}
+        aggregates = await self.db[RATING_AGGREGATES_COLLECTION].find(
+            query, {"sum": 1, "count": 1, "updated_at": 1}
+        ).to_list(length=None)
+        counters = await self.db[COUNTERS_COLLECTION].find(
+            {**query, "_id.movie_id": {"$exists": True}}, {"reviews": 1, "updated_at": 1}
+        ).to_list(length=None)
+
+        # Документы из окна WATERMARK_OVERLAP перечитываются каждый раз,
+        # поэтому учитываются только значения, отличающиеся от загруженных
+        rating_changes = {doc["_id"]: (doc.get("sum", 0), doc.get("count", 0)) for doc in aggregates}
+        review_changes = {doc["_id"]["movie_id"]: doc.get("reviews", 0) for doc in counters}
+        if full:
+            ratings, reviews = rating_changes, review_changes
+        else:
+            rating_changes = {
+                film_id: value for film_id, value in rating_changes.items() if self.ratings.get(film_id) != value
+            }
+            review_changes = {
+                film_id: value for film_id, value in review_changes.items() if self.reviews.get(film_id) != value
+            }
+            ratings = {**self.ratings, **rating_changes} if rating_changes else self.ratings
+            reviews = {**self.reviews, **review_changes} if review_changes else self.reviews
+
+        films = {} if full else self.films
+        missing = [film_id for film_id in set(rating_changes) | set(review_changes) if film_id not in films]
+        if missing:
+            films = {**films, **await self._load_films(missing)}
+
+        updated = [doc["updated_at"] for doc in aggregates + counters if doc.get("updated_at")]
+        if updated and (full or self._watermark is None or max(updated) > self._watermark):
+            self._watermark = max(updated)
+        if full:
+            self._last_full_refresh = time.monotonic()
+        if not full and not rating_changes and not review_changes:
+            return
+
+        total_sum = sum(rating_sum for rating_sum, _ in ratings.values())
+        total_count = sum(count for _, count in ratings.values())
+        # Словари заменяются целиком, чтобы запросы не видели частично обновленные данные
+        self.ratings, self.reviews, self.films = ratings, reviews, films
+        self.mean = total_sum / total_count if total_count else 0.0
+        self._rankings = {}
+
+    def top_rated(
+            self,
+            limit: int,
+            min_votes: int | None = None,
+            genre: str | None = None
+    ) -> List[LeaderboardEntryDto]:
+        """
+        Фильмы с наибольшим байесовским средним среди имеющих не меньше min_votes оценок
+        """
+        if min_votes is None:
+            min_votes = settings.leaderboard.min_votes
+        key = ("top_rated", min_votes, genre)
+        if key not in self._rankings:
+            def score(film_id: UUID) -> float:
+                rating_sum, count = self.ratings[film_id]
+                return (rating_sum + min_votes * self.mean) / (count + min_votes)
+
+            candidates = [
+                film_id for film_id, (_, count) in self.ratings.items()
+                if count and count >= min_votes and self._matches(film_id, genre)
+            ]
+            top = heapq.nlargest(settings.leaderboard.max_limit, candidates, key=score)
+            self._cache(key, [self._entry(film_id, round(score(film_id), 3)) for film_id in top])
+        return self._rankings[key][:limit]
+
+    def most_reviewed(self, limit: int, genre: str | None = None) -> List[LeaderboardEntryDto]:
+        """
+        Фильмы с наибольшим количеством рецензий
+        """
+        key = ("most_reviewed", genre)
+        if key not in self._rankings:
+            candidates = [
+                film_id for film_id, count in self.reviews.items()
+                if count > 0 and self._matches(film_id, genre)
+            ]
+            top = heapq.nlargest(settings.leaderboard.max_limit, candidates, key=self.reviews.get)
+            self._cache(key, [self._entry(film_id) for film_id in top])
+        return self._rankings[key][:limit]
+
+    def _matches(self, film_id: UUID, genre: str | None) -> bool:
+        film = self.films.get(film_id)
+        return film is not None and (genre is None or genre in film[1])
+
+    def _entry(self, film_id: UUID, score: float | None = None) -> LeaderboardEntryDto:
+        title, genres = self.films[film_id]
+        rating_sum, count = self.ratings.get(film_id, (0, 0))
+        return LeaderboardEntryDto(
+            id=film_id,
+            title=title,
+            genre=genres,
+            average_rating=round(rating_sum / count, 2) if count else None,
+            votes=count,
+            reviews=self.reviews.get(film_id, 0),
+            score=score
+        )
+
+    def _cache(self, key: tuple, ranking: List[LeaderboardEntryDto]) -> None:
+        if len(self._rankings) >= MAX_CACHED_RANKINGS:
+            self._rankings = {}
+        self._rankings[key] = ranking
+
+    @staticmethod
+    async def _load_films(film_ids: List[UUID]) -> dict[UUID, tuple[str, List[str]] | None]:
+        films = dict.fromkeys(film_ids)
+        if not film_ids:
+            return films
+        async with async_session() as session:
+            for start in range(0, len(film_ids), FILMS_CHUNK_SIZE):
+                statement = select(Film.id, Film.title, Film.genre).where(
+                    Film.id == any_(bindparam(
+                        "ids", film_ids[start:start + FILMS_CHUNK_SIZE], type_=ARRAY(PG_UUID(as_uuid=True))
+                    ))
+                )
+                for film_id, title, genre in await session.execute(statement):
+                    films[film_id] = (title, genre)
+        return films
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.leaderboard.refresh_interval)
+            full = time.monotonic() - self._last_full_refresh >= settings.leaderboard.full_refresh_interval
+            try:
+                await self.refresh(full=full)
+            except Exception as e:
+                logger.error(f"Failed to refresh leaderboard: {e}")
+
+
+leaderboard = Leaderboard()
@@ -3,13 +3,15 @@ from schemas.bookmarks import (
     Bookmark,
     BookmarkResponse,
     BookmarksListResponse,
-    BookmarkUpdate
+    BookmarkUpdate,
+    BookmarksBatch
 )
+from schemas.batch import BatchResponse
 from services.bookmarks import BookmarkService, get_bookmark_service
 from async_fastapi_jwt_auth import AuthJWT
 from dependencies.auth import security_jwt
 from uuid import UUID
-from utils.enums import BookmarkType
+from utils.enums import BookmarkType, TotalMode
 
 router = APIRouter()
 
@@ -44,6 +46,8 @@ async def get_bookmarks(
                                             enum=[BookmarkType.WATCHLIST, BookmarkType.FAVORITE]),
         skip: int = Query(0, ge=0),
         limit: int = Query(20, ge=1, le=100),
+        cursor: str | None = Query(None, description="Курсор следующей страницы из next_cursor"),
+        total_mode: TotalMode = Query(TotalMode.EXACT, description="Способ подсчета total"),
         service: BookmarkService = Depends(get_bookmark_service),
         Authorize: AuthJWT = Depends(),
         user: dict = Depends(security_jwt)
@@ -55,10 +59,26 @@ async def get_bookmarks(
         Authorize=Authorize,
         bookmark_type=bookmark_type,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=cursor,
+        total_mode=total_mode
     )
 
 
+@router.post("/bookmarks/batch",
+             response_model=BatchResponse)
+async def batch_bookmarks(
+        batch: BookmarksBatch,
+        service: BookmarkService = Depends(get_bookmark_service),
+        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(security_jwt)
+):
+    """
+    Пакетное добавление, изменение и удаление закладок (bookmark_type = null удаляет закладку).
+    """
+    return await service.batch_bookmarks(Authorize=Authorize, batch=batch)
+
+
 @router.delete("/bookmark/{movie_id}",
                status_code=status.HTTP_204_NO_CONTENT)
 async def remove_bookmark(
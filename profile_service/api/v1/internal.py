@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends
+
+from db import http_client
+from db.mongo import index_report
+from dependencies.auth import verify_internal_token
+from services.review_search import review_indexer
+from utils.enums import ShardedCollections
+
+router = APIRouter(dependencies=[Depends(verify_internal_token)], include_in_schema=False)
+
+
+@router.get("/http-pool")
+async def http_pool_stats():
+    """
+    Статистика запросов через пул соединений HTTP клиента
+    """
+    return http_client.get_pool_stats()
+
+
+@router.get("/indexes")
+async def indexes_report():
+    """
+    Отчет об отсутствующих и избыточных индексах MongoDB
+    """
+    return await index_report(ShardedCollections)
+
+
+@router.post("/reviews/reindex")
+async def reindex_reviews():
+    """
+    Полная перезагрузка рецензий в поисковый индекс
+    """
+    review_indexer.start_reindex()
+    return {"status": "started"}
@@ -1,6 +1,7 @@
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
+from fastapi.responses import StreamingResponse
 
 from schemas.profile import (
     Profile, ProfileCreate, ProfileUpdate,
@@ -8,8 +9,9 @@ from schemas.profile import (
 from services.profile import ProfileService
 from async_fastapi_jwt_auth import AuthJWT
 from services.profile import get_profile_service
+from services.export import ExportService, get_export_service
 
-from dependencies.auth import security_jwt
+from dependencies.auth import get_current_user, security_jwt
 
 router = APIRouter()
 
@@ -41,6 +43,23 @@ async def get_profile(
     return profile
 
 
+@router.get("/me/export", response_class=StreamingResponse)
+async def export_profile_data(
+        compress: bool = Query(False, description="Сжать выгрузку gzip"),
+        service: ExportService = Depends(get_export_service),
+        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(security_jwt)
+):
+    """Выгрузка всех оценок, рецензий и закладок пользователя в формате NDJSON"""
+    user_id = await get_current_user(Authorize)
+    filename = f"profile-{user_id}.ndjson" + (".gz" if compress else "")
+    return StreamingResponse(
+        service.export(user_id, compress),
+        media_type="application/gzip" if compress else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
 @router.get("/users/{user_id}", response_model=PublicProfile)
 async def get_user_profile(
         user_id: UUID,
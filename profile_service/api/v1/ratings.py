@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, Query
 from schemas.ratings import (
     RatingCreate, RatingResponse,
-    RatingUpdate, RatingsList, MovieAverageRating)
+    RatingUpdate, RatingsList, MovieAverageRating, RatingsBatch,
+    MovieRatingDistribution, MovieRatingDistributions, MovieIdsRequest)
+from schemas.batch import BatchResponse
 from services.ratings import RatingService, get_rating_service
 from async_fastapi_jwt_auth import AuthJWT
 from dependencies.auth import security_jwt
+from utils.enums import TotalMode
+from typing import Literal
 from uuid import UUID
 
 router = APIRouter()
@@ -36,11 +40,14 @@ async def get_movie_ratings(
         movie_id: UUID,
         skip: int = Query(0, ge=0),
         limit: int = Query(20, ge=1, le=100),
+        cursor: str | None = Query(None, description="Курсор следующей страницы из next_cursor"),
+        sort_by: Literal["created_at", "rating"] = Query("created_at"),
+        total_mode: TotalMode = Query(TotalMode.EXACT, description="Способ подсчета total"),
         service: RatingService = Depends(get_rating_service),
         Authorize: AuthJWT = Depends(),
         user: dict = Depends(security_jwt)
 ):
-    return await service.get_movie_ratings(movie_id, skip, limit)
+    return await service.get_movie_ratings(movie_id, skip, limit, cursor, sort_by, total_mode)
 
 
 @router.get("/ratings/",
@@ -49,11 +56,13 @@ async def get_movie_ratings(
 async def get_user_ratings(
         skip: int = Query(0, ge=0),
         limit: int = Query(20, ge=1, le=100),
+        cursor: str | None = Query(None, description="Курсор следующей страницы из next_cursor"),
+        total_mode: TotalMode = Query(TotalMode.EXACT, description="Способ подсчета total"),
         service: RatingService = Depends(get_rating_service),
         Authorize: AuthJWT = Depends(),
         user: dict = Depends(security_jwt)
 ):
-    return await service.get_user_ratings(Authorize, skip, limit)
+    return await service.get_user_ratings(Authorize, skip, limit, cursor, total_mode)
 
 
 @router.put("/rating/{movie_id}",
@@ -81,6 +90,18 @@ async def delete_rating(
     return {"status": "deleted"}
 
 
+@router.post("/ratings/batch",
+             response_model=BatchResponse,
+             description="Пакетно создать, изменить или удалить рейтинги (rating = null удаляет)")
+async def batch_ratings(
+        batch: RatingsBatch,
+        service: RatingService = Depends(get_rating_service),
+        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(security_jwt)
+):
+    return await service.batch_ratings(batch, Authorize)
+
+
 @router.get("/movies/{movie_id}/average/",
             response_model=MovieAverageRating,
             description="Получить средний рейтинг фильма")
@@ -91,3 +112,29 @@ async def get_movie_average_rating(
         user: dict = Depends(security_jwt)
 ):
     return await service.get_movie_average_rating(movie_id)
+
+
+@router.get("/movies/{movie_id}/distribution/",
+            response_model=MovieRatingDistribution,
+            description="Получить распределение оценок фильма")
+async def get_movie_rating_distribution(
+        movie_id: UUID,
+        months: int = Query(12, ge=0, le=120, description="Количество месяцев динамики среднего рейтинга"),
+        service: RatingService = Depends(get_rating_service),
+        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(security_jwt)
+):
+    return await service.get_movie_rating_distribution(movie_id, months)
+
+
+@router.post("/movies/distribution/",
+             response_model=MovieRatingDistributions,
+             description="Получить распределения оценок нескольких фильмов")
+async def get_movies_rating_distributions(
+        request: MovieIdsRequest,
+        months: int = Query(0, ge=0, le=120, description="Количество месяцев динамики среднего рейтинга"),
+        service: RatingService = Depends(get_rating_service),
+        Authorize: AuthJWT = Depends(),
+        user: dict = Depends(security_jwt)
+):
+    return await service.get_movies_rating_distributions(request.movie_ids, months)
@@ -3,12 +3,13 @@ from typing import Annotated
 from services.reviews import ReviewService, get_review_service
 from schemas.reviews import (
     ReviewCreate, ReviewUpdate,
-    ReviewsList, ReviewPartialUpdate, ReviewResponse
+    ReviewsList, ReviewPartialUpdate, ReviewResponse, ReviewSearchResponse
 )
 from async_fastapi_jwt_auth import AuthJWT
 from uuid import UUID
 
 from dependencies.auth import security_jwt
+from utils.enums import TotalMode
 
 router = APIRouter()
 
@@ -33,21 +34,40 @@ async def get_movie_reviews(
         limit: Annotated[int, Query(ge=1, le=100)] = 20,
         sort_by: str = "created_at",
         sort_order: int = -1,
+        cursor: Annotated[str | None, Query(description="Курсор следующей страницы из next_cursor")] = None,
+        total_mode: Annotated[TotalMode, Query(description="Способ подсчета total")] = TotalMode.EXACT,
         review_service: ReviewService = Depends(get_review_service),
 ):
     """
     Получение всех рецензий для конкретного фильма
     """
     return await review_service.get_movie_reviews(
-        movie_id, skip, limit, sort_by, sort_order
+        movie_id, skip, limit, sort_by, sort_order, cursor, total_mode
     )
 
 
+@router.get("/search", response_model=ReviewSearchResponse)
+async def search_reviews(
+        q: Annotated[str, Query(min_length=2, max_length=200, description="Поисковый запрос")],
+        movie_id: UUID | None = None,
+        user_id: UUID | None = None,
+        limit: Annotated[int, Query(ge=1, le=100)] = 20,
+        offset: Annotated[int, Query(ge=0, le=1000)] = 0,
+        review_service: ReviewService = Depends(get_review_service),
+):
+    """
+    Поиск рецензий по заголовку и тексту с ранжированием по релевантности
+    и подсветкой совпадений
+    """
+    return await review_service.search_reviews(q, movie_id, user_id, limit, offset)
+
+
 @router.get("/user", response_model=ReviewsList)
 async def get_user_reviews(
         skip: Annotated[int, Query(ge=0)] = 0,
         limit: Annotated[int, Query(ge=1, le=100)] = 20,
-
+        cursor: Annotated[str | None, Query(description="Курсор следующей страницы из next_cursor")] = None,
+        total_mode: Annotated[TotalMode, Query(description="Способ подсчета total")] = TotalMode.EXACT,
         review_service: ReviewService = Depends(get_review_service),
         Authorize: AuthJWT = Depends(),
         user: dict = Depends(security_jwt)
@@ -55,7 +75,7 @@ async def get_user_reviews(
     """
     Получение всех рецензий пользователя
     """
-    return await review_service.get_user_reviews(Authorize, skip, limit)
+    return await review_service.get_user_reviews(Authorize, skip, limit, cursor, total_mode)
 
 
 @router.put("/{movie_id}")
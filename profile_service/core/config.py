@@ -18,6 +18,8 @@ class JWTSettings(BaseSettings):
     authjwt_access_token_expires: int = ...
     authjwt_refresh_token_expires: int = ...
     authjwt_user_claims: bool = True
+    # Максимальное количество проверенных токенов в кэше
+    token_cache_size: int = 10000
 
     class Config:
         env_file = ".env"
@@ -71,6 +73,148 @@ class MovieServiceSettings(BaseSettings):
         return f"http://{self.host}:{self.port}/api/v1/movie"
 
 
+class AuthServiceSettings(BaseSettings):
+    """
+    Настройки сервиса авторизации
+
+    Атрибуты:
+        jwks_refresh_interval: Интервал обновления открытых ключей (в секундах).
+    """
+    host: str = 'auth'
+    port: int = 8082
+    jwks_refresh_interval: int = 300
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_AUTH_"
+
+    @property
+    def jwks_url(self) -> str:
+        return f"http://{self.host}:{self.port}/.well-known/jwks.json"
+
+
+class MovieExistenceCacheSettings(BaseSettings):
+    """
+    Настройки кэша проверок существования фильмов
+
+    Атрибуты:
+        ttl: Время жизни положительного результата (в секундах).
+        negative_ttl: Время жизни отрицательного результата (в секундах).
+        max_size: Максимальное количество записей в кэше.
+    """
+    ttl: int = 300
+    negative_ttl: int = 30
+    max_size: int = 10000
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_MOVIE_CACHE_"
+
+
+class HttpClientSettings(BaseSettings):
+    """
+    Настройки общего HTTP клиента
+
+    Атрибуты:
+        max_connections: Максимальное количество соединений в пуле.
+        max_keepalive_connections: Максимальное количество простаивающих keep-alive соединений.
+        keepalive_expiry: Время жизни простаивающего соединения (в секундах).
+        timeout: Таймаут запроса (в секундах).
+        connect_timeout: Таймаут установки соединения (в секундах).
+        http2: Использовать HTTP/2, если его поддерживает сервер.
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    timeout: float = 5.0
+    connect_timeout: float = 2.0
+    http2: bool = True
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_HTTP_"
+
+
+class RatingBufferSettings(BaseSettings):
+    """
+    Настройки отложенной записи оценок
+
+    Атрибуты:
+        enabled: Записывать новые оценки через буфер.
+        max_batch_size: Максимальное количество оценок в одной записи в MongoDB.
+        flush_interval: Максимальное время ожидания заполнения пакета (в секундах).
+        max_queue_size: Размер очереди, при переполнении оценки записываются напрямую.
+        log_dir: Каталог журнала принятых, но не записанных оценок (пусто - без журнала).
+    """
+    enabled: bool = False
+    max_batch_size: int = 500
+    flush_interval: float = 0.5
+    max_queue_size: int = 100000
+    log_dir: str | None = None
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_RATING_BUFFER_"
+
+
+class RatingImportSettings(BaseSettings):
+    """
+    Настройки импорта исторических оценок
+
+    Атрибуты:
+        movie_db_dsn: Подключение к базе сервиса фильмов для загрузки идентификаторов фильмов.
+        batch_size: Количество строк, проверяемых и записываемых за один шаг (между контрольными точками).
+        insert_chunk_size: Количество оценок в одном insert_many.
+        concurrency: Максимальное количество одновременных insert_many.
+    """
+    movie_db_dsn: str = 'postgresql://movie:movie@db:5432/movie'
+    batch_size: int = 20000
+    insert_chunk_size: int = 1000
+    concurrency: int = 8
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_RATING_IMPORT_"
+
+
+class ReviewSearchSettings(BaseSettings):
+    """
+    Настройки полнотекстового поиска по рецензиям
+
+    Атрибуты:
+        backend: elasticsearch или memory (индекс в памяти процесса, для тестов и разработки).
+        index: Имя индекса Elasticsearch.
+        batch_size: Максимальное количество изменений в одном bulk запросе.
+        flush_interval: Максимальная задержка отправки изменений в индекс (в секундах).
+    """
+    backend: str = 'elasticsearch'
+    host: str = 'elasticsearch_db'
+    port: int = 9200
+    index: str = 'reviews'
+    batch_size: int = 500
+    flush_interval: float = 1.0
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "PROFILE_API_REVIEW_SEARCH_"
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+class RedisSettings(BaseSettings):
+    """
+    Настройки подключения к Redis
+    """
+    host: str = 'redis'
+    port: int = 6379
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "REDIS_"
+
+
 class MongoDataBaseSettings(BaseSettings):
     initdb_root_username: str = ...
     initdb_root_password: str = ...
@@ -105,6 +249,8 @@ class Settings(BaseSettings):
     project_name: str
     uvicorn_host: str
     uvicorn_port: int
+    # Токен служебных эндпоинтов /api/v1/internal (заголовок X-Internal-Token), пусто - эндпоинты отключены
+    internal_token: str | None = None
 
     # Postgres
     db: DataBaseSettings = DataBaseSettings()
@@ -112,9 +258,24 @@ class Settings(BaseSettings):
 
     # MongoDB
     mongo_db: MongoDataBaseSettings = MongoDataBaseSettings()
+    rating_buffer: RatingBufferSettings = RatingBufferSettings()
+    rating_import: RatingImportSettings = RatingImportSettings()
+
+    # Redis
+    redis: RedisSettings = RedisSettings()
+
+    # Поиск по рецензиям
+    review_search: ReviewSearchSettings = ReviewSearchSettings()
+
+    # Auth API
+    auth_service: AuthServiceSettings = AuthServiceSettings()
 
     # Movie API
     movie_service = MovieServiceSettings()
+    movie_cache: MovieExistenceCacheSettings = MovieExistenceCacheSettings()
+
+    # HTTP клиент
+    http_client: HttpClientSettings = HttpClientSettings()
 
     class Config:
         """Конфигурация для загрузки переменных окружения."""
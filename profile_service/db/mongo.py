@@ -1,10 +1,14 @@
+import logging
 from typing import AsyncGenerator
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.errors import PyMongoError
 
 from enum import Enum
 
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
 client = AsyncIOMotorClient(settings.mongo_db.url, uuidRepresentation='standard')
 mongo_db = client[settings.mongo_db.default_database]
 
@@ -30,6 +34,76 @@ async def shard_collections(collections: Enum):
         )
 
 
+def _index_key(key) -> list:
+    # Сервер может вернуть направление как float, приводим к виду из спецификации
+    return [(field, int(value) if isinstance(value, (int, float)) else value) for field, value in key.items()]
+
+
+async def index_report(collections: Enum) -> dict:
+    """
+    Сравнение объявленных индексов с существующими.
+
+    missing - объявлены, но не созданы;
+    undeclared - существуют, но не объявлены;
+    redundant - неуникальные индексы, ключ которых является префиксом другого индекса.
+    """
+    report = {}
+    for collection in collections:
+        existing = {
+            index["name"]: index
+            async for index in mongo_db[collection.collection_name].list_indexes()
+        }
+        existing_keys = {name: _index_key(index["key"]) for name, index in existing.items()}
+        declared_keys = [_index_key(index.document["key"]) for index in collection.indexes]
+        known_keys = declared_keys + [_index_key(collection.shard_key), [("_id", 1)]]
+
+        report[collection.collection_name] = {
+            "missing": [
+                index.document["name"] for index, key in zip(collection.indexes, declared_keys)
+                if key not in existing_keys.values()
+            ],
+            "undeclared": [name for name, key in existing_keys.items() if key not in known_keys],
+            "redundant": [
+                name for name, key in existing_keys.items()
+                if name != "_id_" and not existing[name].get("unique") and any(
+                    other != key and other[:len(key)] == key for other in existing_keys.values()
+                )
+            ],
+        }
+    return report
+
+
+async def ensure_unique_indexes(collections: Enum) -> None:
+    """
+    Создание объявленных уникальных индексов.
+    На них держится защита от повторных оценок и закладок, поэтому сервис
+    дожидается их при старте, а ошибка создания прерывает запуск.
+    """
+    for collection in collections:
+        unique = [index for index in collection.indexes if index.document.get("unique")]
+        if unique:
+            await mongo_db[collection.collection_name].create_indexes(unique)
+
+
+async def ensure_indexes(collections: Enum) -> None:
+    """
+    Создание объявленных индексов.
+    Уже существующие индексы с той же спецификацией сервер пропускает, поэтому
+    функция идемпотентна и запускается в фоне при каждом старте.
+    """
+    for collection in collections:
+        if not collection.indexes:
+            continue
+        try:
+            await mongo_db[collection.collection_name].create_indexes(collection.indexes)
+        except PyMongoError as e:
+            logger.error(f"Failed to create indexes for {collection.collection_name}: {e}")
+
+    for collection_name, problems in (await index_report(collections)).items():
+        if any(problems.values()):
+            logger.warning(f"Indexes of {collection_name} differ from declared: {problems}")
+
+
 async def get_db() -> AsyncGenerator:
     try:
         yield mongo_db
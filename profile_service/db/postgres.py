@@ -2,7 +2,6 @@
 
 from typing import AsyncGenerator
 
-import httpx
 from fastapi import Depends
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
@@ -50,16 +49,6 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
-async def get_http_client() -> AsyncGenerator[httpx.AsyncClient, None]:
-    """Генератор HTTP клиентов.
-
-    Yields:
-        httpx.AsyncClient: Асинхронный HTTP клиент.
-    """
-    async with httpx.AsyncClient() as client:
-        yield client
-
-
 async def create_db_and_tables() -> None:
     """Создание базы данных и таблиц."""
     async with engine.begin() as conn:
@@ -1,17 +1,61 @@
 from uuid import UUID
+import hashlib
+import secrets
 import uuid
 from functools import wraps
-from fastapi import HTTPException, status, Request
+from fastapi import Header, HTTPException, status, Request
 from async_fastapi_jwt_auth import AuthJWT
 from async_fastapi_jwt_auth.exceptions import AuthJWTException
 
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
 from core.config import settings
-from jose import jwt
+from jose import JWTError, jwt
 import time
 import http
 
+from services.jwks import jwks_client
+from utils.cache import TTLCache
+
+HMAC_ALGORITHMS = {'HS256', 'HS384', 'HS512'}
+
+# Декодированные claims проверенных токенов, ключ - хеш токена.
+# Запись живет до истечения срока действия токена.
+token_cache = TTLCache(max_size=settings.jwt.token_cache_size)
+
+
+async def get_verification_key(token: str) -> str | dict | None:
+    """
+    Ключ проверки подписи: общий секрет или открытый ключ из JWKS по kid токена
+    """
+    if settings.jwt.authjwt_algorithm in HMAC_ALGORITHMS:
+        return settings.jwt.authjwt_secret_key
+    return await jwks_client.get_key(jwt.get_unverified_header(token).get('kid'))
+
+
+async def verify_token(token: str) -> dict | None:
+    """
+    Проверка подписи и срока действия токена.
+    Повторные проверки того же токена берутся из кэша без проверки подписи.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+    try:
+        verification_key = await get_verification_key(token)
+        if verification_key is None:
+            return None
+        claims = jwt.decode(token, verification_key,
+                            algorithms=[settings.jwt.authjwt_algorithm])
+    except JWTError:
+        return None
+    ttl = claims.get('exp', 0) - time.time()
+    if ttl <= 0:
+        return None
+    token_cache.set(key, claims, ttl)
+    return claims
+
 
 def access_token_required(func):
     @wraps(func)
@@ -29,8 +73,15 @@ def access_token_required(func):
 
 
 async def get_current_user(authorize: AuthJWT) -> UUID:
-    await authorize.jwt_required()
-    user_id = uuid.UUID(await authorize.get_jwt_subject())
+    # Токен уже извлечен AuthJWT из заголовка, подпись проверяется локально
+    token = getattr(authorize, '_token', None)
+    claims = await verify_token(token) if token else None
+    if not claims or claims.get('type') != 'access':
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail='Invalid access token'
+        )
+    user_id = uuid.UUID(claims.get('sub'))
     if not user_id:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -49,16 +100,11 @@ class JWTBearer(HTTPBearer):
         super().__init__(auto_error=auto_error)
 
     @staticmethod
-    def decode_token(token: str) -> dict | None:
+    async def decode_token(token: str) -> dict | None:
         """
         Функция декодирования токена
         """
-        try:
-            decoded_token = jwt.decode(token, settings.jwt.authjwt_secret_key,
-                                       algorithms=[settings.jwt.authjwt_algorithm])
-            return decoded_token if decoded_token['exp'] >= time.time() else None
-        except Exception:
-            return None
+        return await verify_token(token)
 
     async def __call__(self, request: Request) -> dict:
         credentials: HTTPAuthorizationCredentials = await super().__call__(request)
@@ -66,14 +112,26 @@ class JWTBearer(HTTPBearer):
             raise HTTPException(status_code=http.HTTPStatus.FORBIDDEN, detail='Invalid authorization code.')
         if not credentials.scheme == 'Bearer':
             raise HTTPException(status_code=http.HTTPStatus.UNAUTHORIZED, detail='Only Bearer token might be accepted')
-        decoded_token = self.parse_token(credentials.credentials)
+        decoded_token = await self.parse_token(credentials.credentials)
         if not decoded_token:
             raise HTTPException(status_code=http.HTTPStatus.FORBIDDEN, detail='Invalid or expired token.')
+        request.state.jwt_claims = decoded_token
         return decoded_token
 
     @staticmethod
-    def parse_token(jwt_token: str) -> dict | None:
-        return JWTBearer.decode_token(jwt_token)
+    async def parse_token(jwt_token: str) -> dict | None:
+        return await JWTBearer.decode_token(jwt_token)
 
 
 security_jwt = JWTBearer()
+
+
+async def verify_internal_token(x_internal_token: str | None = Header(None)) -> None:
+    """
+    Доступ к служебным эндпоинтам по общему токену.
+    Пока токен не задан в настройках, служебные эндпоинты отключены
+    """
+    if not settings.internal_token:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Not Found')
+    if not x_internal_token or not secrets.compare_digest(x_internal_token, settings.internal_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Invalid internal token')
@@ -1,12 +1,22 @@
+import asyncio
+
 from fastapi.responses import ORJSONResponse
 from fastapi import FastAPI
 
 from core.config import settings, JWTSettings
 from contextlib import asynccontextmanager
-from api.v1 import profiles, bookmarks, ratings, reviews
+from api.v1 import profiles, bookmarks, ratings, reviews, internal
 from async_fastapi_jwt_auth import AuthJWT
 
-from db.mongo import shard_collections
+from redis.asyncio import Redis
+
+from db import http_client, redis
+from db.mongo import ensure_indexes, ensure_unique_indexes, shard_collections, mongo_db
+from services.counters import Counters
+from services.jwks import jwks_client
+from services.rating_aggregates import RatingAggregates
+from services.rating_buffer import rating_buffer
+from services.review_search import create_backend, review_indexer
 from utils.wait_for_mongo_ready import wait_for_mongo_ready
 from utils.enums import ShardedCollections
 
@@ -16,7 +26,24 @@ async def lifespan(app: FastAPI):
     AuthJWT.load_config(lambda: JWTSettings())
     await wait_for_mongo_ready(settings.mongo_db.url)
     await shard_collections(ShardedCollections)
+    # Без уникальных индексов повторные оценки и закладки не отклоняются, поэтому их сервис дожидается
+    await ensure_unique_indexes(ShardedCollections)
+    # Построение остальных индексов на больших коллекциях долгое, сервис стартует не дожидаясь его
+    indexes_task = asyncio.create_task(ensure_indexes(ShardedCollections))
+    await RatingAggregates(mongo_db).ensure_built()
+    await Counters(mongo_db).ensure_built()
+    http_client.client = http_client.create_http_client()
+    redis.connection = Redis(host=settings.redis.host, port=settings.redis.port)
+    await jwks_client.start(http_client.client)
+    await rating_buffer.start(mongo_db)
+    await review_indexer.start(mongo_db, create_backend(http_client.client))
     yield
+    await review_indexer.stop()
+    await rating_buffer.stop()
+    await jwks_client.stop()
+    indexes_task.cancel()
+    await redis.connection.aclose()
+    await http_client.client.aclose()
 
 
 app = FastAPI(
@@ -31,3 +58,5 @@ app.include_router(profiles.router, prefix="/api/v1/profiles", tags=["profiles"]
 app.include_router(bookmarks.router, prefix="/api/v1/bookmarks", tags=["bookmarks"])
 app.include_router(ratings.router, prefix="/api/v1/ratings", tags=["ratings"])
 app.include_router(reviews.router, prefix="/api/v1/reviews", tags=["reviews"])
+app.include_router(internal.router, prefix="/api/v1/internal")
+
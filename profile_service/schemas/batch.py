@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+from uuid import UUID
+
+from utils.enums import BatchItemStatus
+
+# Максимальное количество элементов в одном пакетном запросе
+BATCH_MAX_SIZE = 500
+
+
+class BatchItemResult(BaseModel):
+    movie_id: UUID
+    status: BatchItemStatus
+    detail: str | None = None
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult]
@@ -3,6 +3,7 @@ from typing import List
 from datetime import datetime
 from uuid import UUID
 from utils.enums import BookmarkType
+from schemas.batch import BATCH_MAX_SIZE
 
 
 class Bookmark(BaseModel):
@@ -20,8 +21,18 @@ class BookmarkResponse(BaseModel):
 
 class BookmarksListResponse(BaseModel):
     bookmarks: List[BookmarkResponse]
-    total: int
+    total: int | None = None
+    next_cursor: str | None = None
 
 
 class BookmarkUpdate(BaseModel):
     bookmark_type: BookmarkType | None = None
+
+
+class BookmarkBatchItem(BaseModel):
+    movie_id: UUID
+    bookmark_type: BookmarkType | None = Field(None, description="Тип закладки, null удаляет закладку")
+
+
+class BookmarksBatch(BaseModel):
+    items: List[BookmarkBatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
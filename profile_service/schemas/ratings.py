@@ -1,8 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List
 from datetime import datetime
 from uuid import UUID
 
+from schemas.batch import BATCH_MAX_SIZE
+
 
 class RatingBase(BaseModel):
     movie_id: UUID
@@ -25,10 +27,45 @@ class RatingUpdate(BaseModel):
 
 class RatingsList(BaseModel):
     ratings: List[RatingResponse]
-    total: int
+    total: int | None = None
+    next_cursor: str | None = None
 
 
 class MovieAverageRating(BaseModel):
     movie_id: UUID
     average_rating: float
     total_ratings: int
+
+
+class RatingTrendPoint(BaseModel):
+    month: str
+    total_ratings: int
+    average_rating: float | None
+
+
+class MovieRatingDistribution(BaseModel):
+    movie_id: UUID
+    total_ratings: int
+    average_rating: float | None
+    median: float | None
+    std_dev: float | None
+    percentiles: Dict[str, float | None]
+    histogram: Dict[int, int]
+    trend: List[RatingTrendPoint] = []
+
+
+class MovieIdsRequest(BaseModel):
+    movie_ids: List[UUID] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
+
+
+class MovieRatingDistributions(BaseModel):
+    distributions: List[MovieRatingDistribution]
+
+
+class RatingBatchItem(BaseModel):
+    movie_id: UUID
+    rating: int | None = Field(None, ge=1, le=10, description="Rating from 1 to 10, null deletes the rating")
+
+
+class RatingsBatch(BaseModel):
+    items: List[RatingBatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
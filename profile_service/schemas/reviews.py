@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List
 from datetime import datetime
 from uuid import UUID
 
@@ -28,9 +28,26 @@ class ReviewUpdate(BaseModel):
 
 class ReviewsList(BaseModel):
     reviews: List[ReviewResponse]
-    total: int
+    total: int | None = None
+    next_cursor: str | None = None
 
 
 class ReviewPartialUpdate(BaseModel):
     text: str | None = Field(None, min_length=10, max_length=10000)
     title: str | None = Field(None, min_length=3, max_length=255)
+
+
+class ReviewSearchHit(BaseModel):
+    id: str
+    movie_id: UUID
+    user_id: UUID
+    title: str
+    text: str
+    created_at: datetime | None = None
+    score: float
+    highlights: Dict[str, List[str]] = {}
+
+
+class ReviewSearchResponse(BaseModel):
+    total: int
+    results: List[ReviewSearchHit]
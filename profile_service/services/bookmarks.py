@@ -1,18 +1,31 @@
+import asyncio
 from functools import lru_cache
 from fastapi import Depends, HTTPException, status
 from datetime import datetime
 
 from db.mongo import get_db
-from utils.enums import ShardedCollections
-from schemas.bookmarks import Bookmark, BookmarkType, BookmarksListResponse
+import httpx
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.enums import BatchItemStatus, ShardedCollections, TotalMode
+from schemas.batch import BatchItemResult, BatchResponse
+from schemas.bookmarks import Bookmark, BookmarkType, BookmarksListResponse, BookmarksBatch
 from async_fastapi_jwt_auth import AuthJWT
 from dependencies.auth import get_current_user
+from db.http_client import get_http_client
+from services.counters import Counters
+from services.movies import MovieClient
+from utils.bulk import run_bulk
+from utils.pagination import NEWEST_FIRST, count_total, fetch_page
 from uuid import UUID
 
 
 class BookmarkService:
-    def __init__(self, db):
+    def __init__(self, db, http_client: httpx.AsyncClient):
         self.collection = db[ShardedCollections.BOOKMARKS_COLLECTION.collection_name]
+        self.counters = Counters(db)
+        self.movies = MovieClient(http_client)
 
     async def add_bookmark(self,
                            bookmark: Bookmark,
@@ -20,18 +33,6 @@ class BookmarkService:
 
         user_id = await get_current_user(Authorize)
 
-        # Проверяем, не существует ли уже такая закладка
-        existing_bookmark = await self.collection.find_one({
-            "user_id": user_id,
-            "movie_id": bookmark.movie_id
-        })
-
-        if existing_bookmark:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Этот фильм уже добавлен в закладки"
-            )
-
         bookmark_dict = bookmark.dict()
         bookmark_dict.update({
             "user_id": user_id,
@@ -40,28 +41,29 @@ class BookmarkService:
             "updated_at": datetime.utcnow()
         })
 
+        # Повторную закладку отклоняет уникальный индекс (user_id, movie_id),
+        # insert_one дописывает _id в bookmark_dict, перечитывать документ не нужно
         try:
-            result = await self.collection.insert_one(bookmark_dict)
-            created_bookmark = await self.collection.find_one({"_id": result.inserted_id})
-            if not created_bookmark:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail="Failed to retrieve created bookmark"
-                )
-            return created_bookmark
-
-        except Exception as e:
+            await self.collection.insert_one(bookmark_dict)
+        except DuplicateKeyError:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=str(e)
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Этот фильм уже добавлен в закладки"
             )
 
+        await self.counters.increment(
+            Counters.user_key(user_id), {f"bookmarks.{bookmark.bookmark_type.value}": 1}
+        )
+        return bookmark_dict
+
     async def get_user_bookmarks(
             self,
             Authorize: AuthJWT,
             bookmark_type: BookmarkType = BookmarkType.WATCHLIST,
             skip: int = 0,
-            limit: int = 20
+            limit: int = 20,
+            cursor: str | None = None,
+            total_mode: TotalMode = TotalMode.EXACT
     ) -> BookmarksListResponse:
 
         user_id = await get_current_user(Authorize)
@@ -69,11 +71,17 @@ class BookmarkService:
         if bookmark_type:
             query["bookmark_type"] = bookmark_type
 
-        total = await self.collection.count_documents(query)
-        cursor = self.collection.find(query).skip(skip).limit(limit)
+        async def estimate() -> int:
+            counts = (await self.counters.get(Counters.user_key(user_id))).get("bookmarks", {})
+            return counts.get(bookmark_type.value, 0) if bookmark_type else sum(counts.values())
+
+        (docs, next_cursor), total = await asyncio.gather(
+            fetch_page(self.collection, query, NEWEST_FIRST, limit, skip, cursor),
+            count_total(self.collection, query, total_mode, not (skip or cursor), estimate)
+        )
         bookmarks = []
 
-        async for doc in cursor:
+        for doc in docs:
             bookmarks.append({
                 "bookmark_id": str(doc["_id"]),
                 "movie_id": doc["movie_id"],
@@ -82,23 +90,25 @@ class BookmarkService:
                 "updated_at": doc["updated_at"]
             })
 
-        return BookmarksListResponse(bookmarks=bookmarks, total=total)
+        return BookmarksListResponse(bookmarks=bookmarks, total=total, next_cursor=next_cursor)
 
     async def remove_bookmark(self, Authorize: AuthJWT,
                               movie_id: UUID):
 
         user_id = await get_current_user(Authorize)
-        result = await self.collection.delete_one({
+        deleted = await self.collection.find_one_and_delete({
             "user_id": user_id,
             "movie_id": movie_id
         })
 
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Закладка не найдена"
             )
 
+        await self.counters.increment(Counters.user_key(user_id), {f"bookmarks.{deleted['bookmark_type']}": -1})
+
         return True
 
     async def update_bookmark(
@@ -111,23 +121,115 @@ class BookmarkService:
         user_id = await get_current_user(Authorize)
 
         bookmark_data["updated_at"] = datetime.utcnow()
-        result = await self.collection.update_one(
+        # Прежний тип закладки нужен для переноса счетчика
+        previous = await self.collection.find_one_and_update(
             {
                 "user_id": user_id,
                 "movie_id": movie_id
             },
-            {"$set": bookmark_data}
+            {"$set": bookmark_data},
+            return_document=ReturnDocument.BEFORE
         )
 
-        if result.modified_count == 0:
+        if not previous:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Закладка не найдена"
             )
 
+        new_type = bookmark_data.get("bookmark_type")
+        if new_type and new_type != previous["bookmark_type"]:
+            await self.counters.increment(Counters.user_key(user_id), {
+                f"bookmarks.{previous['bookmark_type']}": -1,
+                f"bookmarks.{BookmarkType(new_type).value}": 1
+            })
+
         return True
 
 
+    async def batch_bookmarks(self, Authorize: AuthJWT, batch: BookmarksBatch) -> BatchResponse:
+        """
+        Пакетное добавление, изменение и удаление закладок пользователя.
+        Фильмы проверяются одним запросом к сервису фильмов, изменения
+        выполняются одним неупорядоченным bulk_write.
+        """
+        user_id = await get_current_user(Authorize)
+
+        results: list[BatchItemResult | None] = [None] * len(batch.items)
+        positions: dict[UUID, int] = {}
+        for index, item in enumerate(batch.items):
+            if item.movie_id in positions:
+                results[index] = BatchItemResult(movie_id=item.movie_id, status=BatchItemStatus.DUPLICATE)
+            else:
+                positions[item.movie_id] = index
+
+        added_ids = [movie_id for movie_id, index in positions.items() if batch.items[index].bookmark_type]
+        existing_movies, previous = await asyncio.gather(
+            self.movies.existing_movie_ids(added_ids),
+            self._get_bookmark_types_by_movie(user_id, list(positions))
+        )
+
+        now = datetime.utcnow()
+        operations = []
+        planned = []
+        for movie_id, index in positions.items():
+            bookmark_type = batch.items[index].bookmark_type
+            key = {"user_id": user_id, "movie_id": movie_id}
+            if bookmark_type is None:
+                if movie_id not in previous:
+                    results[index] = BatchItemResult(movie_id=movie_id, status=BatchItemStatus.NOT_FOUND)
+                    continue
+                operations.append(DeleteOne(key))
+            else:
+                if movie_id not in existing_movies:
+                    results[index] = BatchItemResult(movie_id=movie_id, status=BatchItemStatus.MOVIE_NOT_FOUND)
+                    continue
+                # Фильтр содержит весь ключ шардирования, поэтому upsert допустим
+                operations.append(UpdateOne(
+                    key,
+                    {
+                        "$set": {"bookmark_type": bookmark_type.value, "updated_at": now},
+                        "$setOnInsert": {"created_at": now}
+                    },
+                    upsert=True
+                ))
+            planned.append((index, movie_id, bookmark_type))
+
+        upserted, errors = await run_bulk(self.collection, operations)
+
+        inc: dict[str, int] = {}
+        for position, (index, movie_id, bookmark_type) in enumerate(planned):
+            if position in errors:
+                results[index] = BatchItemResult(
+                    movie_id=movie_id, status=BatchItemStatus.ERROR, detail=errors[position]
+                )
+                continue
+            previous_type = None if position in upserted else previous.get(movie_id)
+            if previous_type:
+                inc[f"bookmarks.{previous_type}"] = inc.get(f"bookmarks.{previous_type}", 0) - 1
+            if bookmark_type:
+                inc[f"bookmarks.{bookmark_type.value}"] = inc.get(f"bookmarks.{bookmark_type.value}", 0) + 1
+            if bookmark_type is None:
+                item_status = BatchItemStatus.DELETED
+            elif position in upserted:
+                item_status = BatchItemStatus.CREATED
+            else:
+                item_status = BatchItemStatus.UPDATED
+            results[index] = BatchItemResult(movie_id=movie_id, status=item_status)
+
+        await self.counters.increment(Counters.user_key(user_id), inc)
+
+        return BatchResponse(results=results)
+
+    async def _get_bookmark_types_by_movie(self, user_id: UUID, movie_ids: list[UUID]) -> dict[UUID, str]:
+        cursor = self.collection.find(
+            {"user_id": user_id, "movie_id": {"$in": movie_ids}},
+            {"movie_id": 1, "bookmark_type": 1}
+        )
+        return {doc["movie_id"]: doc["bookmark_type"] async for doc in cursor}
+
+
 @lru_cache()
-def get_bookmark_service(db=Depends(get_db)) -> BookmarkService:
-    return BookmarkService(db)
+def get_bookmark_service(db=Depends(get_db),
+                         http_client: httpx.AsyncClient = Depends(get_http_client)) -> BookmarkService:
+    return BookmarkService(db, http_client)
@@ -0,0 +1,142 @@
+from uuid import UUID
+
+from pymongo import UpdateOne
+
+from utils.enums import ShardedCollections
+
+
+class Counters:
+    """
+    Материализованные счетчики документов пользователей и фильмов.
+
+    Документ пользователя: _id = {"user_id": ...}, поля ratings, reviews
+    и bookmarks.<тип закладки>. Документ фильма: _id = {"movie_id": ...}, поле reviews
+    (количество оценок фильма хранится в агрегатах рейтингов) и последние рецензии,
+    которые поддерживает LatestReviews.
+    Счетчики обновляются при записи и служат для оценки total в списках
+    без count_documents по шардированным коллекциям.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db[ShardedCollections.COUNTERS_COLLECTION.collection_name]
+
+    @staticmethod
+    def user_key(user_id: UUID) -> dict:
+        return {"user_id": user_id}
+
+    @staticmethod
+    def movie_key(movie_id: UUID) -> dict:
+        return {"movie_id": movie_id}
+
+    async def increment(self, key: dict, inc: dict[str, int]) -> None:
+        """
+        Изменение счетчиков документа, нулевые приращения отбрасываются
+        """
+        inc = {field: delta for field, delta in inc.items() if delta}
+        if not inc:
+            return
+        await self.collection.update_one(
+            {"_id": key},
+            {"$inc": inc, "$currentDate": {"updated_at": True}},
+            upsert=True
+        )
+
+    async def increment_many(self, increments: list[tuple[dict, dict[str, int]]]) -> None:
+        """
+        Изменение счетчиков нескольких документов одним bulk_write
+        """
+        operations = []
+        for key, inc in increments:
+            inc = {field: delta for field, delta in inc.items() if delta}
+            if inc:
+                operations.append(UpdateOne(
+                    {"_id": key},
+                    {"$inc": inc, "$currentDate": {"updated_at": True}},
+                    upsert=True
+                ))
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+
+    async def get(self, key: dict) -> dict:
+        """
+        Счетчики пользователя или фильма
+        """
+        return await self.collection.find_one({"_id": key}) or {}
+
+    async def rebuild(self) -> None:
+        """
+        Полный пересчет счетчиков по коллекциям рейтингов, рецензий и закладок
+        """
+        # updated_at позволяет читателям забирать только изменившиеся счетчики
+        touch = {"$set": {"updated_at": "$$NOW"}}
+        merge = {
+            "$merge": {
+                "into": ShardedCollections.COUNTERS_COLLECTION.collection_name,
+                "on": "_id",
+                "whenMatched": "merge",
+                "whenNotMatched": "insert"
+            }
+        }
+        ratings = self.db[ShardedCollections.RATINGS_COLLECTION.collection_name]
+        reviews = self.db[ShardedCollections.REVIEWS_COLLECTION.collection_name]
+        bookmarks = self.db[ShardedCollections.BOOKMARKS_COLLECTION.collection_name]
+
+        await ratings.aggregate([
+            {"$group": {"_id": {"user_id": "$user_id"}, "ratings": {"$sum": 1}}},
+            touch,
+            merge
+        ]).to_list(length=None)
+        await reviews.aggregate([
+            {"$group": {"_id": {"user_id": "$user_id"}, "reviews": {"$sum": 1}}},
+            touch,
+            merge
+        ]).to_list(length=None)
+        await reviews.aggregate([
+            {"$group": {"_id": {"movie_id": "$movie_id"}, "reviews": {"$sum": 1}}},
+            touch,
+            merge
+        ]).to_list(length=None)
+        await bookmarks.aggregate([
+            {
+                "$group": {
+                    "_id": {"user_id": "$user_id", "bookmark_type": "$bookmark_type"},
+                    "count": {"$sum": 1}
+                }
+            },
+            {
+                "$group": {
+                    "_id": {"user_id": "$_id.user_id"},
+                    "bookmarks": {"$push": {"k": "$_id.bookmark_type", "v": "$count"}}
+                }
+            },
+            {"$project": {"bookmarks": {"$arrayToObject": "$bookmarks"}}},
+            touch,
+            merge
+        ]).to_list(length=None)
+
+    async def rebuild_user_ratings(self, user_ids: list[UUID]) -> None:
+        """
+        Пересчет счетчиков оценок пользователей user_ids по коллекции рейтингов
+        """
+        ratings = self.db[ShardedCollections.RATINGS_COLLECTION.collection_name]
+        await ratings.aggregate([
+            {"$match": {"user_id": {"$in": user_ids}}},
+            {"$group": {"_id": {"user_id": "$user_id"}, "ratings": {"$sum": 1}}},
+            {"$set": {"updated_at": "$$NOW"}},
+            {
+                "$merge": {
+                    "into": ShardedCollections.COUNTERS_COLLECTION.collection_name,
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "insert"
+                }
+            }
+        ]).to_list(length=None)
+
+    async def ensure_built(self) -> None:
+        """
+        Заполнение счетчиков, если коллекция счетчиков пуста
+        """
+        if not await self.collection.find_one({}, {"_id": 1}):
+            await self.rebuild()
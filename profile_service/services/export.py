@@ -0,0 +1,78 @@
+import zlib
+from functools import lru_cache
+from typing import AsyncIterator
+from uuid import UUID
+
+import orjson
+from bson import ObjectId
+from fastapi import Depends
+
+from db.mongo import get_db
+from utils.enums import ShardedCollections
+
+# Количество документов, получаемых от Mongo за один запрос курсора
+EXPORT_BATCH_SIZE = 1000
+# Размер части ответа, отправляемой клиенту
+CHUNK_SIZE = 64 * 1024
+
+# Выгружаемые коллекции: тип записи -> (коллекция, сортировка по индексу с префиксом user_id)
+EXPORT_SOURCES = {
+    "rating": (ShardedCollections.RATINGS_COLLECTION, [("created_at", 1), ("_id", 1)]),
+    "review": (ShardedCollections.REVIEWS_COLLECTION, [("created_at", 1), ("_id", 1)]),
+    "bookmark": (
+        ShardedCollections.BOOKMARKS_COLLECTION,
+        [("bookmark_type", 1), ("created_at", 1), ("_id", 1)]
+    ),
+}
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError
+
+
+class ExportService:
+    def __init__(self, db):
+        self.db = db
+
+    async def export_lines(self, user_id: UUID) -> AsyncIterator[bytes]:
+        """
+        Оценки, рецензии и закладки пользователя в формате NDJSON, частями не больше CHUNK_SIZE.
+        В памяти находится не больше одной пачки курсора
+        """
+        chunk = bytearray()
+        for record_type, (collection, sort) in EXPORT_SOURCES.items():
+            cursor = self.db[collection.collection_name].find(
+                {"user_id": user_id}, sort=sort, batch_size=EXPORT_BATCH_SIZE
+            )
+            async for doc in cursor:
+                doc["id"] = doc.pop("_id")
+                chunk += orjson.dumps({"type": record_type, **doc}, default=_default)
+                chunk += b"\n"
+                if len(chunk) >= CHUNK_SIZE:
+                    yield bytes(chunk)
+                    chunk.clear()
+        if chunk:
+            yield bytes(chunk)
+
+    async def export(self, user_id: UUID, compress: bool = False) -> AsyncIterator[bytes]:
+        """
+        Выгрузка истории пользователя, при compress - сжатая gzip
+        """
+        if not compress:
+            async for chunk in self.export_lines(user_id):
+                yield chunk
+            return
+        # wbits=31 - формат gzip с заголовком и контрольной суммой
+        compressor = zlib.compressobj(wbits=31)
+        async for chunk in self.export_lines(user_id):
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+
+@lru_cache()
+def get_export_service(db=Depends(get_db)) -> ExportService:
+    return ExportService(db)
@@ -0,0 +1,25 @@
+import logging
+from uuid import UUID
+
+from db import redis
+
+logger = logging.getLogger(__name__)
+
+# Канал, по которому movie_service сбрасывает кэш карточек фильмов
+FILM_RATINGS_CHANNEL = "film_ratings_changed"
+
+
+async def publish_ratings_changed(movie_ids: list[UUID]) -> None:
+    """
+    Уведомление об изменении оценок фильмов.
+    Ошибка публикации не прерывает запись: карточка обновится по истечении ее срока свежести
+    """
+    if redis.connection is None or not movie_ids:
+        return
+    try:
+        await redis.connection.publish(
+            FILM_RATINGS_CHANNEL,
+            ",".join(str(movie_id) for movie_id in dict.fromkeys(movie_ids))
+        )
+    except Exception as e:
+        logger.error(f"Failed to publish film ratings change: {e}")
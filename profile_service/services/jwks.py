@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import time
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Минимальный интервал между внеочередными обновлениями при неизвестном kid
+MIN_REFRESH_INTERVAL = 30
+
+
+class JWKSClient:
+    """
+    Открытые ключи сервиса авторизации.
+
+    Набор ключей загружается при старте и периодически обновляется в фоне,
+    поэтому проверка токенов не требует обращений к сервису авторизации.
+    Токен с неизвестным kid вызывает внеочередное обновление, но не чаще
+    раза в MIN_REFRESH_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self.keys: dict[str, dict] = {}
+        self.http_client: httpx.AsyncClient | None = None
+        self._last_refresh = 0.0
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    async def start(self, http_client: httpx.AsyncClient) -> None:
+        self.http_client = http_client
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Failed to load JWKS: {e}")
+        self._task = asyncio.create_task(self._refresh_periodically())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def refresh(self) -> None:
+        self._last_refresh = time.monotonic()
+        response = await self.http_client.get(settings.auth_service.jwks_url)
+        response.raise_for_status()
+        self.keys = {key["kid"]: key for key in response.json()["keys"]}
+
+    async def get_key(self, kid: str | None) -> dict | None:
+        key = self.keys.get(kid)
+        if key is not None or kid is None or self.http_client is None:
+            return key
+        async with self._lock:
+            if kid not in self.keys and time.monotonic() - self._last_refresh >= MIN_REFRESH_INTERVAL:
+                try:
+                    await self.refresh()
+                except Exception as e:
+                    logger.error(f"Failed to refresh JWKS: {e}")
+        return self.keys.get(kid)
+
+    async def _refresh_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.auth_service.jwks_refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh JWKS: {e}")
+
+
+jwks_client = JWKSClient()
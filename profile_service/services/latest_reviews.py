@@ -0,0 +1,108 @@
+from uuid import UUID
+
+from services.counters import Counters
+from utils.enums import ShardedCollections
+from utils.pagination import NEWEST_FIRST
+
+# Количество последних рецензий, хранимых в документе счетчиков фильма
+LATEST_REVIEWS_SIZE = 20
+# Поля рецензии, копируемые в документ счетчиков
+REVIEW_FIELDS = ("_id", "movie_id", "user_id", "title", "text", "created_at", "updated_at")
+
+
+def _snapshot(review: dict) -> dict:
+    return {field: review.get(field) for field in REVIEW_FIELDS}
+
+
+class LatestReviews:
+    """
+    Количество рецензий фильма и его последние LATEST_REVIEWS_SIZE рецензий
+    в документе счетчиков фильма, чтобы первая страница рецензий читалась одним запросом по ключу.
+
+    Рецензии хранятся в поле latest_reviews в порядке NEWEST_FIRST, каждое изменение
+    увеличивает latest_reviews_version. После удаления в списке может не хватать рецензий,
+    тогда чтение берет их из коллекции рецензий и восстанавливает список, если
+    версия за это время не изменилась.
+    """
+
+    def __init__(self, db):
+        self.reviews = db[ShardedCollections.REVIEWS_COLLECTION.collection_name]
+        self.collection = db[ShardedCollections.COUNTERS_COLLECTION.collection_name]
+
+    async def add(self, review: dict) -> None:
+        """
+        Учет новой рецензии: счетчик и список последних одной операцией
+        """
+        await self.collection.update_one(
+            {"_id": Counters.movie_key(review["movie_id"])},
+            {
+                "$inc": {"reviews": 1, "latest_reviews_version": 1},
+                "$push": {
+                    "latest_reviews": {
+                        "$each": [_snapshot(review)],
+                        "$sort": dict(NEWEST_FIRST),
+                        "$slice": LATEST_REVIEWS_SIZE
+                    }
+                },
+                "$currentDate": {"updated_at": True}
+            },
+            upsert=True
+        )
+
+    async def update(self, review: dict) -> None:
+        """
+        Замена измененной рецензии, если она среди последних
+        """
+        await self.collection.update_one(
+            {"_id": Counters.movie_key(review["movie_id"]), "latest_reviews._id": review["_id"]},
+            {
+                "$set": {"latest_reviews.$": _snapshot(review)},
+                "$inc": {"latest_reviews_version": 1}
+            }
+        )
+
+    async def remove(self, movie_id: UUID, review_id) -> None:
+        """
+        Учет удаленной рецензии
+        """
+        await self.collection.update_one(
+            {"_id": Counters.movie_key(movie_id)},
+            {
+                "$inc": {"reviews": -1, "latest_reviews_version": 1},
+                "$pull": {"latest_reviews": {"_id": review_id}},
+                "$currentDate": {"updated_at": True}
+            }
+        )
+
+    async def get(self, movie_id: UUID, limit: int) -> tuple[list[dict], int]:
+        """
+        Последние limit рецензий фильма (limit не больше LATEST_REVIEWS_SIZE) и общее количество рецензий
+        """
+        doc = await self.collection.find_one(
+            {"_id": Counters.movie_key(movie_id)},
+            {"reviews": 1, "latest_reviews": 1, "latest_reviews_version": 1}
+        ) or {}
+        total = doc.get("reviews", 0)
+        # Рецензия, попавшая в восстановленный список до своего добавления, может встретиться дважды
+        seen, latest = set(), []
+        for review in doc.get("latest_reviews", []):
+            if review["_id"] not in seen:
+                seen.add(review["_id"])
+                latest.append(review)
+        if len(latest) < min(limit, total):
+            latest = await self._restore(movie_id, doc.get("latest_reviews_version"))
+        return latest[:limit], total
+
+    async def _restore(self, movie_id: UUID, version: int | None) -> list[dict]:
+        latest = await self.reviews.find({"movie_id": movie_id}).sort(NEWEST_FIRST).limit(
+            LATEST_REVIEWS_SIZE
+        ).to_list(length=LATEST_REVIEWS_SIZE)
+        # Если список изменился после чтения, он не перезаписывается и восстановится при следующем промахе
+        await self.collection.update_one(
+            {"_id": Counters.movie_key(movie_id), "latest_reviews_version": version},
+            {
+                "$set": {"latest_reviews": [_snapshot(review) for review in latest]},
+                "$inc": {"latest_reviews_version": 1}
+            }
+        )
+        return latest
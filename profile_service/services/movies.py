@@ -0,0 +1,84 @@
+from uuid import UUID
+
+import httpx
+from fastapi import HTTPException, status
+
+from core.config import settings
+from utils.cache import TTLCache
+
+# Максимальное число идентификаторов в одном запросе к сервису фильмов
+EXISTS_BATCH_SIZE = 1000
+
+# Общий для всех сервисов процесса кэш проверок существования фильмов
+movie_existence_cache = TTLCache(max_size=settings.movie_cache.max_size)
+
+
+def _existence_ttl(exists: bool) -> float:
+    return settings.movie_cache.ttl if exists else settings.movie_cache.negative_ttl
+
+
+class MovieClient:
+    """
+    Клиент сервиса фильмов
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient):
+        self.http_client = http_client
+
+    async def movie_exists(self, movie_id: UUID) -> bool:
+        """
+        Проверка существования фильма с кэшированием результата.
+        Отсутствующие фильмы кэшируются на короткое время, одновременные
+        проверки одного фильма выполняются одним запросом.
+        """
+        return await movie_existence_cache.get_or_load(
+            movie_id,
+            lambda: self._fetch_movie_exists(movie_id),
+            ttl=_existence_ttl
+        )
+
+    async def existing_movie_ids(self, movie_ids: list[UUID]) -> set[UUID]:
+        """
+        Пакетная проверка существования фильмов.
+        Закэшированные результаты берутся из кэша, остальные запрашиваются
+        у сервиса фильмов пачками и сохраняются в кэш.
+        """
+        existing = set()
+        unknown = []
+        for movie_id in dict.fromkeys(movie_ids):
+            cached = movie_existence_cache.get(movie_id)
+            if cached is None:
+                unknown.append(movie_id)
+            elif cached:
+                existing.add(movie_id)
+
+        for start in range(0, len(unknown), EXISTS_BATCH_SIZE):
+            batch = unknown[start:start + EXISTS_BATCH_SIZE]
+            found = await self._fetch_existing_ids(batch)
+            for movie_id in batch:
+                exists = movie_id in found
+                movie_existence_cache.set(movie_id, exists, _existence_ttl(exists))
+            existing |= found
+
+        return existing
+
+    async def _fetch_movie_exists(self, movie_id: UUID) -> bool:
+        return movie_id in await self._fetch_existing_ids([movie_id])
+
+    async def _fetch_existing_ids(self, movie_ids: list[UUID]) -> set[UUID]:
+        try:
+            response = await self.http_client.post(
+                f"{settings.movie_service.url}/films/exists",
+                json={"ids": [str(movie_id) for movie_id in movie_ids]}
+            )
+        except httpx.HTTPError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис фильмов недоступен"
+            )
+        if response.status_code != status.HTTP_200_OK:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервис фильмов недоступен"
+            )
+        return {UUID(movie_id) for movie_id in response.json()["existing"]}
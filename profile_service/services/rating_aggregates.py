@@ -0,0 +1,200 @@
+from datetime import datetime
+from uuid import UUID
+
+from pymongo import UpdateOne
+
+from services.film_events import publish_ratings_changed
+from utils.enums import ShardedCollections
+
+
+class RatingAggregates:
+    """
+    Материализованные агрегаты рейтингов фильмов.
+
+    На каждый фильм хранится один документ с _id = movie_id:
+    сумма оценок, их количество, гистограмма по значениям 1-10
+    и сумма и количество оценок по месяцам их создания (monthly.<YYYY-MM>),
+    нарастающий итог которых дает средний рейтинг на конец каждого месяца.
+    Измененная или удаленная оценка учитывается в месяце своего created_at,
+    как и при полном пересчете.
+    Документ обновляется инкрементально при изменении рейтинга,
+    поэтому чтение среднего рейтинга — это поиск по ключу, а не $group.
+    """
+
+    def __init__(self, db):
+        self.collection = db[ShardedCollections.RATING_AGGREGATES_COLLECTION.collection_name]
+        self.ratings = db[ShardedCollections.RATINGS_COLLECTION.collection_name]
+
+    @staticmethod
+    def build_increment(
+            added: int | None = None,
+            removed: int | None = None,
+            created_at: datetime | None = None
+    ) -> dict:
+        """
+        Формирование $inc для добавленной и/или удаленной оценки, созданной в created_at
+        """
+        month = (created_at or datetime.utcnow()).strftime("%Y-%m")
+        inc = {}
+        for value, sign in ((added, 1), (removed, -1)):
+            if value is None:
+                continue
+            for field, delta in (
+                    ("sum", value),
+                    ("count", 1),
+                    (f"histogram.{value}", 1),
+                    (f"monthly.{month}.sum", value),
+                    (f"monthly.{month}.count", 1)
+            ):
+                inc[field] = inc.get(field, 0) + sign * delta
+        return {field: delta for field, delta in inc.items() if delta}
+
+    async def apply(
+            self,
+            movie_id: UUID,
+            added: int | None = None,
+            removed: int | None = None,
+            created_at: datetime | None = None
+    ) -> None:
+        """
+        Инкрементальное обновление агрегатов фильма
+        """
+        inc = self.build_increment(added=added, removed=removed, created_at=created_at)
+        if not inc:
+            return
+        await self.collection.update_one(
+            {"_id": movie_id},
+            {"$inc": inc, "$currentDate": {"updated_at": True}},
+            upsert=True
+        )
+        await publish_ratings_changed([movie_id])
+
+    async def apply_many(self, changes: list[tuple[UUID, int | None, int | None, datetime | None]]) -> None:
+        """
+        Обновление агрегатов нескольких фильмов одним bulk_write.
+        changes - список (movie_id, добавленная оценка, удаленная оценка, дата создания оценки)
+        """
+        increments: dict[UUID, dict] = {}
+        for movie_id, added, removed, created_at in changes:
+            inc = increments.setdefault(movie_id, {})
+            for field, delta in self.build_increment(added=added, removed=removed, created_at=created_at).items():
+                inc[field] = inc.get(field, 0) + delta
+
+        operations = []
+        changed_ids = []
+        for movie_id, inc in increments.items():
+            inc = {field: delta for field, delta in inc.items() if delta}
+            if inc:
+                changed_ids.append(movie_id)
+                operations.append(UpdateOne(
+                    {"_id": movie_id},
+                    {"$inc": inc, "$currentDate": {"updated_at": True}},
+                    upsert=True
+                ))
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+            await publish_ratings_changed(changed_ids)
+
+    async def get(self, movie_id: UUID) -> dict | None:
+        """
+        Получение агрегатов рейтинга фильма
+        """
+        return await self.collection.find_one({"_id": movie_id})
+
+    async def get_many(self, movie_ids: list[UUID]) -> dict[UUID, dict]:
+        """
+        Получение агрегатов нескольких фильмов одним запросом
+        """
+        cursor = self.collection.find({"_id": {"$in": movie_ids}})
+        return {doc["_id"]: doc async for doc in cursor}
+
+    @staticmethod
+    def average(aggregate: dict | None) -> float:
+        """
+        Средний рейтинг по агрегатам фильма
+        """
+        if not aggregate or not aggregate.get("count"):
+            return 0.0
+        return round(aggregate["sum"] / aggregate["count"], 2)
+
+    async def rebuild(self, movie_ids: list[UUID] | None = None) -> None:
+        """
+        Полный пересчет агрегатов по коллекции рейтингов.
+        Используется для первичного заполнения и восстановления после сбоев.
+        """
+        pipeline = []
+        if movie_ids is not None:
+            pipeline.append({"$match": {"movie_id": {"$in": movie_ids}}})
+        pipeline.extend([
+            {
+                "$group": {
+                    "_id": {"movie_id": "$movie_id", "rating": "$rating"},
+                    "count": {"$sum": 1}
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$_id.movie_id",
+                    "sum": {"$sum": {"$multiply": ["$_id.rating", "$count"]}},
+                    "count": {"$sum": "$count"},
+                    "histogram": {"$push": {"k": {"$toString": "$_id.rating"}, "v": "$count"}}
+                }
+            },
+            {
+                "$project": {
+                    "sum": 1,
+                    "count": 1,
+                    "histogram": {"$arrayToObject": "$histogram"},
+                    "updated_at": "$$NOW"
+                }
+            },
+            {
+                "$merge": {
+                    "into": ShardedCollections.RATING_AGGREGATES_COLLECTION.collection_name,
+                    "on": "_id",
+                    "whenMatched": "replace",
+                    "whenNotMatched": "insert"
+                }
+            }
+        ])
+        await self.ratings.aggregate(pipeline).to_list(length=None)
+
+        # Помесячная история восстанавливается по дате создания оценок
+        monthly_pipeline = pipeline[:1] if movie_ids is not None else []
+        monthly_pipeline.extend([
+            {
+                "$group": {
+                    "_id": {
+                        "movie_id": "$movie_id",
+                        "month": {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}}
+                    },
+                    "sum": {"$sum": "$rating"},
+                    "count": {"$sum": 1}
+                }
+            },
+            {
+                "$group": {
+                    "_id": "$_id.movie_id",
+                    "monthly": {"$push": {"k": "$_id.month", "v": {"sum": "$sum", "count": "$count"}}}
+                }
+            },
+            {"$project": {"monthly": {"$arrayToObject": "$monthly"}}},
+            {
+                "$merge": {
+                    "into": ShardedCollections.RATING_AGGREGATES_COLLECTION.collection_name,
+                    "on": "_id",
+                    "whenMatched": "merge",
+                    "whenNotMatched": "discard"
+                }
+            }
+        ])
+        await self.ratings.aggregate(monthly_pipeline).to_list(length=None)
+
+    async def ensure_built(self) -> None:
+        """
+        Заполнение агрегатов, если коллекция агрегатов пуста, а рейтинги уже есть
+        """
+        if await self.collection.find_one({}, {"_id": 1}):
+            return
+        if await self.ratings.find_one({}, {"_id": 1}):
+            await self.rebuild()
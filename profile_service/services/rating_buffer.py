@@ -0,0 +1,271 @@
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import time
+from collections import Counter, deque
+
+from bson import ObjectId, json_util
+from bson.binary import UuidRepresentation
+from bson.json_util import JSONMode, JSONOptions
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from core.config import settings
+from services.counters import Counters
+from services.rating_aggregates import RatingAggregates
+from utils.enums import ShardedCollections
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+_JSON_OPTIONS = JSONOptions(
+    json_mode=JSONMode.CANONICAL,
+    uuid_representation=UuidRepresentation.STANDARD,
+)
+
+
+class _PendingBatch:
+    """
+    Пакет оценок и уже выполненные шаги его записи: повтор после сбоя
+    продолжает с невыполненного шага и не учитывает оценки в агрегатах дважды
+    """
+
+    def __init__(self, ratings: list[dict], replayed: bool = False):
+        self.ratings = ratings
+        # Пакет из журнала остановившегося воркера: часть оценок могла быть уже вставлена им
+        self.replayed = replayed
+        self.insert_attempts = 0
+        self.inserted: list[dict] | None = None
+        self.duplicates: list[dict] = []
+        self.aggregated = False
+        self.counted = False
+
+
+class RatingWriteBuffer:
+    """
+    Отложенная запись новых оценок.
+
+    Проверенные оценки складываются в очередь процесса и записываются в MongoDB
+    фоновой задачей пакетами: по достижении max_batch_size или через flush_interval.
+    Агрегаты рейтингов и счетчики пользователей обновляются тем же пакетом.
+
+    Если задан каталог журнала, оценка до постановки в очередь дописывается
+    в файл журнала воркера. После каждого записанного пакета журнал заменяется
+    новым, в котором остаются только оценки из очереди, а журналы остановившихся
+    воркеров при старте записываются повторно.
+    При повторной записи уже вставленные оценки отклоняются уникальными индексами.
+    Вставленные ли они этим воркером, неизвестно, поэтому агрегаты их фильмов
+    и счетчики их пользователей пересчитываются по коллекции рейтингов.
+    """
+
+    def __init__(self):
+        self.ratings = None
+        self.aggregates: RatingAggregates | None = None
+        self.counters: Counters | None = None
+        self.queue: asyncio.Queue | None = None
+        self.accepting = False
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        self._log = None
+        self._log_path: str | None = None
+        # Размеры строк журнала в байтах для оценок, которые еще не записаны, в порядке очереди
+        self._log_sizes: deque[int] = deque()
+        # Есть оценки, которые не удалось записать и которые остались только в журнале
+        self._unflushed = False
+
+    async def start(self, db) -> None:
+        config = settings.rating_buffer
+        if not config.enabled:
+            return
+        self.ratings = db[ShardedCollections.RATINGS_COLLECTION.collection_name]
+        self.aggregates = RatingAggregates(db)
+        self.counters = Counters(db)
+        self.queue = asyncio.Queue(maxsize=config.max_queue_size)
+        if config.log_dir:
+            await self._replay_orphaned_logs(config.log_dir)
+            self._open_log(config.log_dir)
+        self._stopping = False
+        self._unflushed = False
+        self._log_sizes.clear()
+        self.accepting = True
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Остановка приема и запись всех оценок из очереди
+        """
+        if self._task is None:
+            return
+        self.accepting = False
+        self._stopping = True
+        # Маркер конца очереди: после него новых оценок не будет
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+        if self._log is not None:
+            self._log.close()
+            if not self._unflushed:
+                os.remove(self._log_path)
+            self._log = None
+
+    def submit(self, rating: dict) -> bool:
+        """
+        Постановка оценки в очередь.
+
+        Returns:
+            False, если буфер выключен или переполнен и оценку нужно записать напрямую.
+        """
+        if not self.accepting or self.queue.full():
+            return False
+        rating.setdefault("_id", ObjectId())
+        if self._log is not None:
+            line = (json_util.dumps(rating, json_options=_JSON_OPTIONS) + "\n").encode("utf-8")
+            self._log.write(line)
+            self._log.flush()
+            self._log_sizes.append(len(line))
+        self.queue.put_nowait(rating)
+        return True
+
+    async def _run(self) -> None:
+        config = settings.rating_buffer
+        loop = asyncio.get_running_loop()
+        while True:
+            rating = await self.queue.get()
+            if rating is None:
+                return
+            batch = [rating]
+            deadline = loop.time() + config.flush_interval
+            finished = False
+            while len(batch) < config.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    rating = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if rating is None:
+                    finished = True
+                    break
+                batch.append(rating)
+
+            if not await self._flush_with_retry(_PendingBatch(batch)):
+                self._unflushed = True
+            if self._log is not None and not self._unflushed:
+                self._rotate_log(len(batch))
+            if finished:
+                return
+
+    async def _flush_with_retry(self, batch: _PendingBatch) -> bool:
+        delay = 1
+        while True:
+            try:
+                await self.flush(batch)
+                return True
+            except Exception as e:
+                if self._stopping:
+                    logger.error(f"Failed to flush {len(batch.ratings)} buffered ratings on shutdown: {e}")
+                    return False
+                logger.error(f"Failed to flush {len(batch.ratings)} buffered ratings, retrying: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def flush(self, batch: _PendingBatch) -> None:
+        """
+        Запись пакета оценок и обновление агрегатов по фактически вставленным.
+        Выполненные шаги отмечаются в batch, повторный вызов продолжает с первого невыполненного
+        """
+        if batch.inserted is None:
+            batch.insert_attempts += 1
+            await self._insert(batch)
+        if not batch.aggregated:
+            await self.aggregates.apply_many(
+                [(rating["movie_id"], rating["rating"], None, rating["created_at"]) for rating in batch.inserted]
+            )
+            batch.aggregated = True
+        if not batch.counted:
+            per_user = Counter(rating["user_id"] for rating in batch.inserted)
+            await self.counters.increment_many(
+                [(Counters.user_key(user_id), {"ratings": count}) for user_id, count in per_user.items()]
+            )
+            batch.counted = True
+        # Повторы при первой вставке пакета работающего воркера - это повторные оценки пользователей,
+        # иначе отклоненная оценка могла быть вставлена прерванной попыткой без обновления агрегатов
+        if batch.duplicates and (batch.replayed or batch.insert_attempts > 1):
+            await self.aggregates.rebuild(list({rating["movie_id"] for rating in batch.duplicates}))
+            await self.counters.rebuild_user_ratings(list({rating["user_id"] for rating in batch.duplicates}))
+            batch.duplicates = []
+
+    async def _insert(self, batch: _PendingBatch) -> None:
+        rejected = set()
+        duplicates = set()
+        try:
+            await self.ratings.bulk_write([InsertOne(rating) for rating in batch.ratings], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                rejected.add(error["index"])
+                if error["code"] == DUPLICATE_KEY_ERROR:
+                    duplicates.add(error["index"])
+                else:
+                    logger.error(f"Buffered rating rejected: {error['errmsg']}")
+        batch.inserted = [rating for index, rating in enumerate(batch.ratings) if index not in rejected]
+        batch.duplicates = [rating for index, rating in enumerate(batch.ratings) if index in duplicates]
+
+    def _open_log(self, log_dir: str) -> None:
+        path = os.path.join(log_dir, f"ratings-{os.getpid()}-{time.time_ns()}.log")
+        self._log = self._create_log(path, b"")
+        self._log_path = path
+
+    def _rotate_log(self, flushed: int) -> None:
+        """
+        Замена журнала новым без строк flushed записанных оценок.
+        Новый файл занимает имя журнала атомарно, поэтому при падении в любой момент
+        на диске остается журнал со всеми незаписанными оценками
+        """
+        flushed_size = sum(self._log_sizes.popleft() for _ in range(flushed))
+        if not flushed_size:
+            return
+        self._log.seek(flushed_size)
+        pending = self._log.read()
+        log = self._create_log(self._log_path, pending)
+        self._log.close()
+        self._log = log
+
+    @staticmethod
+    def _create_log(path: str, content: bytes):
+        log = open(f"{path}.new", "ab+")
+        # Блокировка показывает, что журнал принадлежит работающему воркеру.
+        # Файл получает имя журнала только после блокировки, иначе его мог бы
+        # забрать на повторную запись одновременно стартующий воркер
+        fcntl.flock(log, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        log.write(content)
+        log.flush()
+        os.replace(f"{path}.new", path)
+        return log
+
+    async def _replay_orphaned_logs(self, log_dir: str) -> None:
+        os.makedirs(log_dir, exist_ok=True)
+        for path in sorted(glob.glob(os.path.join(log_dir, "ratings-*.log"))):
+            with open(path, "r", encoding="utf-8") as log_file:
+                try:
+                    fcntl.flock(log_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                ratings = []
+                for line in log_file:
+                    try:
+                        ratings.append(json_util.loads(line, json_options=_JSON_OPTIONS))
+                    except ValueError:
+                        # Последняя строка могла быть записана не полностью
+                        logger.warning(f"Skipping corrupted line in {path}")
+                batch_size = settings.rating_buffer.max_batch_size
+                for start in range(0, len(ratings), batch_size):
+                    await self.flush(_PendingBatch(ratings[start:start + batch_size], replayed=True))
+                logger.info(f"Replayed {len(ratings)} buffered ratings from {path}")
+                os.remove(path)
+
+
+rating_buffer = RatingWriteBuffer()
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Iterator
+from uuid import UUID
+
+import asyncpg
+import numpy as np
+import orjson
+from pymongo.errors import BulkWriteError
+
+from core.config import settings
+from db.mongo import mongo_db
+from services.counters import Counters
+from services.rating_aggregates import RatingAggregates
+from services.rating_buffer import DUPLICATE_KEY_ERROR
+from utils.enums import ShardedCollections
+from utils.rating_stats import RATING_VALUES
+
+logger = logging.getLogger(__name__)
+
+# Количество фильмов или пользователей в одном пересчете агрегатов и счетчиков
+AGGREGATES_CHUNK_SIZE = 1000
+_UINT64_MASK = (1 << 64) - 1
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: int = 0
+    invalid: int = 0
+    movie_not_found: int = 0
+    duplicate: int = 0
+    failed: int = 0
+
+
+def read_rows(path: str, file_format: str) -> Iterator[dict]:
+    """
+    Построчное чтение CSV или NDJSON с полями user_id, movie_id, rating и created_at
+    """
+    with open(path, encoding="utf-8", newline="") as file:
+        if file_format == "csv":
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Строка учитывается как некорректная, нумерация строк для контрольной точки не сбивается
+                yield {}
+
+
+def _parse_uuid(value) -> UUID | None:
+    try:
+        return UUID(str(value))
+    except ValueError:
+        return None
+
+
+def _parse_datetime(value, default: datetime) -> datetime | None:
+    if not value:
+        return default
+    try:
+        parsed = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    # В коллекции created_at хранится в UTC без часового пояса
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def validate_batch(rows: list[dict], movie_ids: set[UUID], stats: ImportStats) -> list[dict]:
+    """
+    Проверка пачки строк и удаление повторных оценок (user_id, movie_id) внутри пачки.
+    Повторы между пачками и с уже записанными оценками отклоняет уникальный индекс.
+    """
+    now = datetime.utcnow()
+    users = np.array([_parse_uuid(row.get("user_id")) for row in rows], dtype=object)
+    movies = np.array([_parse_uuid(row.get("movie_id")) for row in rows], dtype=object)
+    created = np.array([_parse_datetime(row.get("created_at"), now) for row in rows], dtype=object)
+    raw_ratings = np.array([str(row.get("rating", "")).strip() for row in rows], dtype=str)
+
+    # Длина ограничена, чтобы преобразование в int64 не переполнялось
+    numeric = np.char.isdecimal(raw_ratings) & (np.char.str_len(raw_ratings) <= 2)
+    ratings = np.where(numeric, raw_ratings, "0").astype(np.int64)
+    valid = users.astype(bool) & movies.astype(bool) & created.astype(bool) & np.isin(ratings, RATING_VALUES)
+    stats.invalid += int((~valid).sum())
+
+    known = valid & np.fromiter((movie in movie_ids for movie in movies), dtype=bool, count=len(rows))
+    stats.movie_not_found += int((valid & ~known).sum())
+
+    indices = np.flatnonzero(known)
+    if not len(indices):
+        return []
+    # UUID пользователя и фильма как четыре uint64, чтобы найти повторы через np.unique
+    keys = np.array(
+        [
+            (user.int >> 64, user.int & _UINT64_MASK, movie.int >> 64, movie.int & _UINT64_MASK)
+            for user, movie in zip(users[indices], movies[indices])
+        ],
+        dtype=np.uint64
+    )
+    _, first = np.unique(keys, axis=0, return_index=True)
+    stats.duplicate += len(indices) - len(first)
+    return [
+        {"user_id": users[index], "movie_id": movies[index], "rating": int(ratings[index]), "created_at": created[index]}
+        for index in indices[np.sort(first)]
+    ]
+
+
+async def load_movie_ids(dsn: str) -> set[UUID]:
+    """
+    Идентификаторы всех фильмов из movie.film_work
+    """
+    connection = await asyncpg.connect(dsn)
+    try:
+        movie_ids = set()
+        async with connection.transaction():
+            async for record in connection.cursor("SELECT id FROM movie.film_work", prefetch=10000):
+                movie_ids.add(record["id"])
+        return movie_ids
+    finally:
+        await connection.close()
+
+
+class RatingImporter:
+    """
+    Импорт исторических оценок в ratingsCollection.
+
+    Файл читается пачками по batch_size строк, каждая пачка проверяется целиком
+    и записывается неупорядоченными insert_many не более чем concurrency одновременно.
+    После пачки сохраняется контрольная точка: число обработанных строк, статистика,
+    затронутые фильмы и пользователи, так что прерванный импорт продолжается с нее.
+    Агрегаты рейтингов затронутых фильмов и счетчики оценок затронутых пользователей
+    пересчитываются один раз в конце. Затронутыми считаются все проверенные строки пачки,
+    а не только вставленные: пачка, записанная до сохранения контрольной точки,
+    при продолжении отклоняется уникальным индексом, но остается в пересчете.
+    """
+
+    def __init__(
+            self,
+            db,
+            movie_ids: set[UUID],
+            batch_size: int,
+            insert_chunk_size: int,
+            concurrency: int
+    ):
+        self.collection = db[ShardedCollections.RATINGS_COLLECTION.collection_name]
+        self.aggregates = RatingAggregates(db)
+        self.counters = Counters(db)
+        self.movie_ids = movie_ids
+        self.batch_size = batch_size
+        self.insert_chunk_size = insert_chunk_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(self, path: str, file_format: str, checkpoint_path: str) -> ImportStats:
+        checkpoint = self._load_checkpoint(checkpoint_path)
+        stats = ImportStats(**checkpoint.get("stats", {}))
+        touched = {UUID(movie_id) for movie_id in checkpoint.get("movie_ids", [])}
+        users = {UUID(user_id) for user_id in checkpoint.get("user_ids", [])}
+        if stats.read:
+            logger.info(f"Resuming import of {path} after {stats.read} rows")
+
+        rows = read_rows(path, file_format)
+        for _ in islice(rows, stats.read):
+            pass
+        while batch := list(islice(rows, self.batch_size)):
+            docs = validate_batch(batch, self.movie_ids, stats)
+            for doc in docs:
+                touched.add(doc["movie_id"])
+                users.add(doc["user_id"])
+            await self._insert(docs, stats)
+            stats.read += len(batch)
+            self._save_checkpoint(checkpoint_path, stats, touched, users)
+            logger.info(f"Imported {stats.inserted} of {stats.read} rows")
+
+        movie_ids = list(touched)
+        for start in range(0, len(movie_ids), AGGREGATES_CHUNK_SIZE):
+            await self.aggregates.rebuild(movie_ids[start:start + AGGREGATES_CHUNK_SIZE])
+        user_ids = list(users)
+        for start in range(0, len(user_ids), AGGREGATES_CHUNK_SIZE):
+            await self.counters.rebuild_user_ratings(user_ids[start:start + AGGREGATES_CHUNK_SIZE])
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return stats
+
+    async def _insert(self, docs: list[dict], stats: ImportStats) -> None:
+        chunks = [docs[start:start + self.insert_chunk_size] for start in range(0, len(docs), self.insert_chunk_size)]
+        inserted = await asyncio.gather(*(self._insert_chunk(chunk, stats) for chunk in chunks))
+        stats.inserted += sum(inserted)
+
+    async def _insert_chunk(self, docs: list[dict], stats: ImportStats) -> int:
+        async with self.semaphore:
+            try:
+                await self.collection.insert_many(docs, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                duplicates = sum(1 for error in errors if error["code"] == DUPLICATE_KEY_ERROR)
+                stats.duplicate += duplicates
+                stats.failed += len(errors) - duplicates
+                if len(errors) > duplicates:
+                    logger.error(f"Failed to insert {len(errors) - duplicates} ratings: {errors[0]['errmsg']}")
+                return len(docs) - len(errors)
+            return len(docs)
+
+    @staticmethod
+    def _load_checkpoint(path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _save_checkpoint(path: str, stats: ImportStats, touched: set[UUID], users: set[UUID]) -> None:
+        # Запись во временный файл и переименование: прерывание не оставит поврежденную точку
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump({
+                "stats": asdict(stats),
+                "movie_ids": [str(movie_id) for movie_id in touched],
+                "user_ids": [str(user_id) for user_id in users],
+            }, file)
+        os.replace(f"{path}.tmp", path)
+
+
+async def import_ratings(args: argparse.Namespace) -> ImportStats:
+    movie_ids = await load_movie_ids(args.movie_db_dsn)
+    logger.info(f"Loaded {len(movie_ids)} movie ids")
+    importer = RatingImporter(mongo_db, movie_ids, args.batch_size, args.insert_chunk_size, args.concurrency)
+    return await importer.run(args.path, args.format, args.checkpoint or f"{args.path}.checkpoint")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Импорт исторических оценок в ratingsCollection")
+    parser.add_argument("path", help="CSV или NDJSON с полями user_id, movie_id, rating, created_at")
+    parser.add_argument("--format", choices=("csv", "ndjson"), help="По умолчанию по расширению файла")
+    parser.add_argument("--checkpoint", help="Файл контрольной точки, по умолчанию <path>.checkpoint")
+    parser.add_argument("--movie-db-dsn", default=settings.rating_import.movie_db_dsn)
+    parser.add_argument("--batch-size", type=int, default=settings.rating_import.batch_size)
+    parser.add_argument("--insert-chunk-size", type=int, default=settings.rating_import.insert_chunk_size)
+    parser.add_argument("--concurrency", type=int, default=settings.rating_import.concurrency)
+    args = parser.parse_args()
+    if args.format is None:
+        args.format = "csv" if args.path.endswith(".csv") else "ndjson"
+
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(import_ratings(args))
+    print(json.dumps(asdict(stats)))
+
+
+if __name__ == "__main__":
+    # python -m services.rating_import ratings.csv
+    main()
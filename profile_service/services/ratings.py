@@ -1,41 +1,53 @@
+import asyncio
+import math
 from functools import lru_cache
 from fastapi import Depends, HTTPException, status
 from datetime import datetime
 from db.mongo import get_db
-from utils.enums import ShardedCollections
+from utils.enums import BatchItemStatus, ShardedCollections, TotalMode
+from schemas.batch import BatchItemResult, BatchResponse
 from schemas.ratings import (
     RatingCreate, RatingsList,
-    RatingUpdate, MovieAverageRating)
+    RatingUpdate, MovieAverageRating, RatingsBatch,
+    MovieRatingDistribution, MovieRatingDistributions, RatingTrendPoint)
 from async_fastapi_jwt_auth import AuthJWT
 from dependencies.auth import get_current_user
 import httpx
-from core.config import settings
 
-from db.postgres import get_http_client
+from db.http_client import get_http_client
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from uuid import UUID
 
+from services.counters import Counters
+from services.movies import MovieClient
+from services.rating_aggregates import RatingAggregates
+from services.rating_buffer import rating_buffer
+from utils.bulk import run_bulk
+from utils.pagination import NEWEST_FIRST, count_total, fetch_page
+from utils.rating_stats import PERCENTILES, RATING_VALUES, histogram_matrix, histogram_stats, monthly_trend
+
+# Сортировки списка оценок фильма, _id - уникальный ключ для курсора
+MOVIE_RATINGS_SORTS = {
+    "created_at": NEWEST_FIRST,
+    "rating": [("rating", -1), ("_id", -1)],
+}
+
 
 class RatingService:
     def __init__(self, db, http_client: httpx.AsyncClient):
         self.collection = db[ShardedCollections.RATINGS_COLLECTION.collection_name]
         self.http_client = http_client
+        self.movies = MovieClient(http_client)
+        self.aggregates = RatingAggregates(db)
+        self.counters = Counters(db)
 
     async def check_movie_exists(self, movie_id: UUID) -> bool:
         """
         Проверка существования фильма
         """
-        try:
-            response = await self.http_client.get(
-                f"{settings.movie_service.url}/get_film",
-                params={"film_id": movie_id}
-            )
-            return response.status_code == status.HTTP_200_OK
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Сервис фильмов недоступен"
-            )
+        return await self.movies.movie_exists(movie_id)
 
     async def create_rating(self,
                             rating: RatingCreate,
@@ -52,61 +64,68 @@ class RatingService:
                 detail="Фильм не найден"
             )
 
-        # Проверяем, не существует ли уже рейтинг от этого пользователя
-        existing_rating = await self.collection.find_one({
-            "user_id": user_id,
-            "movie_id": rating.movie_id
-        })
-
-        if existing_rating:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Вы уже оценили этот фильм"
-            )
-
         rating_dict = rating.dict()
         rating_dict.update({
             "user_id": user_id,
             "created_at": datetime.utcnow()
         })
 
-        result = await self.collection.insert_one(rating_dict)
-        created_rating = await self.collection.find_one({"_id": result.inserted_id})
+        # В режиме отложенной записи повторная оценка отбрасывается при записи пакета
+        if rating_buffer.submit(rating_dict):
+            return rating_dict
 
-        if not created_rating:
+        # Повторную оценку отклоняет уникальный индекс (movie_id, user_id),
+        # insert_one дописывает _id в rating_dict, перечитывать документ не нужно
+        try:
+            await self.collection.insert_one(rating_dict)
+        except DuplicateKeyError:
             raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Не удалось создать рейтинг"
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Вы уже оценили этот фильм"
             )
 
-        return created_rating
+        await self.aggregates.apply(rating.movie_id, added=rating.rating, created_at=rating_dict["created_at"])
+        await self.counters.increment(Counters.user_key(user_id), {"ratings": 1})
+
+        return rating_dict
 
     async def get_movie_ratings(
             self,
             movie_id: UUID,
             skip: int = 0,
-            limit: int = 20
+            limit: int = 20,
+            cursor: str | None = None,
+            sort_by: str = "created_at",
+            total_mode: TotalMode = TotalMode.EXACT
     ) -> RatingsList:
         """
         Получение всех рейтингов фильма
         """
         query = {"movie_id": movie_id}
-        total = await self.collection.count_documents(query)
 
-        cursor = self.collection.find(query).skip(skip).limit(limit)
+        async def estimate() -> int:
+            aggregate = await self.aggregates.get(movie_id)
+            return aggregate["count"] if aggregate else 0
+
+        (docs, next_cursor), total = await asyncio.gather(
+            fetch_page(self.collection, query, MOVIE_RATINGS_SORTS[sort_by], limit, skip, cursor),
+            count_total(self.collection, query, total_mode, not (skip or cursor), estimate)
+        )
         ratings = []
 
-        async for doc in cursor:
+        for doc in docs:
             doc["id"] = str(doc["_id"])
             ratings.append(doc)
 
-        return RatingsList(ratings=ratings, total=total)
+        return RatingsList(ratings=ratings, total=total, next_cursor=next_cursor)
 
     async def get_user_ratings(
             self,
             Authorize: AuthJWT,
             skip: int = 0,
-            limit: int = 20
+            limit: int = 20,
+            cursor: str | None = None,
+            total_mode: TotalMode = TotalMode.EXACT
     ) -> RatingsList:
         """
         Получение всех рейтингов пользователя
@@ -114,15 +133,20 @@ class RatingService:
         user_id = await get_current_user(Authorize)
         query = {"user_id": user_id}
 
-        total = await self.collection.count_documents(query)
-        cursor = self.collection.find(query).skip(skip).limit(limit)
+        async def estimate() -> int:
+            return (await self.counters.get(Counters.user_key(user_id))).get("ratings", 0)
+
+        (docs, next_cursor), total = await asyncio.gather(
+            fetch_page(self.collection, query, NEWEST_FIRST, limit, skip, cursor),
+            count_total(self.collection, query, total_mode, not (skip or cursor), estimate)
+        )
         ratings = []
 
-        async for doc in cursor:
+        for doc in docs:
             doc["id"] = str(doc["_id"])
             ratings.append(doc)
 
-        return RatingsList(ratings=ratings, total=total)
+        return RatingsList(ratings=ratings, total=total, next_cursor=next_cursor)
 
     async def update_rating(
             self,
@@ -135,7 +159,8 @@ class RatingService:
         """
         user_id = await get_current_user(Authorize)
 
-        result = await self.collection.update_one(
+        # Возвращаем документ до изменения, чтобы скорректировать агрегаты
+        previous = await self.collection.find_one_and_update(
             {
                 "user_id": user_id,
                 "movie_id": movie_id
@@ -143,15 +168,23 @@ class RatingService:
             {"$set": {
                 "rating": rating_update.rating,
                 "updated_at": datetime.utcnow()
-            }}
+            }},
+            return_document=ReturnDocument.BEFORE
         )
 
-        if result.modified_count == 0:
+        if not previous:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рейтинг не найден"
             )
 
+        await self.aggregates.apply(
+            movie_id,
+            added=rating_update.rating,
+            removed=previous["rating"],
+            created_at=previous.get("created_at")
+        )
+
         return True
 
     async def delete_rating(
@@ -164,49 +197,175 @@ class RatingService:
         """
         user_id = await get_current_user(Authorize)
 
-        result = await self.collection.delete_one({
+        deleted = await self.collection.find_one_and_delete({
             "user_id": user_id,
             "movie_id": movie_id
         })
 
-        if result.deleted_count == 0:
+        if not deleted:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рейтинг не найден"
             )
 
+        await self.aggregates.apply(movie_id, removed=deleted["rating"], created_at=deleted.get("created_at"))
+        await self.counters.increment(Counters.user_key(user_id), {"ratings": -1})
+
         return True
 
+    async def batch_ratings(self, batch: RatingsBatch, Authorize: AuthJWT) -> BatchResponse:
+        """
+        Пакетное создание, изменение и удаление оценок пользователя.
+        Фильмы проверяются одним запросом к сервису фильмов, изменения
+        выполняются одним неупорядоченным bulk_write.
+        """
+        user_id = await get_current_user(Authorize)
+
+        results: list[BatchItemResult | None] = [None] * len(batch.items)
+        positions: dict[UUID, int] = {}
+        for index, item in enumerate(batch.items):
+            if item.movie_id in positions:
+                results[index] = BatchItemResult(movie_id=item.movie_id, status=BatchItemStatus.DUPLICATE)
+            else:
+                positions[item.movie_id] = index
+
+        rated_ids = [movie_id for movie_id, index in positions.items() if batch.items[index].rating is not None]
+        existing_movies, previous = await asyncio.gather(
+            self.movies.existing_movie_ids(rated_ids),
+            self._get_user_ratings_by_movie(user_id, list(positions))
+        )
+
+        now = datetime.utcnow()
+        operations = []
+        planned = []
+        for movie_id, index in positions.items():
+            rating = batch.items[index].rating
+            key = {"user_id": user_id, "movie_id": movie_id}
+            if rating is None:
+                if movie_id not in previous:
+                    results[index] = BatchItemResult(movie_id=movie_id, status=BatchItemStatus.NOT_FOUND)
+                    continue
+                operations.append(DeleteOne(key))
+            else:
+                if movie_id not in existing_movies:
+                    results[index] = BatchItemResult(movie_id=movie_id, status=BatchItemStatus.MOVIE_NOT_FOUND)
+                    continue
+                # Фильтр содержит весь ключ шардирования, поэтому upsert допустим
+                operations.append(UpdateOne(
+                    key,
+                    {"$set": {"rating": rating, "updated_at": now}, "$setOnInsert": {"created_at": now}},
+                    upsert=True
+                ))
+            planned.append((index, movie_id, rating))
+
+        upserted, errors = await run_bulk(self.collection, operations)
+
+        changes = []
+        created = deleted = 0
+        for position, (index, movie_id, rating) in enumerate(planned):
+            if position in errors:
+                results[index] = BatchItemResult(
+                    movie_id=movie_id, status=BatchItemStatus.ERROR, detail=errors[position]
+                )
+                continue
+            if rating is None:
+                item_status = BatchItemStatus.DELETED
+                deleted += 1
+            elif position in upserted:
+                item_status = BatchItemStatus.CREATED
+                created += 1
+            else:
+                item_status = BatchItemStatus.UPDATED
+            if position in upserted:
+                changes.append((movie_id, rating, None, now))
+            else:
+                previous_rating, created_at = previous.get(movie_id, (None, now))
+                changes.append((movie_id, rating, previous_rating, created_at))
+            results[index] = BatchItemResult(movie_id=movie_id, status=item_status)
+
+        await self.aggregates.apply_many(changes)
+        await self.counters.increment(Counters.user_key(user_id), {"ratings": created - deleted})
+
+        return BatchResponse(results=results)
+
+    async def _get_user_ratings_by_movie(
+            self,
+            user_id: UUID,
+            movie_ids: list[UUID]
+    ) -> dict[UUID, tuple[int, datetime | None]]:
+        cursor = self.collection.find(
+            {"user_id": user_id, "movie_id": {"$in": movie_ids}},
+            {"movie_id": 1, "rating": 1, "created_at": 1}
+        )
+        return {doc["movie_id"]: (doc["rating"], doc.get("created_at")) async for doc in cursor}
+
     async def get_movie_average_rating(self, movie_id: UUID) -> MovieAverageRating:
         """
         Получение среднего рейтинга фильма
         """
-        pipeline = [
-            {"$match": {"movie_id": movie_id}},
-            {
-                "$group": {
-                    "_id": "$movie_id",
-                    "average_rating": {"$avg": "$rating"},
-                    "total_ratings": {"$sum": 1}
-                }
-            }
-        ]
-
-        result = await self.collection.aggregate(pipeline).to_list(length=1)
-
-        if not result:
-            return MovieAverageRating(
-                movie_id=movie_id,
-                average_rating=0.0,
-                total_ratings=0
-            )
+        aggregate = await self.aggregates.get(movie_id)
 
         return MovieAverageRating(
             movie_id=movie_id,
-            average_rating=round(result[0]["average_rating"], 2),
-            total_ratings=result[0]["total_ratings"]
+            average_rating=self.aggregates.average(aggregate),
+            total_ratings=aggregate["count"] if aggregate else 0
         )
 
+    async def get_movie_rating_distribution(self, movie_id: UUID, months: int = 12) -> MovieRatingDistribution:
+        """
+        Распределение оценок фильма по агрегатам: гистограмма, медиана,
+        стандартное отклонение, процентили и помесячная динамика
+        """
+        aggregate = await self.aggregates.get(movie_id)
+        return self._build_distributions([movie_id], [aggregate], months)[0]
+
+    async def get_movies_rating_distributions(
+            self,
+            movie_ids: list[UUID],
+            months: int = 0
+    ) -> MovieRatingDistributions:
+        """
+        Распределения оценок нескольких фильмов, статистики считаются сразу по всем фильмам
+        """
+        movie_ids = list(dict.fromkeys(movie_ids))
+        aggregates = await self.aggregates.get_many(movie_ids)
+        return MovieRatingDistributions(distributions=self._build_distributions(
+            movie_ids, [aggregates.get(movie_id) for movie_id in movie_ids], months
+        ))
+
+    @staticmethod
+    def _build_distributions(
+            movie_ids: list[UUID],
+            aggregates: list[dict | None],
+            months: int
+    ) -> list[MovieRatingDistribution]:
+        matrix = histogram_matrix(aggregates)
+        stats = histogram_stats(matrix)
+
+        def value(name: str, row: int) -> float | None:
+            result = float(stats[name][row])
+            return None if math.isnan(result) else round(result, 2)
+
+        distributions = []
+        for row, (movie_id, aggregate) in enumerate(zip(movie_ids, aggregates)):
+            trend = monthly_trend(aggregate, months) if months else []
+            distributions.append(MovieRatingDistribution(
+                movie_id=movie_id,
+                total_ratings=int(stats["count"][row]),
+                average_rating=value("mean", row),
+                median=value("median", row),
+                std_dev=value("std", row),
+                percentiles={
+                    f"p{percentile}": value(f"percentile_{percentile}", row) for percentile in PERCENTILES
+                },
+                histogram=dict(zip(RATING_VALUES.tolist(), matrix[row].tolist())),
+                trend=[
+                    RatingTrendPoint(month=month, total_ratings=count, average_rating=average)
+                    for month, count, average in trend
+                ]
+            ))
+        return distributions
+
 
 @lru_cache()
 def get_rating_service(db: AsyncIOMotorClient = Depends(get_db),
@@ -0,0 +1,448 @@
+import asyncio
+import heapq
+import json
+import logging
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from uuid import UUID
+
+import httpx
+
+from core.config import settings
+from schemas.reviews import ReviewSearchHit, ReviewSearchResponse
+from utils.enums import ShardedCollections
+
+logger = logging.getLogger(__name__)
+
+# Поля поиска и их вес при ранжировании
+SEARCH_FIELDS = {"title": 2.0, "text": 1.0}
+# Длина фрагмента текста с подсветкой и их количество
+FRAGMENT_SIZE = 150
+FRAGMENTS_COUNT = 3
+
+INDEX_BODY = {
+    "mappings": {
+        "properties": {
+            "movie_id": {"type": "keyword"},
+            "user_id": {"type": "keyword"},
+            "title": {"type": "text"},
+            "text": {"type": "text"},
+            "created_at": {"type": "date"},
+        }
+    }
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Изменение индекса: ("index", id, документ) или ("delete", id, None)
+IndexAction = tuple[str, str, dict | None]
+
+
+def review_document(review: dict) -> dict:
+    """
+    Документ поискового индекса по документу рецензии из MongoDB
+    """
+    created_at = review.get("created_at")
+    return {
+        "movie_id": str(review["movie_id"]),
+        "user_id": str(review["user_id"]),
+        "title": review.get("title", ""),
+        "text": review.get("text", ""),
+        "created_at": created_at.isoformat() if created_at else None,
+    }
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class ReviewSearchBackend(ABC):
+    """
+    Поисковый индекс рецензий
+    """
+
+    @abstractmethod
+    async def ensure_index(self) -> bool:
+        """
+        Создание индекса, если его нет. Возвращает True, если индекс создан пустым
+        """
+
+    @abstractmethod
+    async def bulk(self, actions: list[IndexAction]) -> None:
+        ...
+
+    @abstractmethod
+    async def search(
+            self,
+            query: str,
+            movie_id: UUID | None,
+            user_id: UUID | None,
+            limit: int,
+            offset: int
+    ) -> ReviewSearchResponse:
+        ...
+
+
+class ElasticsearchReviewBackend(ReviewSearchBackend):
+    """
+    Индекс рецензий в Elasticsearch, запросы через общий HTTP клиент
+    """
+
+    def __init__(self, http_client: httpx.AsyncClient):
+        self.http_client = http_client
+        self.url = f"{settings.review_search.url}/{settings.review_search.index}"
+
+    async def ensure_index(self) -> bool:
+        response = await self.http_client.put(self.url, json=INDEX_BODY)
+        if response.status_code == 400 and "resource_already_exists_exception" in response.text:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def bulk(self, actions: list[IndexAction]) -> None:
+        lines = []
+        for action, review_id, document in actions:
+            lines.append(json.dumps({action: {"_id": review_id}}))
+            if document is not None:
+                lines.append(json.dumps(document))
+        response = await self.http_client.post(
+            f"{self.url}/_bulk",
+            content="\n".join(lines) + "\n",
+            headers={"Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+        result = response.json()
+        if not result.get("errors"):
+            return
+        failed = []
+        for item in result["items"]:
+            action, outcome = next(iter(item.items()))
+            # Удаление отсутствующего документа ошибкой не считается
+            if outcome.get("status", 200) >= 300 and not (action == "delete" and outcome["status"] == 404):
+                failed.append(outcome)
+        if failed:
+            logger.error(f"Failed to index {len(failed)} reviews, first error: {failed[0].get('error')}")
+
+    async def search(
+            self,
+            query: str,
+            movie_id: UUID | None,
+            user_id: UUID | None,
+            limit: int,
+            offset: int
+    ) -> ReviewSearchResponse:
+        filters = []
+        if movie_id:
+            filters.append({"term": {"movie_id": str(movie_id)}})
+        if user_id:
+            filters.append({"term": {"user_id": str(user_id)}})
+        body = {
+            "query": {
+                "bool": {
+                    "must": {
+                        "multi_match": {
+                            "query": query,
+                            "fields": [f"{field}^{weight:g}" for field, weight in SEARCH_FIELDS.items()]
+                        }
+                    },
+                    "filter": filters,
+                }
+            },
+            "highlight": {
+                "pre_tags": ["<em>"],
+                "post_tags": ["</em>"],
+                "fields": {
+                    "title": {"number_of_fragments": 0},
+                    "text": {"fragment_size": FRAGMENT_SIZE, "number_of_fragments": FRAGMENTS_COUNT},
+                },
+            },
+            "from": offset,
+            "size": limit,
+        }
+        response = await self.http_client.post(f"{self.url}/_search", json=body)
+        response.raise_for_status()
+        hits = response.json()["hits"]
+        return ReviewSearchResponse(
+            total=hits["total"]["value"],
+            results=[
+                ReviewSearchHit(
+                    id=hit["_id"],
+                    score=hit["_score"],
+                    highlights=hit.get("highlight", {}),
+                    **hit["_source"]
+                )
+                for hit in hits["hits"]
+            ]
+        )
+
+
+class InMemoryReviewBackend(ReviewSearchBackend):
+    """
+    Инвертированный индекс в памяти процесса с ранжированием BM25.
+    Заполняется при старте из MongoDB, предназначен для тестов и разработки.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.documents: dict[str, dict] = {}
+        # поле -> термин -> {id рецензии: частота термина}
+        self.postings: dict[str, dict[str, dict[str, int]]] = {field: defaultdict(dict) for field in SEARCH_FIELDS}
+        self.lengths: dict[str, dict[str, int]] = {field: {} for field in SEARCH_FIELDS}
+        self.total_lengths: dict[str, int] = {field: 0 for field in SEARCH_FIELDS}
+
+    async def ensure_index(self) -> bool:
+        return not self.documents
+
+    async def bulk(self, actions: list[IndexAction]) -> None:
+        for action, review_id, document in actions:
+            self._remove(review_id)
+            if action == "index":
+                self._add(review_id, document)
+
+    def _add(self, review_id: str, document: dict) -> None:
+        self.documents[review_id] = document
+        for field in SEARCH_FIELDS:
+            tokens = _tokenize(document.get(field) or "")
+            for term, frequency in Counter(tokens).items():
+                self.postings[field][term][review_id] = frequency
+            self.lengths[field][review_id] = len(tokens)
+            self.total_lengths[field] += len(tokens)
+
+    def _remove(self, review_id: str) -> None:
+        document = self.documents.pop(review_id, None)
+        if document is None:
+            return
+        for field in SEARCH_FIELDS:
+            for term in set(_tokenize(document.get(field) or "")):
+                postings = self.postings[field][term]
+                postings.pop(review_id, None)
+                if not postings:
+                    del self.postings[field][term]
+            self.total_lengths[field] -= self.lengths[field].pop(review_id, 0)
+
+    async def search(
+            self,
+            query: str,
+            movie_id: UUID | None,
+            user_id: UUID | None,
+            limit: int,
+            offset: int
+    ) -> ReviewSearchResponse:
+        terms = set(_tokenize(query))
+        count = len(self.documents)
+        scores: dict[str, float] = defaultdict(float)
+        for field, weight in SEARCH_FIELDS.items():
+            average_length = self.total_lengths[field] / count if count else 0
+            for term in terms:
+                postings = self.postings[field].get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for review_id, frequency in postings.items():
+                    norm = 1 - self.B + self.B * self.lengths[field][review_id] / (average_length or 1)
+                    scores[review_id] += weight * idf * frequency * (self.K1 + 1) / (frequency + self.K1 * norm)
+
+        matched = [
+            review_id for review_id in scores
+            if (movie_id is None or self.documents[review_id]["movie_id"] == str(movie_id))
+            and (user_id is None or self.documents[review_id]["user_id"] == str(user_id))
+        ]
+        top = heapq.nlargest(offset + limit, matched, key=scores.get)[offset:]
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", re.IGNORECASE) if terms else None
+        return ReviewSearchResponse(
+            total=len(matched),
+            results=[
+                ReviewSearchHit(
+                    id=review_id,
+                    score=round(scores[review_id], 4),
+                    highlights=self._highlights(self.documents[review_id], pattern),
+                    **self.documents[review_id]
+                )
+                for review_id in top
+            ]
+        )
+
+    @staticmethod
+    def _highlights(document: dict, pattern: re.Pattern | None) -> dict[str, list[str]]:
+        highlights = {}
+        if pattern is None:
+            return highlights
+
+        def mark(text: str) -> str:
+            return pattern.sub(r"<em>\1</em>", text)
+
+        title = document.get("title") or ""
+        if pattern.search(title):
+            highlights["title"] = [mark(title)]
+
+        text = document.get("text") or ""
+        fragments = []
+        position = 0
+        for match in pattern.finditer(text):
+            if match.start() < position:
+                continue
+            start = max(0, match.start() - FRAGMENT_SIZE // 2)
+            end = min(len(text), match.end() + FRAGMENT_SIZE // 2)
+            fragments.append(mark(text[start:end]))
+            position = end
+            if len(fragments) == FRAGMENTS_COUNT:
+                break
+        if fragments:
+            highlights["text"] = fragments
+        return highlights
+
+
+class ReviewIndexer:
+    """
+    Инкрементальное обновление поискового индекса рецензий.
+
+    Изменения рецензий складываются в очередь и отправляются в индекс пакетами
+    по batch_size или раз в flush_interval, несколько изменений одной рецензии
+    в пакете схлопываются в последнее. Если индекс создан пустым, он заполняется
+    из MongoDB в фоне. Полная загрузка пропускает рецензии, изменения которых
+    поставлены в очередь после ее начала, и пакеты загрузки и очереди отправляются
+    в индекс по одному, поэтому снимок курсора не перезаписывает более новое изменение.
+    """
+
+    # Максимальный размер очереди: при недоступном индексе изменения сверх него теряются
+    MAX_QUEUE_SIZE = 100000
+
+    def __init__(self):
+        self.backend: ReviewSearchBackend | None = None
+        self.queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._reindex_task: asyncio.Task | None = None
+        self._stopping = False
+        # Рецензии, изменения которых поставлены в очередь во время полной загрузки
+        self._changed: set[str] | None = None
+        self._bulk_lock = asyncio.Lock()
+
+    async def start(self, db, backend: ReviewSearchBackend) -> None:
+        self.reviews = db[ShardedCollections.REVIEWS_COLLECTION.collection_name]
+        self.backend = backend
+        self.queue = asyncio.Queue(maxsize=self.MAX_QUEUE_SIZE)
+        self._stopping = False
+        try:
+            if await backend.ensure_index():
+                self.start_reindex()
+        except Exception as e:
+            logger.error(f"Failed to prepare reviews search index: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._reindex_task:
+            self._reindex_task.cancel()
+            self._reindex_task = None
+        if self._task is None:
+            return
+        self._stopping = True
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+
+    def index(self, review: dict) -> None:
+        self._submit(("index", str(review["_id"]), review_document(review)))
+
+    def delete(self, review_id) -> None:
+        self._submit(("delete", str(review_id), None))
+
+    def start_reindex(self) -> None:
+        """
+        Полная загрузка рецензий из MongoDB в индекс в фоне
+        """
+        if self._reindex_task is None or self._reindex_task.done():
+            self._reindex_task = asyncio.create_task(self.reindex())
+
+    async def reindex(self) -> None:
+        self._changed = set()
+        batch = []
+        total = 0
+        try:
+            async for review in self.reviews.find({}):
+                batch.append(("index", str(review["_id"]), review_document(review)))
+                if len(batch) >= settings.review_search.batch_size:
+                    total += await self._bulk_snapshot(batch)
+                    batch = []
+            if batch:
+                total += await self._bulk_snapshot(batch)
+        except Exception as e:
+            logger.error(f"Reviews reindex failed after {total} reviews: {e}")
+            return
+        finally:
+            self._changed = None
+        logger.info(f"Reindexed {total} reviews")
+
+    async def _bulk_snapshot(self, batch: list[IndexAction]) -> int:
+        async with self._bulk_lock:
+            # Состояние измененных рецензий запишет очередь, снимок курсора мог устареть
+            actions = [action for action in batch if action[1] not in self._changed]
+            if actions:
+                await self.backend.bulk(actions)
+        return len(actions)
+
+    def _submit(self, action: IndexAction) -> None:
+        if self.queue is None or self._stopping:
+            return
+        try:
+            self.queue.put_nowait(action)
+        except asyncio.QueueFull:
+            logger.error(f"Reviews index queue is full, dropped {action[0]} of review {action[1]}")
+            return
+        if self._changed is not None:
+            self._changed.add(action[1])
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            action = await self.queue.get()
+            if action is None:
+                return
+            batch = {action[1]: action}
+            deadline = loop.time() + settings.review_search.flush_interval
+            finished = False
+            while len(batch) < settings.review_search.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    action = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if action is None:
+                    finished = True
+                    break
+                # Последнее изменение рецензии заменяет предыдущие
+                batch.pop(action[1], None)
+                batch[action[1]] = action
+
+            await self._flush(list(batch.values()))
+            if finished:
+                return
+
+    async def _flush(self, actions: list[IndexAction]) -> None:
+        delay = 1
+        while True:
+            try:
+                async with self._bulk_lock:
+                    await self.backend.bulk(actions)
+                return
+            except Exception as e:
+                if self._stopping:
+                    logger.error(f"Failed to index {len(actions)} review changes on shutdown: {e}")
+                    return
+                logger.error(f"Failed to index {len(actions)} review changes, retrying: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def create_backend(http_client: httpx.AsyncClient) -> ReviewSearchBackend:
+    if settings.review_search.backend == "memory":
+        return InMemoryReviewBackend()
+    return ElasticsearchReviewBackend(http_client)
+
+
+review_indexer = ReviewIndexer()
@@ -1,18 +1,25 @@
+import asyncio
+import logging
 from functools import lru_cache
 from fastapi import Depends, HTTPException, status
 from datetime import datetime
 import httpx
+from pymongo import ReturnDocument
 
 from db.mongo import get_db
-from utils.enums import ShardedCollections
+from utils.enums import ShardedCollections, TotalMode
 from schemas.reviews import (
     ReviewCreate, ReviewsList,
-    ReviewUpdate, ReviewPartialUpdate, ReviewResponse
+    ReviewUpdate, ReviewPartialUpdate, ReviewResponse, ReviewSearchResponse
 )
 from async_fastapi_jwt_auth import AuthJWT
 from dependencies.auth import get_current_user
-from core.config import settings
-from db.postgres import get_http_client
+from db.http_client import get_http_client
+from services.counters import Counters
+from services.latest_reviews import LATEST_REVIEWS_SIZE, LatestReviews
+from services.movies import MovieClient
+from services.review_search import review_indexer
+from utils.pagination import NEWEST_FIRST, count_total, encode_cursor, fetch_page
 from uuid import UUID
 
 
@@ -20,22 +27,15 @@ class ReviewService:
     def __init__(self, db, http_client: httpx.AsyncClient):
         self.collection = db[ShardedCollections.REVIEWS_COLLECTION.collection_name]
         self.http_client = http_client
+        self.movies = MovieClient(http_client)
+        self.counters = Counters(db)
+        self.latest_reviews = LatestReviews(db)
 
     async def check_movie_exists(self, movie_id: UUID) -> bool:
         """
         Проверка существования фильма
         """
-        try:
-            response = await self.http_client.get(
-                f"{settings.movie_service.url}/get_film",
-                params={"film_id": movie_id}
-            )
-            return response.status_code == status.HTTP_200_OK
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="Сервис фильмов недоступен"
-            )
+        return await self.movies.movie_exists(movie_id)
 
     async def create_review(self, review: ReviewCreate,
                             Authorize: AuthJWT) -> ReviewResponse:
@@ -70,19 +70,16 @@ class ReviewService:
             "updated_at": datetime.utcnow()
         })
 
-        result = await self.collection.insert_one(review_dict)
-        created_review = await self.collection.find_one({"_id": result.inserted_id})
+        # insert_one дописывает _id в review_dict, перечитывать документ не нужно
+        await self.collection.insert_one(review_dict)
+        review_indexer.index(review_dict)
 
-        if not created_review:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Не удалось создать рецензию"
-            )
+        await self.counters.increment(Counters.user_key(user_id), {"reviews": 1})
+        await self.latest_reviews.add(review_dict)
 
-        created_review["id"] = str(created_review["_id"])
-        del created_review["_id"]
+        review_dict["id"] = str(review_dict.pop("_id"))
 
-        return created_review
+        return review_dict
 
     async def get_movie_reviews(
             self,
@@ -90,21 +87,38 @@ class ReviewService:
             skip: int = 0,
             limit: int = 20,
             sort_by: str = "created_at",
-            sort_order: int = -1
+            sort_order: int = -1,
+            cursor: str | None = None,
+            total_mode: TotalMode = TotalMode.EXACT
     ) -> ReviewsList:
         """
         Получение всех рецензий фильма с сортировкой
         """
         query = {"movie_id": movie_id}
-        total = await self.collection.count_documents(query)
 
-        cursor = self.collection.find(query) \
-            .sort(sort_by, sort_order) \
-            .skip(skip) \
-            .limit(limit)
+        async def estimate() -> int:
+            return (await self.counters.get(Counters.movie_key(movie_id))).get("reviews", 0)
+
+        # _id делает ключ сортировки уникальным, что нужно для курсора
+        sort = [(sort_by, sort_order), ("_id", sort_order)]
+        first_page = not (skip or cursor)
+        if first_page and sort == NEWEST_FIRST and limit <= LATEST_REVIEWS_SIZE:
+            # Первая страница с сортировкой по умолчанию хранится в документе счетчиков фильма
+            docs, reviews_count = await self.latest_reviews.get(movie_id, limit)
+            next_cursor = encode_cursor(sort, docs[-1]) if docs and reviews_count > limit else None
+
+            async def cached_count() -> int:
+                return reviews_count
+
+            total = await count_total(self.collection, query, total_mode, first_page, cached_count)
+        else:
+            (docs, next_cursor), total = await asyncio.gather(
+                fetch_page(self.collection, query, sort, limit, skip, cursor),
+                count_total(self.collection, query, total_mode, first_page, estimate)
+            )
 
         reviews = []
-        async for doc in cursor:
+        for doc in docs:
             try:
                 review_data = {
                     "id": str(doc["_id"]),
@@ -120,13 +134,15 @@ class ReviewService:
                 logging.info(f"Error processing review: {e}")
                 continue
 
-        return ReviewsList(reviews=reviews, total=total)
+        return ReviewsList(reviews=reviews, total=total, next_cursor=next_cursor)
 
     async def get_user_reviews(
             self,
             Authorize: AuthJWT,
             skip: int = 0,
-            limit: int = 20
+            limit: int = 20,
+            cursor: str | None = None,
+            total_mode: TotalMode = TotalMode.EXACT
     ) -> ReviewsList:
         """
         Получение всех рецензий пользователя
@@ -134,16 +150,21 @@ class ReviewService:
         user_id = await get_current_user(Authorize)
         query = {"user_id": user_id}
 
-        total = await self.collection.count_documents(query)
-        cursor = self.collection.find(query).skip(skip).limit(limit)
+        async def estimate() -> int:
+            return (await self.counters.get(Counters.user_key(user_id))).get("reviews", 0)
+
+        (docs, next_cursor), total = await asyncio.gather(
+            fetch_page(self.collection, query, NEWEST_FIRST, limit, skip, cursor),
+            count_total(self.collection, query, total_mode, not (skip or cursor), estimate)
+        )
         reviews = []
 
-        async for doc in cursor:
+        for doc in docs:
             doc["id"] = str(doc["_id"])
             del doc["_id"]
             reviews.append(doc)
 
-        return ReviewsList(reviews=reviews, total=total)
+        return ReviewsList(reviews=reviews, total=total, next_cursor=next_cursor)
 
     async def update_review(
             self,
@@ -156,7 +177,7 @@ class ReviewService:
         """
         user_id = await get_current_user(Authorize)
 
-        result = await self.collection.update_one(
+        review = await self.collection.find_one_and_update(
             {
                 "user_id": user_id,
                 "movie_id": movie_id
@@ -166,15 +187,19 @@ class ReviewService:
                     **review_update.dict(),
                     "updated_at": datetime.utcnow()
                 }
-            }
+            },
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count == 0:
+        if review is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рецензия не найдена"
             )
 
+        review_indexer.index(review)
+        await self.latest_reviews.update(review)
+
         return True
 
     async def patch_review(
@@ -194,20 +219,24 @@ class ReviewService:
 
         update_data["updated_at"] = datetime.utcnow()
 
-        result = await self.collection.update_one(
+        review = await self.collection.find_one_and_update(
             {
                 "user_id": user_id,
                 "movie_id": movie_id
             },
-            {"$set": update_data}
+            {"$set": update_data},
+            return_document=ReturnDocument.AFTER
         )
 
-        if result.modified_count == 0:
+        if review is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рецензия не найдена"
             )
 
+        review_indexer.index(review)
+        await self.latest_reviews.update(review)
+
         return True
 
     async def delete_review(
@@ -220,19 +249,47 @@ class ReviewService:
         """
         user_id = await get_current_user(Authorize)
 
-        result = await self.collection.delete_one({
-            "user_id": user_id,
-            "movie_id": movie_id
-        })
+        review = await self.collection.find_one_and_delete(
+            {
+                "user_id": user_id,
+                "movie_id": movie_id
+            },
+            projection={"_id": 1}
+        )
 
-        if result.deleted_count == 0:
+        if review is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Рецензия не найдена"
             )
 
+        review_indexer.delete(review["_id"])
+
+        await self.counters.increment(Counters.user_key(user_id), {"reviews": -1})
+        await self.latest_reviews.remove(movie_id, review["_id"])
+
         return True
 
+    async def search_reviews(
+            self,
+            query: str,
+            movie_id: UUID | None = None,
+            user_id: UUID | None = None,
+            limit: int = 20,
+            offset: int = 0
+    ) -> ReviewSearchResponse:
+        """
+        Полнотекстовый поиск по заголовкам и текстам рецензий
+        """
+        try:
+            return await review_indexer.backend.search(query, movie_id, user_id, limit, offset)
+        except httpx.HTTPError as e:
+            logging.error(f"Reviews search failed: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Поиск по рецензиям недоступен"
+            )
+
 
 @lru_cache()
 def get_review_service(
@@ -0,0 +1,21 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo.errors import BulkWriteError
+
+
+async def run_bulk(collection: AsyncIOMotorCollection, operations: list) -> tuple[set[int], dict[int, str]]:
+    """
+    Выполнение операций одним неупорядоченным bulk_write.
+    Ошибка одной операции не отменяет остальные.
+
+    Returns:
+        Индексы операций, вставивших документ через upsert, и ошибки по индексам операций.
+    """
+    if not operations:
+        return set(), {}
+    try:
+        result = await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        upserted = {item["index"] for item in e.details.get("upserted", [])}
+        errors = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+        return upserted, errors
+    return set(result.upserted_ids), {}
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+_MISSING = object()
+
+
+class _LoadCancelled(Exception):
+    """
+    Загрузка прервана отменой запроса, который ее начал
+    """
+
+
+class TTLCache:
+    """
+    LRU-кэш ограниченного размера с временем жизни записей.
+
+    Время жизни задается для каждой записи отдельно, поэтому, например,
+    отрицательные результаты можно хранить меньше положительных.
+    Одновременные промахи по одному ключу объединяются в один вызов загрузчика.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Получение значения, если оно есть в кэше и не истекло
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        """
+        Сохранение значения на ttl секунд с вытеснением давно не используемых записей
+        """
+        if ttl <= 0:
+            return
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(
+            self,
+            key: Hashable,
+            loader: Callable[[], Awaitable[Any]],
+            ttl: float | Callable[[Any], float]
+    ) -> Any:
+        """
+        Получение значения из кэша или через загрузчик.
+
+        Если загрузка по ключу уже выполняется, ожидаем ее результат
+        вместо повторного запроса. Исключения загрузчика не кэшируются.
+        """
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                return await self._load(key, loader, ttl)
+            try:
+                return await asyncio.shield(in_flight)
+            except _LoadCancelled:
+                # Отмена чужого запроса не должна отменять этот: загрузку повторяет один из ожидающих
+                continue
+
+    async def _load(
+            self,
+            key: Hashable,
+            loader: Callable[[], Awaitable[Any]],
+            ttl: float | Callable[[Any], float]
+    ) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(_LoadCancelled())
+            future.exception()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Помечаем исключение как полученное, даже если ожидающих не было
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+            future.set_result(value)
+            return value
+        finally:
+            self._in_flight.pop(key, None)
@@ -1,19 +1,67 @@
 from enum import Enum
 
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+# Ключ ленты "сначала новые" с _id для курсорной пагинации
+_NEWEST = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
 
 class ShardedCollections(Enum):
+    # Уникальный индекс на шардированной коллекции должен начинаться с ключа шардирования,
+    # поэтому порядок полей в уникальных индексах совпадает с ключом шардирования.
+
     # Закладки/избранные фильмы пользователей
-    BOOKMARKS_COLLECTION = ("bookmarksCollection", {"user_id": "hashed", "movie_id": 1})
+    BOOKMARKS_COLLECTION = (
+        "bookmarksCollection",
+        {"user_id": "hashed", "movie_id": 1},
+        [
+            IndexModel([("user_id", ASCENDING), ("movie_id", ASCENDING)], name="user_movie_unique", unique=True),
+            IndexModel([("user_id", ASCENDING), ("bookmark_type", ASCENDING), *_NEWEST], name="user_type_newest"),
+        ]
+    )
 
     # Рейтинги фильмов от пользователей
-    RATINGS_COLLECTION = ("ratingsCollection", {"movie_id": "hashed", "user_id": 1})
+    RATINGS_COLLECTION = (
+        "ratingsCollection",
+        {"movie_id": "hashed", "user_id": 1},
+        [
+            IndexModel([("movie_id", ASCENDING), ("user_id", ASCENDING)], name="movie_user_unique", unique=True),
+            IndexModel([("movie_id", ASCENDING), *_NEWEST], name="movie_newest"),
+            IndexModel([("movie_id", ASCENDING), ("rating", DESCENDING), ("_id", DESCENDING)], name="movie_rating"),
+            IndexModel([("user_id", ASCENDING), *_NEWEST], name="user_newest"),
+        ]
+    )
+
+    # Рецензии на фильмы. Ключ шардирования содержит created_at, поэтому
+    # уникальность (user_id, movie_id) индексом обеспечить нельзя
+    REVIEWS_COLLECTION = (
+        "reviewsCollection",
+        {"movie_id": "hashed", "created_at": 1},
+        [
+            IndexModel([("movie_id", ASCENDING), ("user_id", ASCENDING)], name="movie_user"),
+            IndexModel([("movie_id", ASCENDING), *_NEWEST], name="movie_newest"),
+            IndexModel([("user_id", ASCENDING), *_NEWEST], name="user_newest"),
+        ]
+    )
 
-    # Рецензии на фильмы
-    REVIEWS_COLLECTION = ("reviewsCollection", {"movie_id": "hashed", "created_at": 1})
+    # Материализованные агрегаты рейтингов по фильмам (_id = movie_id)
+    RATING_AGGREGATES_COLLECTION = (
+        "ratingAggregatesCollection",
+        {"_id": "hashed"},
+        [IndexModel([("updated_at", ASCENDING)], name="updated_at")]
+    )
 
-    def __init__(self, collection_name, shard_key):
+    # Счетчики документов пользователей и фильмов (_id = {"user_id": ...} или {"movie_id": ...})
+    COUNTERS_COLLECTION = (
+        "countersCollection",
+        {"_id": "hashed"},
+        [IndexModel([("updated_at", ASCENDING)], name="updated_at")]
+    )
+
+    def __init__(self, collection_name, shard_key, indexes=()):
         self.collection_name = collection_name
         self.shard_key = shard_key
+        self.indexes = list(indexes)
 
 
 class BookmarkType(str, Enum):
@@ -24,4 +72,32 @@ class BookmarkType(str, Enum):
     FAVORITE ("Избранное") - это фильмы, которые пользователь уже посмотрел и добавил в избранное
     """
     FAVORITE = "favorite"
-    WATCHLIST = "watchlist"
\ No newline at end of file
+    WATCHLIST = "watchlist"
+
+
+class TotalMode(str, Enum):
+    """
+    Способ подсчета total в списках
+
+    EXACT - count_documents на каждой странице
+    ESTIMATED - значение материализованных счетчиков, может ненадолго расходиться с точным
+    FIRST_PAGE - точный подсчет только на первой странице
+    NONE - total не возвращается
+    """
+    EXACT = "exact"
+    ESTIMATED = "estimated"
+    FIRST_PAGE = "first_page"
+    NONE = "none"
+
+
+class BatchItemStatus(str, Enum):
+    """
+    Результат обработки элемента пакетного запроса
+    """
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
+    MOVIE_NOT_FOUND = "movie_not_found"
+    DUPLICATE = "duplicate"
+    ERROR = "error"
@@ -0,0 +1,112 @@
+import base64
+import binascii
+from typing import Awaitable, Callable
+
+from bson import json_util
+from bson.binary import UuidRepresentation
+from bson.json_util import JSONMode, JSONOptions
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+from utils.enums import TotalMode
+
+# Сортировка по умолчанию для лент: сначала новые
+NEWEST_FIRST = [("created_at", -1), ("_id", -1)]
+
+_JSON_OPTIONS = JSONOptions(
+    json_mode=JSONMode.RELAXED,
+    uuid_representation=UuidRepresentation.STANDARD,
+)
+
+
+def encode_cursor(sort: list[tuple[str, int]], doc: dict) -> str:
+    """
+    Непрозрачный курсор: значения полей сортировки последнего документа страницы
+    """
+    payload = json_util.dumps(
+        {"s": sort, "v": [doc.get(field) for field, _ in sort]},
+        json_options=_JSON_OPTIONS
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: list[tuple[str, int]]) -> list:
+    try:
+        payload = json_util.loads(
+            base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)),
+            json_options=_JSON_OPTIONS
+        )
+        values = payload["v"]
+        cursor_sort = [tuple(item) for item in payload["s"]]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+    if cursor_sort != sort or len(values) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Курсор не соответствует сортировке"
+        )
+    return values
+
+
+def keyset_filter(sort: list[tuple[str, int]], values: list) -> dict:
+    """
+    Условие "после курсора" для составного ключа сортировки:
+    (a > x) or (a == x and b > y) с учетом направления каждого поля
+    """
+    conditions = []
+    for index, (field, direction) in enumerate(sort):
+        condition = {prev_field: values[prev] for prev, (prev_field, _) in enumerate(sort[:index])}
+        condition[field] = {"$gt" if direction > 0 else "$lt": values[index]}
+        conditions.append(condition)
+    return {"$or": conditions}
+
+
+async def fetch_page(
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        sort: list[tuple[str, int]],
+        limit: int,
+        skip: int = 0,
+        cursor: str | None = None
+) -> tuple[list[dict], str | None]:
+    """
+    Получение страницы документов.
+
+    С курсором страница выбирается условием по индексу без пропуска документов,
+    поэтому стоимость не зависит от глубины. skip оставлен для обратной совместимости
+    и при переданном курсоре не используется.
+
+    Returns:
+        Документы страницы и курсор следующей страницы (None, если страница последняя).
+    """
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor, sort))]}
+        skip = 0
+
+    # Лишний документ показывает, есть ли следующая страница
+    docs = await collection.find(query).sort(sort).skip(skip).limit(limit + 1).to_list(length=limit + 1)
+    if len(docs) > limit:
+        return docs[:limit], encode_cursor(sort, docs[limit - 1])
+    return docs, None
+
+
+async def count_total(
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        mode: TotalMode,
+        first_page: bool,
+        estimate: Callable[[], Awaitable[int]]
+) -> int | None:
+    """
+    Подсчет total для списка в зависимости от режима.
+    ESTIMATED берет значение из материализованных счетчиков вместо
+    count_documents, который на шардированной коллекции опрашивает все шарды.
+    """
+    if mode == TotalMode.EXACT or (mode == TotalMode.FIRST_PAGE and first_page):
+        return await collection.count_documents(query)
+    if mode == TotalMode.ESTIMATED:
+        return await estimate()
+    return None
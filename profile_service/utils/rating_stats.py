@@ -0,0 +1,76 @@
+import numpy as np
+
+# Возможные значения оценки
+RATING_VALUES = np.arange(1, 11)
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def histogram_matrix(aggregates: list[dict | None]) -> np.ndarray:
+    """
+    Гистограммы агрегатов рейтингов в виде матрицы (фильмы x оценки 1-10)
+    """
+    matrix = np.zeros((len(aggregates), len(RATING_VALUES)), dtype=np.int64)
+    for row, aggregate in enumerate(aggregates):
+        for value, count in ((aggregate or {}).get("histogram") or {}).items():
+            matrix[row, int(value) - 1] = count
+    return matrix
+
+
+def _value_at_rank(cumulative: np.ndarray, ranks: np.ndarray) -> np.ndarray:
+    # Оценка, на которую приходится ranks-я по порядку оценка фильма (ранги с 1)
+    return (cumulative >= ranks[:, None]).argmax(axis=1) + RATING_VALUES[0]
+
+
+def histogram_stats(matrix: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Статистики распределения оценок сразу для всех строк матрицы гистограмм.
+
+    Returns:
+        Массивы по фильмам: count, mean, std, median и percentile_<p>.
+        Для фильмов без оценок статистики равны nan.
+    """
+    counts = matrix.sum(axis=1)
+    rated = counts > 0
+    safe_counts = np.where(rated, counts, 1)
+
+    mean = matrix @ RATING_VALUES / safe_counts
+    variance = matrix @ RATING_VALUES ** 2 / safe_counts - mean ** 2
+    cumulative = matrix.cumsum(axis=1)
+
+    # Медиана при четном количестве - среднее двух центральных оценок
+    median = (
+        _value_at_rank(cumulative, (safe_counts + 1) // 2)
+        + _value_at_rank(cumulative, safe_counts // 2 + 1)
+    ) / 2
+
+    stats = {
+        "count": counts,
+        "mean": np.where(rated, mean, np.nan),
+        "std": np.where(rated, np.sqrt(np.clip(variance, 0, None)), np.nan),
+        "median": np.where(rated, median, np.nan),
+    }
+    for percentile in PERCENTILES:
+        # Метод ближайшего ранга: наименьшая оценка, не меньше которой p% оценок
+        ranks = np.maximum(np.ceil(safe_counts * percentile / 100), 1)
+        stats[f"percentile_{percentile}"] = np.where(rated, _value_at_rank(cumulative, ranks), np.nan)
+    return stats
+
+
+def monthly_trend(aggregate: dict | None, months: int) -> list[tuple[str, int, float | None]]:
+    """
+    Количество оценок и средний рейтинг фильма на конец месяца за последние months месяцев
+    (только месяцы, в которые оценки менялись)
+    """
+    aggregate = aggregate or {}
+    monthly = aggregate.get("monthly") or {}
+    keys = sorted(monthly)
+    sums = np.cumsum([monthly[key].get("sum", 0) for key in keys])
+    counts = np.cumsum([monthly[key].get("count", 0) for key in keys])
+    if keys:
+        # Оценки, поставленные до начала помесячного учета, относятся к началу истории
+        sums += aggregate.get("sum", 0) - sums[-1]
+        counts += aggregate.get("count", 0) - counts[-1]
+    trend = []
+    for key, total, count in zip(keys[-months:], sums[-months:], counts[-months:]):
+        trend.append((key, int(count), round(float(total / count), 2) if count > 0 else None))
+    return trend